@@ -1,14 +1,13 @@
 import streamlit as st
 import os
 from dotenv import load_dotenv
-from frontend.pf_feedback import get_feedback, display_pf_results
+from frontend.pf_feedback import get_feedback, display_pf_results, upload_digest, upload_audio_info, describe_audio, already_processed
 from frontend.case import text_upload
+from frontend.backend_client import backend_url
 
 # Load environment variables at app startup
 load_dotenv()
 
-FASTAPI_URL = "http://127.0.0.1:8000/"
-
 def main():
     # **TIP 1: Page Configuration** - Set proper page config with wide layout and custom theme
     st.set_page_config(
@@ -150,26 +149,32 @@ def main():
                 
                 # File details in an info box
                 file_details = {"filename": uploaded_file.name, "filesize": uploaded_file.size}
-                st.info(f"📊 File size: {file_details['filesize']:,} bytes")
+                audio_info = upload_audio_info(uploaded_file)
+                audio_details = describe_audio(audio_info) if audio_info else ""
+                if audio_details:
+                    st.info(f"📊 File size: {file_details['filesize']:,} bytes · {audio_details}")
+                else:
+                    st.info(f"📊 File size: {file_details['filesize']:,} bytes")
                 
-                # Save the uploaded file temporarily
-                with open("temp_uploaded_audio.wav", "wb") as f:
-                    f.write(uploaded_file.getbuffer())
-                temp_audio_path = "temp_uploaded_audio.wav"
+                # The upload stays in memory; it is hashed once so reruns and repeat clicks are cheap
+                audio_hash = upload_digest(uploaded_file)
 
                 # **TIP 10: Interactive preview** - Display the uploaded audio file
                 st.markdown("#### 🔊 Audio Preview")
-                st.audio(temp_audio_path, format="audio/wav")
+                st.audio(uploaded_file, format=uploaded_file.type or "audio/wav")
 
                 # **TIP 11: Better call-to-action** buttons with validation
                 if debate_topic.strip():  # Only enable if topic is provided
                     if st.button("🚀 Get AI Feedback", type="primary", use_container_width=True):
-                        with st.spinner("🔄 Processing your audio and generating feedback..."):
-                            try:
-                                get_feedback(temp_audio_path, FASTAPI_URL + "transcribe/", debate_topic, side)
-                                st.success("🎉 Analysis complete! Your feedback is ready below.")
-                            except Exception as e:
-                                st.error(f"❌ An error occurred: {str(e)}")
+                        if already_processed(audio_hash, debate_topic, side):
+                            st.info("ℹ️ This recording was already analyzed for this topic and side. Your feedback is below.")
+                        else:
+                            with st.spinner("🔄 Processing your audio and generating feedback..."):
+                                try:
+                                    get_feedback(uploaded_file, backend_url("jobs/transcribe/"), debate_topic, side)
+                                    st.success("🎉 Analysis complete! Your feedback is ready below.")
+                                except Exception as e:
+                                    st.error(f"❌ An error occurred: {str(e)}")
                 else:
                     st.warning("⚠️ Please enter a debate topic before proceeding")
                     st.button("🚀 Get AI Feedback", disabled=True, use_container_width=True)
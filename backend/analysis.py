@@ -0,0 +1,278 @@
+"""
+Map-reduce analysis of long cases and rounds.
+The input is split into contentions (cases) or speeches (rounds), every part is
+critiqued by its own concurrent LLM call, and a final synthesis call merges the
+notes into one feedback report. Part analyses are cached on disk, so re-submitting
+a case or round only pays for the parts that changed.
+"""
+import asyncio
+import hashlib
+import json
+import os
+import re
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+
+from starlette.concurrency import run_in_threadpool
+
+from backend.azure import (
+    AZURE_OPENAI_MODEL, budget_messages, call_ai, call_ai_async,
+    case_feedback_messages, case_feedback_prompt, pf_feedback_messages, pf_feedback_prompt,
+)
+from backend.cards import CardCase, format_cards
+from backend.disk_cache import DiskCache
+from backend.rate_limit import PRIORITY_BULK
+from backend.speeches import Transcript, format_speech
+from backend.tokens import CASE_FEEDBACK_TOKEN_BUDGET, PF_FEEDBACK_TOKEN_BUDGET, count_tokens
+
+# "single" sends the whole input in one call, "map_reduce" always splits it,
+# "auto" splits only inputs larger than ANALYSIS_MAP_REDUCE_MIN_TOKENS
+ANALYSIS_MODE = os.getenv("ANALYSIS_MODE", "auto")
+ANALYSIS_MODES = ("auto", "single", "map_reduce")
+ANALYSIS_MAP_REDUCE_MIN_TOKENS = int(os.getenv("ANALYSIS_MAP_REDUCE_MIN_TOKENS", "6000"))
+# Concurrent part analyses per request
+ANALYSIS_CONCURRENCY = int(os.getenv("ANALYSIS_CONCURRENCY", "6"))
+# Target size of a part when a case has no contention headings to split on
+ANALYSIS_PART_TOKENS = int(os.getenv("ANALYSIS_PART_TOKENS", "1500"))
+# Prompt budget of a single part analysis
+ANALYSIS_PART_TOKEN_BUDGET = int(os.getenv("ANALYSIS_PART_TOKEN_BUDGET", "8000"))
+ANALYSIS_CACHE_DIR = os.getenv("ANALYSIS_CACHE_DIR", os.path.join(tempfile.gettempdir(), "coachr_analysis"))
+ANALYSIS_CACHE_MAX_BYTES = int(os.getenv("ANALYSIS_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+
+# Lines that open a new section of a case
+_CASE_HEADING = re.compile(r"^\s*(contention|framework|observation|definitions?|c\s*\d+)\b", re.IGNORECASE)
+
+# Analyses of individual parts, shared by every request in the process
+part_cache = DiskCache(ANALYSIS_CACHE_DIR, ANALYSIS_CACHE_MAX_BYTES)
+
+
+def split_case(case: str) -> list:
+    """
+    Split a case into (name, text) parts at contention headings.
+    Cases without headings are split into paragraph groups of about ANALYSIS_PART_TOKENS.
+    """
+    parts, name, lines = [], "Introduction", []
+    for line in case.splitlines():
+        if _CASE_HEADING.match(line) and any(l.strip() for l in lines):
+            parts.append((name, "\n".join(lines).strip()))
+            lines = []
+        if _CASE_HEADING.match(line):
+            name = line.strip()[:80]
+        lines.append(line)
+    if any(l.strip() for l in lines):
+        parts.append((name, "\n".join(lines).strip()))
+    if len(parts) > 1:
+        return parts
+
+    # No structure to follow: group paragraphs into evenly sized parts
+    parts, group, size = [], [], 0
+    for paragraph in (p for p in re.split(r"\n\s*\n|\n", case) if p.strip()):
+        tokens = count_tokens(paragraph)
+        if group and size + tokens > ANALYSIS_PART_TOKENS:
+            parts.append((f"Part {len(parts) + 1}", "\n".join(group)))
+            group, size = [], 0
+        group.append(paragraph)
+        size += tokens
+    if group:
+        parts.append((f"Part {len(parts) + 1}", "\n".join(group)))
+    return parts
+
+
+def split_cards(case: CardCase) -> list:
+    """
+    Split structured cards into (name, text) parts, one per section.
+    Files without sections are split into groups of cards of about ANALYSIS_PART_TOKENS.
+    """
+    sections = case.sections()
+    if len(sections) > 1:
+        return [(section or "Introduction", format_cards(cards, section)) for section, cards in sections]
+
+    parts, group, size = [], [], 0
+    for card in case.cards:
+        tokens = count_tokens(card.format_for_prompt())
+        if group and size + tokens > ANALYSIS_PART_TOKENS:
+            parts.append((f"Cards {len(parts) + 1}", format_cards(group)))
+            group, size = [], 0
+        group.append(card)
+        size += tokens
+    if group:
+        parts.append((f"Cards {len(parts) + 1}", format_cards(group)))
+    return parts
+
+
+def _split_case_input(case) -> list:
+    return split_cards(case) if isinstance(case, CardCase) else split_case(str(case))
+
+
+def split_round(transcript) -> list:
+    """Split a round into (name, text) parts, one per speech."""
+    if isinstance(transcript, Transcript) and transcript.speeches:
+        return [(speech.name, format_speech(speech)) for speech in transcript.speeches]
+    return split_case(str(transcript.text if isinstance(transcript, Transcript) else transcript))
+
+
+def resolve_analysis_mode(mode: str = None) -> str:
+    """Validate a requested analysis mode, defaulting to ANALYSIS_MODE."""
+    mode = mode or ANALYSIS_MODE
+    if mode not in ANALYSIS_MODES:
+        raise ValueError(f"Unsupported analysis mode '{mode}'. Choose from: {', '.join(ANALYSIS_MODES)}")
+    return mode
+
+
+def use_map_reduce(parts: list, mode: str = ANALYSIS_MODE) -> bool:
+    mode = resolve_analysis_mode(mode)
+    if mode == "single" or len(parts) < 2:
+        return False
+    return mode == "map_reduce" or sum(count_tokens(text) for _, text in parts) > ANALYSIS_MAP_REDUCE_MIN_TOKENS
+
+
+def _part_prompt(feedback_prompt: str, name: str, count: int) -> str:
+    return (
+        f"{feedback_prompt} You are only given one part of the input ({name}, one of {count} parts); "
+        "analyze this part alone in depth. Your notes will be combined with notes on the other parts, "
+        "so do not write an introduction or an overall verdict."
+    )
+
+
+def _synthesis_prompt(feedback_prompt: str) -> str:
+    return (
+        f"{feedback_prompt} Another coach has already written detailed notes on each part separately; "
+        "they are given below in order. Merge them into one complete, well organized feedback report, "
+        "keeping every specific point, removing repetition and adding the overall analysis the parts could not."
+    )
+
+
+def _part_messages(feedback_prompt: str, parts: list, spoken: bool) -> list:
+    return [
+        budget_messages(_part_prompt(feedback_prompt, name, len(parts)), text, ANALYSIS_PART_TOKEN_BUDGET, spoken=spoken)[0]
+        for name, text in parts
+    ]
+
+
+def _part_key(messages: list) -> str:
+    payload = json.dumps({"model": AZURE_OPENAI_MODEL, "messages": messages}, sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def _add_usage(total: dict, usage: dict):
+    for field in ("prompt_tokens", "completion_tokens", "total_tokens"):
+        total[field] = total.get(field, 0) + usage.get(field, 0)
+
+
+def _analyze_part(messages: list, regenerate: bool = False) -> tuple:
+    """Analysis of one part as (text, usage, cached)."""
+    key = _part_key(messages)
+    cached = None if regenerate else part_cache.get(key)
+    if cached is not None:
+        return cached["analysis"], {}, True
+    usage = {}
+    analysis = call_ai(messages, priority=PRIORITY_BULK, usage=usage)
+    part_cache.put(key, {"analysis": analysis})
+    return analysis, usage, False
+
+
+async def _analyze_part_async(messages: list, semaphore: asyncio.Semaphore, regenerate: bool = False) -> tuple:
+    key = _part_key(messages)
+    cached = None if regenerate else await asyncio.to_thread(part_cache.get, key)
+    if cached is not None:
+        return cached["analysis"], {}, True
+    async with semaphore:
+        usage = {}
+        analysis = await call_ai_async(messages, priority=PRIORITY_BULK, usage=usage)
+    await asyncio.to_thread(part_cache.put, key, {"analysis": analysis})
+    return analysis, usage, False
+
+
+def _synthesis_messages(feedback_prompt: str, parts: list, results: list, budget: int) -> tuple:
+    notes = "\n\n".join(f"## {name}\n{analysis}" for (name, _), (analysis, _, _) in zip(parts, results))
+    messages, report = budget_messages(_synthesis_prompt(feedback_prompt), notes, budget)
+    map_usage = {}
+    for _, usage, _ in results:
+        _add_usage(map_usage, usage)
+    report.update(
+        mode="map_reduce",
+        parts=len(parts),
+        cached_parts=sum(1 for _, _, cached in results if cached),
+        map_usage=map_usage,
+    )
+    return messages, report
+
+
+def _round_plan(resolution, transcript, side, mode) -> tuple:
+    """
+    (messages, None) when the round goes to the model in one call, else
+    (None, (feedback prompt, parts, part messages)) for the map phase.
+    """
+    parts = split_round(transcript)
+    if not use_map_reduce(parts, mode):
+        return pf_feedback_messages(resolution, transcript, side), None
+    prompt = pf_feedback_prompt(resolution, side, isinstance(transcript, Transcript))
+    return None, (prompt, parts, _part_messages(prompt, parts, True))
+
+
+def _case_plan(resolution, case, side, upload_format, mode) -> tuple:
+    """Like _round_plan, for a case."""
+    parts = _split_case_input(case)
+    if not use_map_reduce(parts, mode):
+        return case_feedback_messages(resolution, case, side, upload_format), None
+    prompt = case_feedback_prompt(resolution, side, upload_format, isinstance(case, CardCase))
+    return None, (prompt, parts, _part_messages(prompt, parts, False))
+
+
+def _map(plan: tuple, budget: int, regenerate: bool) -> tuple:
+    feedback_prompt, parts, part_messages = plan
+    with ThreadPoolExecutor(max_workers=max(1, min(ANALYSIS_CONCURRENCY, len(parts)))) as executor:
+        results = list(executor.map(lambda messages: _analyze_part(messages, regenerate), part_messages))
+    return _synthesis_messages(feedback_prompt, parts, results, budget)
+
+
+async def _map_async(plan: tuple, budget: int, regenerate: bool) -> tuple:
+    feedback_prompt, parts, part_messages = plan
+    semaphore = asyncio.Semaphore(max(1, ANALYSIS_CONCURRENCY))
+    results = await asyncio.gather(*(_analyze_part_async(messages, semaphore, regenerate) for messages in part_messages))
+    # Token counting and trimming of the merged notes is CPU work too
+    return await run_in_threadpool(_synthesis_messages, feedback_prompt, parts, results, budget)
+
+
+def pf_analysis_messages(resolution, transcript, side, mode=ANALYSIS_MODE, regenerate=False):
+    """
+    Messages for the final round feedback call.
+
+    Long rounds are analyzed speech by speech first (the map phase runs here) and the
+    returned messages ask the model to merge those notes; short rounds go straight to
+    pf_feedback_messages. With `regenerate`, cached part analyses are ignored.
+
+    Returns:
+        Tuple of (messages, token report)
+    """
+    messages, plan = _round_plan(resolution, transcript, side, mode)
+    if plan is None:
+        return messages
+    return _map(plan, PF_FEEDBACK_TOKEN_BUDGET, regenerate)
+
+
+async def pf_analysis_messages_async(resolution, transcript, side, mode=ANALYSIS_MODE, regenerate=False):
+    """
+    Async variant of pf_analysis_messages. Splitting, token counting and trimming
+    run in the thread pool; only the map-phase model calls are awaited on the loop.
+    """
+    messages, plan = await run_in_threadpool(_round_plan, resolution, transcript, side, mode)
+    if plan is None:
+        return messages
+    return await _map_async(plan, PF_FEEDBACK_TOKEN_BUDGET, regenerate)
+
+
+def case_analysis_messages(resolution, case, side, upload_format="plaintext", mode=ANALYSIS_MODE, regenerate=False):
+    """Messages for the final case feedback call; see pf_analysis_messages."""
+    messages, plan = _case_plan(resolution, case, side, upload_format, mode)
+    if plan is None:
+        return messages
+    return _map(plan, CASE_FEEDBACK_TOKEN_BUDGET, regenerate)
+
+
+async def case_analysis_messages_async(resolution, case, side, upload_format="plaintext", mode=ANALYSIS_MODE, regenerate=False):
+    """Async variant of case_analysis_messages; see pf_analysis_messages_async."""
+    messages, plan = await run_in_threadpool(_case_plan, resolution, case, side, upload_format, mode)
+    if plan is None:
+        return messages
+    return await _map_async(plan, CASE_FEEDBACK_TOKEN_BUDGET, regenerate)
@@ -0,0 +1,145 @@
+"""
+Audio decoding for transcription.
+Uploads are piped straight into a single ffmpeg process that returns 16 kHz mono
+float32 PCM, which Whisper accepts directly, so no intermediate files are written.
+MP4-family containers, whose index often follows the audio, need a seekable input
+and are decoded from a temporary file instead.
+"""
+import os
+import subprocess
+import tempfile
+import numpy as np
+
+# Whisper expects 16 kHz mono audio
+SAMPLE_RATE = 16000
+
+FFMPEG_BINARY = os.getenv("FFMPEG_BINARY", "ffmpeg")
+
+
+def _ffmpeg_command(input_spec: str, sample_rate: int) -> list:
+    return [
+        FFMPEG_BINARY,
+        "-nostdin",
+        "-hide_banner",
+        "-loglevel", "error",
+        "-threads", "0",
+        "-i", input_spec,
+        "-f", "s16le",
+        "-ac", "1",
+        "-acodec", "pcm_s16le",
+        "-ar", str(sample_rate),
+        "pipe:1",
+    ]
+
+
+def _run_ffmpeg(command: list, data: bytes = None) -> bytes:
+    try:
+        result = subprocess.run(command, input=data, stdout=subprocess.PIPE, stderr=subprocess.PIPE, check=False)
+    except FileNotFoundError:
+        raise RuntimeError("ffmpeg is not installed. Cannot decode audio files.")
+    if result.returncode != 0:
+        error = result.stderr.decode("utf-8", errors="replace").strip().splitlines()
+        raise ValueError(f"Unable to decode audio file: {error[-1] if error else 'unknown ffmpeg error'}")
+    return result.stdout
+
+
+def _needs_seeking(data: bytes) -> bool:
+    # MP4/M4A/MOV files start with an "ftyp" box
+    return data[4:8] == b"ftyp"
+
+
+def decode_audio(source, sample_rate: int = SAMPLE_RATE) -> np.ndarray:
+    """
+    Decode an audio recording to mono float32 PCM in [-1, 1].
+
+    Args:
+        source: Raw upload bytes, or a path to a file already on disk
+        sample_rate: Output sample rate (Whisper expects 16000)
+
+    Returns:
+        1-D float32 NumPy array
+    """
+    if isinstance(source, (str, os.PathLike)):
+        pcm = _run_ffmpeg(_ffmpeg_command(os.fspath(source), sample_rate))
+    else:
+        data = bytes(source)
+        pcm = b""
+        if not _needs_seeking(data):
+            try:
+                pcm = _run_ffmpeg(_ffmpeg_command("pipe:0", sample_rate), data)
+            except ValueError:
+                pass
+        if not pcm:
+            # Containers that need a seekable input fail on a pipe, or (e.g. M4A with
+            # the index at the end) exit cleanly without writing any audio
+            pcm = _decode_via_temp_file(data, sample_rate)
+
+    if not pcm:
+        raise ValueError("Unable to decode audio file: no audio stream found")
+    return np.frombuffer(pcm, np.int16).astype(np.float32) / 32768.0
+
+
+def _decode_via_temp_file(data: bytes, sample_rate: int) -> bytes:
+    temp_path = None
+    try:
+        with tempfile.NamedTemporaryFile(delete=False) as temp_audio:
+            temp_audio.write(data)
+            temp_path = temp_audio.name
+        return _run_ffmpeg(_ffmpeg_command(temp_path, sample_rate))
+    finally:
+        if temp_path and os.path.exists(temp_path):
+            os.remove(temp_path)
+
+
+def split_on_silence(audio: np.ndarray, sample_rate: int = SAMPLE_RATE, target_seconds: float = 60.0,
+                     max_seconds: float = 120.0, min_silence_seconds: float = 0.3, frame_seconds: float = 0.03) -> list:
+    """
+    Split audio into chunks at pauses using a simple energy-based voice activity detector.
+
+    Chunks aim for `target_seconds` and never exceed `max_seconds`; each cut is placed in the
+    middle of the silence closest to the target, or at the quietest frame when a speaker
+    talks through the whole window.
+
+    Returns:
+        List of (start_sample, end_sample) tuples covering the whole recording in order
+    """
+    total = len(audio)
+    max_samples = int(max_seconds * sample_rate)
+    if total <= max_samples:
+        return [(0, total)] if total else []
+
+    frame = max(1, int(frame_seconds * sample_rate))
+    n_frames = total // frame
+    energy = np.sqrt(np.mean(np.square(audio[:n_frames * frame].reshape(n_frames, frame)), axis=1))
+
+    # Adaptive threshold: a little above the noise floor of the quietest frames,
+    # but always well below the typical (median) speech level
+    noise_floor = float(np.percentile(energy, 5))
+    threshold = max(min(noise_floor * 3.0, float(np.median(energy)) * 0.5), 1e-4)
+    silent = energy < threshold
+
+    # Centers of silent runs long enough to be a pause between phrases
+    padded = np.concatenate(([False], silent, [False]))
+    edges = np.flatnonzero(padded[1:] != padded[:-1])
+    run_starts, run_ends = edges[::2], edges[1::2]
+    min_frames = max(1, int(min_silence_seconds / frame_seconds))
+    long_runs = (run_ends - run_starts) >= min_frames
+    pauses = ((run_starts[long_runs] + run_ends[long_runs]) // 2) * frame
+
+    target_samples = int(target_seconds * sample_rate)
+    min_samples = target_samples // 2
+    chunks = []
+    start = 0
+    while total - start > max_samples:
+        window = pauses[(pauses >= start + min_samples) & (pauses <= start + max_samples)]
+        if len(window):
+            cut = int(window[np.argmin(np.abs(window - (start + target_samples)))])
+        else:
+            # No pause found: cut at the quietest frame between target and max length
+            first = (start + target_samples) // frame
+            last = min((start + max_samples) // frame, n_frames)
+            cut = int(first + np.argmin(energy[first:last])) * frame if last > first else start + max_samples
+        chunks.append((start, cut))
+        start = cut
+    chunks.append((start, total))
+    return chunks
@@ -0,0 +1,350 @@
+"""
+Audio metadata probing from container headers.
+Reads the duration, codec, sample rate and channel count of WAV, FLAC, MP3,
+Ogg (Vorbis/Opus) and MP4/M4A files from their headers only; nothing is decoded,
+so a 45-minute round is probed in milliseconds. Other formats fall back to
+ffprobe when it is installed. Only the standard library is used, so the
+Streamlit frontend shares this module with the backend.
+"""
+import io
+import json
+import os
+import struct
+import subprocess
+from dataclasses import asdict, dataclass
+
+FFPROBE_BINARY = os.getenv("FFPROBE_BINARY", "ffprobe")
+
+# Bytes searched for the first MP3 frame and for the last Ogg page
+_SCAN_BYTES = 64 * 1024
+# MP4 "moov" boxes larger than this are not read (they only hold indexes)
+_MAX_MOOV_BYTES = 64 * 1024 * 1024
+
+_WAV_CODECS = {3: "pcm_f32le", 6: "pcm_alaw", 7: "pcm_mulaw", 0x55: "mp3"}
+_MP4_CODECS = {b"mp4a": "aac", b"alac": "alac", b"ac-3": "ac3", b"ec-3": "eac3", b"Opus": "opus", b"fLaC": "flac"}
+# MPEG-1 and MPEG-2/2.5 Layer III bitrates (kbit/s) by header index
+_MP3_BITRATES = {
+    1: (0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320),
+    2: (0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160),
+}
+_MP3_SAMPLE_RATES = (44100, 48000, 32000)
+
+
+@dataclass(slots=True)
+class AudioInfo:
+    container: str
+    codec: str
+    # Seconds; None when the header does not say (e.g. a streamed WAV)
+    duration: float = None
+    sample_rate: int = None
+    channels: int = None
+
+    def to_dict(self) -> dict:
+        return asdict(self)
+
+
+def probe_audio(source):
+    """
+    Read audio metadata from a recording's headers without decoding it.
+
+    Args:
+        source: Path, bytes-like object or seekable binary file object; the
+            file position of a file object is restored afterwards
+
+    Returns:
+        AudioInfo, or None when the format is not recognised
+    """
+    if isinstance(source, (str, os.PathLike)):
+        with open(source, "rb") as f:
+            info = _probe_file(f)
+        return info or _ffprobe(os.fspath(source))
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        return _probe_file(io.BytesIO(source)) or _ffprobe(None, bytes(source))
+
+    position = source.tell()
+    try:
+        source.seek(0)
+        return _probe_file(source)
+    finally:
+        source.seek(position)
+
+
+def _probe_file(f):
+    f.seek(0, os.SEEK_END)
+    size = f.tell()
+    f.seek(0)
+    head = f.read(12)
+    try:
+        if head[:4] == b"RIFF" and head[8:12] == b"WAVE":
+            return _probe_wav(f, size)
+        if head[:4] == b"fLaC":
+            return _probe_flac(f)
+        if head[:4] == b"OggS":
+            return _probe_ogg(f, size)
+        if head[4:8] == b"ftyp":
+            return _probe_mp4(f, size)
+        return _probe_mp3(f, size)
+    except (struct.error, ValueError, IndexError, ZeroDivisionError):
+        # Truncated or corrupt headers
+        return None
+
+
+def _probe_wav(f, size: int):
+    f.seek(12)
+    info = None
+    byte_rate = 0
+    while True:
+        header = f.read(8)
+        if len(header) < 8:
+            return info
+        chunk_id, chunk_size = struct.unpack("<4sI", header)
+        if chunk_id == b"fmt ":
+            fmt = f.read(chunk_size)
+            code, channels, sample_rate, byte_rate, _, bits = struct.unpack("<HHIIHH", fmt[:16])
+            if code == 0xFFFE and len(fmt) >= 26:
+                # WAVE_FORMAT_EXTENSIBLE: the real format code opens the subformat GUID
+                code = struct.unpack("<H", fmt[24:26])[0]
+            if code == 1:
+                codec = f"pcm_s{bits}le" if bits > 8 else "pcm_u8"
+            else:
+                codec = _WAV_CODECS.get(code, f"wav_0x{code:04x}")
+            info = AudioInfo("wav", codec, sample_rate=sample_rate, channels=channels)
+            f.seek(chunk_size % 2, os.SEEK_CUR)
+        elif chunk_id == b"data":
+            # Recorders that stream WAV leave the size unset; the data runs to the end of the file
+            data_size = min(chunk_size, size - f.tell())
+            if info is not None and byte_rate:
+                info.duration = data_size / byte_rate
+            return info
+        else:
+            f.seek(chunk_size + chunk_size % 2, os.SEEK_CUR)
+
+
+def _probe_flac(f):
+    f.seek(4)
+    block_header = f.read(4)
+    # STREAMINFO is always the first metadata block
+    if block_header[0] & 0x7F != 0:
+        return None
+    streaminfo = f.read(34)
+    packed = int.from_bytes(streaminfo[10:18], "big")
+    sample_rate = packed >> 44
+    channels = ((packed >> 41) & 0x7) + 1
+    total_samples = packed & 0xFFFFFFFFF
+    duration = total_samples / sample_rate if total_samples and sample_rate else None
+    return AudioInfo("flac", "flac", duration, sample_rate, channels)
+
+
+def _probe_ogg(f, size: int):
+    f.seek(0)
+    page = f.read(_SCAN_BYTES)
+    segments = page[26]
+    packet = page[27 + segments:]
+    if packet[:7] == b"\x01vorbis":
+        channels = packet[11]
+        sample_rate = struct.unpack("<I", packet[12:16])[0]
+        codec, clock_rate, pre_skip = "vorbis", sample_rate, 0
+    elif packet[:8] == b"OpusHead":
+        channels = packet[9]
+        pre_skip = struct.unpack("<H", packet[10:12])[0]
+        sample_rate = struct.unpack("<I", packet[12:16])[0] or 48000
+        # Opus granule positions always count 48 kHz samples
+        codec, clock_rate = "opus", 48000
+    else:
+        return None
+
+    # The granule position of the last page is the total sample count
+    f.seek(max(0, size - _SCAN_BYTES))
+    tail = f.read()
+    last_page = tail.rfind(b"OggS")
+    duration = None
+    if last_page >= 0 and len(tail) >= last_page + 14:
+        granule = struct.unpack("<q", tail[last_page + 6:last_page + 14])[0]
+        if granule > 0:
+            duration = max(0, granule - pre_skip) / clock_rate
+    return AudioInfo("ogg", codec, duration, sample_rate, channels)
+
+
+def _boxes(data: bytes, start: int = 0, end: int = None):
+    """(type, payload start, payload end) of the MP4 boxes in data[start:end]."""
+    end = len(data) if end is None else end
+    while start + 8 <= end:
+        size, kind = struct.unpack(">I4s", data[start:start + 8])
+        header = 8
+        if size == 1:
+            size = struct.unpack(">Q", data[start + 8:start + 16])[0]
+            header = 16
+        elif size == 0:
+            size = end - start
+        if size < header:
+            return
+        yield kind, start + header, min(start + size, end)
+        start += size
+
+
+def _child(data: bytes, start: int, end: int, path: tuple):
+    for kind, payload, payload_end in _boxes(data, start, end):
+        if kind == path[0]:
+            return (payload, payload_end) if len(path) == 1 else _child(data, payload, payload_end, path[1:])
+    return None
+
+
+def _timed_duration(data: bytes, start: int) -> float:
+    """Duration from an mvhd or mdhd box (version 0 or 1)."""
+    if data[start] == 1:
+        timescale, duration = struct.unpack(">IQ", data[start + 20:start + 32])
+    else:
+        timescale, duration = struct.unpack(">II", data[start + 12:start + 20])
+    return duration / timescale if timescale else None
+
+
+def _probe_mp4(f, size: int):
+    # Walk the top-level boxes by seeking, so "mdat" (the audio itself) is never read
+    f.seek(0)
+    offset = 0
+    moov = None
+    while offset + 8 <= size:
+        f.seek(offset)
+        header = f.read(16)
+        box_size, kind = struct.unpack(">I4s", header[:8])
+        header_size = 8
+        if box_size == 1:
+            box_size, header_size = struct.unpack(">Q", header[8:16])[0], 16
+        elif box_size == 0:
+            box_size = size - offset
+        if box_size < header_size:
+            return None
+        if kind == b"moov":
+            if box_size > _MAX_MOOV_BYTES:
+                return None
+            f.seek(offset + header_size)
+            moov = f.read(box_size - header_size)
+            break
+        offset += box_size
+    if moov is None:
+        return None
+
+    duration = None
+    mvhd = _child(moov, 0, len(moov), (b"mvhd",))
+    if mvhd:
+        duration = _timed_duration(moov, mvhd[0])
+    for kind, start, end in _boxes(moov):
+        if kind != b"trak":
+            continue
+        hdlr = _child(moov, start, end, (b"mdia", b"hdlr"))
+        if not hdlr or moov[hdlr[0] + 8:hdlr[0] + 12] != b"soun":
+            continue
+        mdhd = _child(moov, start, end, (b"mdia", b"mdhd"))
+        if mdhd:
+            duration = _timed_duration(moov, mdhd[0]) or duration
+        stsd = _child(moov, start, end, (b"mdia", b"minf", b"stbl", b"stsd"))
+        codec, sample_rate, channels = "unknown", None, None
+        if stsd:
+            # Full box header and entry count, then the first audio sample entry
+            entry = stsd[0] + 8
+            fmt = moov[entry + 4:entry + 8]
+            codec = _MP4_CODECS.get(fmt, fmt.decode("latin-1").strip())
+            channels = struct.unpack(">H", moov[entry + 24:entry + 26])[0]
+            sample_rate = struct.unpack(">I", moov[entry + 32:entry + 36])[0] >> 16
+        return AudioInfo("mp4", codec, duration, sample_rate, channels)
+    return None
+
+
+def _mp3_frame(header: bytes):
+    """(version, sample rate, channels, bitrate, frame length) of a Layer III frame header, or None."""
+    if len(header) < 4 or header[0] != 0xFF or header[1] & 0xE0 != 0xE0:
+        return None
+    version_bits = (header[1] >> 3) & 0x3
+    layer_bits = (header[1] >> 1) & 0x3
+    bitrate_index = header[2] >> 4
+    rate_index = (header[2] >> 2) & 0x3
+    if version_bits == 1 or layer_bits != 1 or bitrate_index in (0, 15) or rate_index == 3:
+        return None
+    # 3 = MPEG-1, 2 = MPEG-2, 0 = MPEG-2.5
+    version = 1 if version_bits == 3 else 2
+    sample_rate = _MP3_SAMPLE_RATES[rate_index] >> {3: 0, 2: 1, 0: 2}[version_bits]
+    bitrate = _MP3_BITRATES[version][bitrate_index] * 1000
+    padding = (header[2] >> 1) & 0x1
+    channels = 1 if header[3] >> 6 == 3 else 2
+    length = (144 if version == 1 else 72) * bitrate // sample_rate + padding
+    return version, sample_rate, channels, bitrate, length
+
+
+def _probe_mp3(f, size: int):
+    f.seek(0)
+    data = f.read(_SCAN_BYTES + 10)
+    start = 0
+    if data[:3] == b"ID3":
+        # Skip the ID3v2 tag; its size is stored in four 7-bit bytes
+        tag_size = ((data[6] & 0x7F) << 21) | ((data[7] & 0x7F) << 14) | ((data[8] & 0x7F) << 7) | (data[9] & 0x7F)
+        start = 10 + tag_size + (10 if data[5] & 0x10 else 0)
+        f.seek(start)
+        data = f.read(_SCAN_BYTES)
+
+    offset = 0
+    frame = None
+    while offset + 4 <= len(data):
+        offset = data.find(b"\xff", offset)
+        if offset < 0:
+            return None
+        frame = _mp3_frame(data[offset:offset + 4])
+        # A real frame is followed by another frame header; stray 0xFF bytes are not
+        if frame and (offset + frame[4] + 4 > len(data) or _mp3_frame(data[offset + frame[4]:offset + frame[4] + 4])):
+            break
+        frame = None
+        offset += 1
+    if frame is None:
+        return None
+
+    version, sample_rate, channels, bitrate, _ = frame
+    samples_per_frame = 1152 if version == 1 else 576
+    # A Xing/Info (or VBRI) header in the first frame gives the frame count of VBR files
+    side_info = (32 if channels == 2 else 17) if version == 1 else (17 if channels == 2 else 9)
+    xing = offset + 4 + side_info
+    frames = None
+    if data[xing:xing + 4] in (b"Xing", b"Info") and struct.unpack(">I", data[xing + 4:xing + 8])[0] & 0x1:
+        frames = struct.unpack(">I", data[xing + 8:xing + 12])[0]
+    elif data[offset + 36:offset + 40] == b"VBRI":
+        frames = struct.unpack(">I", data[offset + 50:offset + 54])[0]
+
+    if frames:
+        duration = frames * samples_per_frame / sample_rate
+    else:
+        # Constant bitrate: the audio bytes divided by the byte rate
+        audio_bytes = size - start - offset
+        f.seek(max(0, size - 128))
+        if f.read(3) == b"TAG":
+            audio_bytes -= 128
+        duration = audio_bytes * 8 / bitrate
+    return AudioInfo("mp3", "mp3", duration, sample_rate, channels)
+
+
+def _ffprobe(path: str = None, data: bytes = None):
+    """Metadata from ffprobe for formats the header readers do not know, or None."""
+    command = [
+        FFPROBE_BINARY, "-v", "error", "-print_format", "json",
+        "-show_format", "-show_streams", "-select_streams", "a:0",
+        path if path is not None else "pipe:0",
+    ]
+    try:
+        result = subprocess.run(command, input=data, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, check=False, timeout=30)
+    except (FileNotFoundError, subprocess.TimeoutExpired):
+        return None
+    if result.returncode != 0:
+        return None
+    try:
+        probe = json.loads(result.stdout)
+    except ValueError:
+        return None
+    streams = probe.get("streams") or []
+    if not streams:
+        return None
+    stream, container = streams[0], probe.get("format", {})
+    duration = stream.get("duration") or container.get("duration")
+    return AudioInfo(
+        container=(container.get("format_name") or "unknown").split(",")[0],
+        codec=stream.get("codec_name") or "unknown",
+        duration=float(duration) if duration else None,
+        sample_rate=int(stream["sample_rate"]) if stream.get("sample_rate") else None,
+        channels=stream.get("channels"),
+    )
@@ -1,62 +1,396 @@
+import asyncio
+import hashlib
+import itertools
+import json
 import os
-from openai import AzureOpenAI
+import tempfile
+import threading
+import time
+import weakref
+from collections import OrderedDict
+import httpx
+import openai
+from openai import AzureOpenAI, AsyncAzureOpenAI
 from dotenv import load_dotenv
+from backend.cards import CardCase
+from backend.disk_cache import DiskCache
+from backend.speeches import Transcript
+from backend.tokens import CASE_FEEDBACK_TOKEN_BUDGET, PF_FEEDBACK_TOKEN_BUDGET, count_message_tokens, fit_to_budget
+from backend.rate_limit import (
+    AZURE_OPENAI_MAX_RETRIES, PRIORITY_BULK, PRIORITY_INTERACTIVE,
+    backoff_delay, estimate_tokens, is_retryable, rate_limiter,
+)
 
 # Load environment variables from .env file
 # Use absolute path to ensure it works regardless of working directory
 env_path = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), '.env')
 load_dotenv(env_path, override=True)  # Override system env vars with .env file values
     
-def call_ai(messages):
+# Azure OpenAI deployment settings
+AZURE_OPENAI_MODEL = 'gpt-4.1'
+AZURE_OPENAI_API_VERSION = "2024-12-01-preview"
+
+# HTTP connection pool shared by every call in the process
+AZURE_MAX_CONNECTIONS = int(os.getenv("AZURE_OPENAI_MAX_CONNECTIONS", "20"))
+AZURE_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("AZURE_OPENAI_MAX_KEEPALIVE_CONNECTIONS", "10"))
+AZURE_KEEPALIVE_EXPIRY = float(os.getenv("AZURE_OPENAI_KEEPALIVE_EXPIRY", "120"))
+AZURE_CONNECT_TIMEOUT = float(os.getenv("AZURE_OPENAI_CONNECT_TIMEOUT", "10"))
+AZURE_REQUEST_TIMEOUT = float(os.getenv("AZURE_OPENAI_TIMEOUT", "300"))
+
+# Opt-in cache of model responses: "off", "memory" (per process) or "disk" (shared by processes on the host)
+LLM_CACHE = os.getenv("LLM_CACHE", "off")
+LLM_CACHE_TTL = float(os.getenv("LLM_CACHE_TTL_SECONDS", str(24 * 60 * 60)))
+LLM_CACHE_MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "256"))
+LLM_CACHE_DIR = os.getenv("LLM_CACHE_DIR", os.path.join(tempfile.gettempdir(), "coachr_llm"))
+LLM_CACHE_MAX_BYTES = int(os.getenv("LLM_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+
+# Appended to the system prompt when content had to be shortened to fit its token budget
+_TRIMMED_NOTE = ' Some of the text was shortened to fit; [...] marks where text was omitted.'
+
+# (credentials, client) of the process-wide sync client
+_sync_client = None
+# Event loop -> (credentials, async client); entries go away with their loop
+_async_clients = weakref.WeakKeyDictionary()
+_clients_lock = threading.Lock()
+
+def _credentials():
     # Get Azure OpenAI credentials from environment variables
     api_key = os.getenv('AZURE_OPENAI_API_KEY')
     endpoint = os.getenv('AZURE_OPENAI_ENDPOINT')
     
     if not api_key or not endpoint:
         raise ValueError("Azure OpenAI credentials not found. Please set AZURE_OPENAI_API_KEY and AZURE_OPENAI_ENDPOINT environment variables.")
-    
-    client = AzureOpenAI(
-        api_key=api_key,  
-        api_version="2024-12-01-preview",
-        azure_endpoint=endpoint
+    return api_key, endpoint
+
+def _http_options():
+    return {
+        "limits": httpx.Limits(
+            max_connections=AZURE_MAX_CONNECTIONS,
+            max_keepalive_connections=AZURE_MAX_KEEPALIVE_CONNECTIONS,
+            keepalive_expiry=AZURE_KEEPALIVE_EXPIRY,
+        ),
+        "timeout": httpx.Timeout(AZURE_REQUEST_TIMEOUT, connect=AZURE_CONNECT_TIMEOUT),
+    }
+
+def _new_client(kind, api_key, endpoint):
+    if kind == "async":
+        return AsyncAzureOpenAI(
+            api_key=api_key,
+            api_version=AZURE_OPENAI_API_VERSION,
+            azure_endpoint=endpoint,
+            http_client=httpx.AsyncClient(**_http_options()),
+            max_retries=0,  # Retries are scheduled by backend.rate_limit
         )
-    try:
-        # Validate messages format before sending
-        validated_messages = []
-        for i, m in enumerate(messages):
-            if not isinstance(m.get("content"), str):
-                content = str(m.get("content")) if m.get("content") is not None else ""
-            else:
-                content = m.get("content")
-            
-            validated_messages.append({
-                "role": m["role"], 
-                "content": content
-            })
+    return AzureOpenAI(
+        api_key=api_key,
+        api_version=AZURE_OPENAI_API_VERSION,
+        azure_endpoint=endpoint,
+        http_client=httpx.Client(**_http_options()),
+        max_retries=0,  # Retries are scheduled by backend.rate_limit
+    )
+
+def get_client() -> AzureOpenAI:
+    """Process-wide Azure OpenAI client with a pooled, keep-alive HTTP connection pool."""
+    global _sync_client
+    credentials = _credentials()
+    with _clients_lock:
+        stale = _sync_client
+        if stale is not None and stale[0] == credentials:
+            return stale[1]
+        _sync_client = (credentials, _new_client("sync", *credentials))
+        client = _sync_client[1]
+    if stale is not None:
+        # Credentials changed: release the old client's connections
+        stale[1].close()
+    return client
+
+def get_async_client() -> AsyncAzureOpenAI:
+    """Async Azure OpenAI client for the running event loop, for use inside FastAPI routes and jobs."""
+    credentials = _credentials()
+    # Async connections belong to the event loop that opened them, so each live loop has its own client
+    loop = asyncio.get_running_loop()
+    with _clients_lock:
+        stale = _async_clients.get(loop)
+        if stale is not None and stale[0] == credentials:
+            return stale[1]
+        client = _new_client("async", *credentials)
+        _async_clients[loop] = (credentials, client)
+    if stale is not None:
+        loop.create_task(stale[1].close())
+    return client
+
+class MemoryResponseCache:
+    """In-process LRU cache with the same get/put interface as DiskCache."""
+
+    def __init__(self, max_entries=LLM_CACHE_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            value = self._entries.get(key)
+            if value is not None:
+                self._entries.move_to_end(key)
+            return value
+
+    def put(self, key, value):
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+def create_response_cache(kind=LLM_CACHE):
+    """Response cache backend for LLM_CACHE, or None when caching is off."""
+    if kind == "memory":
+        return MemoryResponseCache()
+    elif kind == "disk":
+        return DiskCache(LLM_CACHE_DIR, LLM_CACHE_MAX_BYTES)
+    elif kind == "off":
+        return None
+    raise ValueError(f"Unsupported LLM_CACHE '{kind}'. Choose from: off, memory, disk")
+
+# Shared response cache for the whole process
+response_cache = create_response_cache()
+
+def _normalize(text):
+    # Whitespace differences (re-saved files, trailing newlines) should not miss the cache
+    return " ".join(str(text or "").split())
+
+def response_cache_key(messages):
+    """Cache key from the system prompt, model, API version and a hash of the normalized content."""
+    system = [_normalize(m.get("content")) for m in messages if m["role"] == "system"]
+    content = [(m["role"], _normalize(m.get("content"))) for m in messages if m["role"] != "system"]
+    content_hash = hashlib.sha256(json.dumps(content).encode("utf-8")).hexdigest()
+    key = json.dumps({
+        "model": AZURE_OPENAI_MODEL,
+        "api_version": AZURE_OPENAI_API_VERSION,
+        "system": system,
+        "content": content_hash,
+    }, sort_keys=True)
+    return hashlib.sha256(key.encode("utf-8")).hexdigest()
+
+def _cached_response(messages, usage=None):
+    if response_cache is None:
+        return None
+    entry = response_cache.get(response_cache_key(messages))
+    if entry is None or time.time() - entry["created_at"] > LLM_CACHE_TTL:
+        return None
+    if usage is not None:
+        # Served from the cache: no tokens were spent
+        usage.update(cached=True, prompt_tokens=0, completion_tokens=0, total_tokens=0)
+    return entry["content"]
+
+def _cache_response(messages, content):
+    if response_cache is not None and content:
+        response_cache.put(response_cache_key(messages), {"created_at": time.time(), "content": content})
+
+def _validate_messages(messages):
+    # Validate messages format before sending
+    validated_messages = []
+    for i, m in enumerate(messages):
+        if not isinstance(m.get("content"), str):
+            content = str(m.get("content")) if m.get("content") is not None else ""
+        else:
+            content = m.get("content")
         
-        completion = client.chat.completions.create(
-            model='gpt-4.1',
-            messages=validated_messages
-        )
-        return completion.choices[0].message.content
+        validated_messages.append({
+            "role": m["role"], 
+            "content": content
+        })
+    return validated_messages
+
+def _api_error(e):
+    # Enhanced error handling for Azure OpenAI connection issues
+    error_msg = str(e)
+    if isinstance(e, openai.RateLimitError):
+        return ValueError("Azure OpenAI rate limit exceeded. Please try again in a minute.")
+    elif isinstance(e, openai.AuthenticationError) or "authentication" in error_msg.lower() or "unauthorized" in error_msg.lower():
+        return ValueError("Azure OpenAI authentication failed. Please check your API key.")
+    elif isinstance(e, openai.NotFoundError) or "not found" in error_msg.lower() or "404" in error_msg:
+        return ValueError("Azure OpenAI endpoint not found. Please check your endpoint URL.")
+    elif isinstance(e, openai.APIConnectionError) or "connection" in error_msg.lower() or "timeout" in error_msg.lower():
+        return ValueError("Connection to Azure OpenAI failed. Please check your internet connection and endpoint URL.")
+    else:
+        return ValueError(f"Azure OpenAI API error: {error_msg}")
+
+def _retry_wait(e, attempt):
+    """Seconds to wait before retrying after `e`, or raise if the call should not be retried."""
+    if attempt >= AZURE_OPENAI_MAX_RETRIES or not is_retryable(e):
+        raise _api_error(e)
+    delay = backoff_delay(attempt, e)
+    if isinstance(e, openai.RateLimitError):
+        # The whole deployment is throttled, so hold back every caller in this process
+        rate_limiter.pause(delay)
+    return delay
+
+def _create(messages, priority, **options):
+    """Send a chat completion within the rate limits, retrying transient failures."""
+    client = get_client()
+    reserved = estimate_tokens(messages)
+    for attempt in itertools.count():
+        rate_limiter.acquire(reserved, priority)
+        try:
+            response = client.chat.completions.create(
+                model=AZURE_OPENAI_MODEL,
+                messages=_validate_messages(messages),
+                **options
+            )
+            return response, reserved
+        except Exception as e:
+            # Failed requests do not use token quota
+            rate_limiter.settle(reserved, 0)
+            time.sleep(_retry_wait(e, attempt))
+
+async def _create_async(messages, priority, **options):
+    """Async variant of _create."""
+    client = get_async_client()
+    reserved = estimate_tokens(messages)
+    for attempt in itertools.count():
+        await rate_limiter.acquire_async(reserved, priority)
+        try:
+            response = await client.chat.completions.create(
+                model=AZURE_OPENAI_MODEL,
+                messages=_validate_messages(messages),
+                **options
+            )
+            return response, reserved
+        except Exception as e:
+            rate_limiter.settle(reserved, 0)
+            await asyncio.sleep(_retry_wait(e, attempt))
+
+def _settle_usage(reserved, usage, report=None):
+    if usage is not None:
+        rate_limiter.settle(reserved, usage.total_tokens)
+        if report is not None:
+            report.update(
+                prompt_tokens=usage.prompt_tokens,
+                completion_tokens=usage.completion_tokens,
+                total_tokens=usage.total_tokens,
+            )
+
+def call_ai(messages, priority=PRIORITY_INTERACTIVE, usage=None, cache=False, regenerate=False):
+    """
+    Send a chat completion and return its text.
+    If a `usage` dict is given it is updated with the token usage Azure reports.
+    With `cache`, identical requests are answered from the response cache (when
+    LLM_CACHE is enabled); `regenerate` skips the lookup but stores the new answer.
+    """
+    if cache and not regenerate:
+        cached = _cached_response(messages, usage)
+        if cached is not None:
+            return cached
+    completion, reserved = _create(messages, priority)
+    _settle_usage(reserved, completion.usage, usage)
+    content = completion.choices[0].message.content
+    if cache:
+        _cache_response(messages, content)
+    return content
+
+async def call_ai_async(messages, priority=PRIORITY_INTERACTIVE, usage=None, cache=False, regenerate=False):
+    """Async variant of call_ai for FastAPI routes; does not block the event loop."""
+    if cache and not regenerate:
+        cached = _cached_response(messages, usage)
+        if cached is not None:
+            return cached
+    completion, reserved = await _create_async(messages, priority)
+    _settle_usage(reserved, completion.usage, usage)
+    content = completion.choices[0].message.content
+    if cache:
+        _cache_response(messages, content)
+    return content
+
+def call_ai_stream(messages, priority=PRIORITY_INTERACTIVE, usage=None, cache=False, regenerate=False):
+    """Yield the completion text in pieces as the model generates it."""
+    if cache and not regenerate:
+        cached = _cached_response(messages, usage)
+        if cached is not None:
+            yield cached
+            return
+    # Only the request is retried; once text has been yielded a failure is final
+    stream, reserved = _create(messages, priority, stream=True, stream_options={"include_usage": True})
+    pieces = []
+    try:
+        for chunk in stream:
+            # Azure sends an initial chunk with no choices (content filter results)
+            # and a final one carrying only the token usage
+            _settle_usage(reserved, chunk.usage, usage)
+            if chunk.choices and chunk.choices[0].delta.content:
+                pieces.append(chunk.choices[0].delta.content)
+                yield chunk.choices[0].delta.content
     except Exception as e:
-        # Enhanced error handling for Azure OpenAI connection issues
-        error_msg = str(e)
-        if "authentication" in error_msg.lower() or "unauthorized" in error_msg.lower():
-            raise ValueError("Azure OpenAI authentication failed. Please check your API key.")
-        elif "not found" in error_msg.lower() or "404" in error_msg:
-            raise ValueError("Azure OpenAI endpoint not found. Please check your endpoint URL.")
-        elif "connection" in error_msg.lower() or "timeout" in error_msg.lower():
-            raise ValueError("Connection to Azure OpenAI failed. Please check your internet connection and endpoint URL.")
-        else:
-            raise ValueError(f"Azure OpenAI API error: {error_msg}")
+        raise _api_error(e)
+    if cache:
+        _cache_response(messages, "".join(pieces))
+
+async def call_ai_stream_async(messages, priority=PRIORITY_INTERACTIVE, usage=None, cache=False, regenerate=False):
+    """Async variant of call_ai_stream for FastAPI streaming responses."""
+    if cache and not regenerate:
+        cached = _cached_response(messages, usage)
+        if cached is not None:
+            yield cached
+            return
+    stream, reserved = await _create_async(messages, priority, stream=True, stream_options={"include_usage": True})
+    pieces = []
+    try:
+        async for chunk in stream:
+            _settle_usage(reserved, chunk.usage, usage)
+            if chunk.choices and chunk.choices[0].delta.content:
+                pieces.append(chunk.choices[0].delta.content)
+                yield chunk.choices[0].delta.content
+    except Exception as e:
+        raise _api_error(e)
+    if cache:
+        _cache_response(messages, "".join(pieces))
+
+def budget_messages(prompt, content, budget, spoken=False):
+    """System + user messages with the content reduced to fit `budget` prompt tokens."""
+    # Reserve room for the note explaining trimmed text, then drop it if nothing was trimmed
+    content, report = fit_to_budget(prompt + _TRIMMED_NOTE, content, budget, spoken=spoken)
+    if "trim" in report["reductions"]:
+        prompt += _TRIMMED_NOTE
+    messages = [{"role": "system", "content": prompt}, {"role": "user", "content": content}]
+    report["input_tokens"] = count_message_tokens(messages)
+    return messages, report
 
-def pf_feedback(resolution, transcription, side):
+def pf_feedback_prompt(resolution, side, structured=True):
     prompt = f'You are a public forum debate coach. Your job is to analyze round recordings provided of high school public forum debate and provide detailed feedback on how it went and how to improve. The resolution being debated in this round is {resolution} Give as much feedback (4-5 pieces of feedback per speech at MINIMUM) as possible on the content and strategy of the round. The team you should focus on analyzing and giving feedback to is on the {side} side of the resolution. Explain which team you would have voted for, explain why, and explain how the team requiring feedback could improve.'
-    messages = [{"role": "system", "content": prompt}, {"role": "user", "content": transcription}]
-    return call_ai(messages)
+    if structured:
+        # Label each speech so the model does not have to guess where speeches start and stop
+        prompt += ' The transcript is divided into labelled speeches with timestamps; speech boundaries and speaker labels were inferred from timing and may be approximate.'
+    return prompt
 
-def case_feedback(resolution, case, side, upload_format="plaintext"):
+def pf_feedback_messages(resolution, transcription, side):
+    """
+    Build the round feedback prompt, reduced to fit PF_FEEDBACK_TOKEN_BUDGET.
+
+    Returns:
+        Tuple of (messages, token report)
+    """
+    prompt = pf_feedback_prompt(resolution, side, isinstance(transcription, Transcript))
+    return budget_messages(prompt, transcription, PF_FEEDBACK_TOKEN_BUDGET, spoken=True)
+
+def case_feedback_prompt(resolution, side, upload_format="plaintext", structured=False):
+    if upload_format == "card format":
+        prompt = f'You are a public forum debate coach. Your job is to analyze structured debate cards provided of high school public forum debate and provide detailed feedback on how they could be improved. The resolution being debated is {resolution}. Give detailed feedback (4-5 pieces of feedback per card at MINIMUM) on the content, evidence quality, and strategic value of each card. The team you are analyzing is debating the {side} side of the resolution. Focus on analyzing the warrant, evidence credibility, impact, and how well each card supports the overall argument structure. Consider how these cards would work in a 4 minute constructive speech and provide suggestions for card organization and presentation.'
+        if structured:
+            # Cards extracted from DOCX arrive as tag, short cite and read text
+            prompt += ' Each card is given as its tag (the claim it makes), a short citation and only the highlighted text that is read aloud; headings in square brackets group the cards into sections.'
+        else:
+            prompt += ' Be warned; the text will likely appear as an incoherent jumble, but in reality it is a case of cards with citations deleted'
+    else:
+        prompt = f'You are a public forum debate coach. Your job is to analyze cases provided of high school public forum debate and provide detailed feedback on how it could be improved. The resolution being debated in this round is {resolution} Give as much feedback (4-5 pieces of feedback per contention at MINIMUM) as possible on the content and strategy of the case. The team you are analyzing is debating the {side} side of the resolution. Make sure to analyze the uniqueness, link, internal link, and impact of each and every contention. Remember that the case will be delivered in a 4 minute speech.'
+    return prompt
+
+def case_feedback_messages(resolution, case, side, upload_format="plaintext"):
+    """
+    Build the case feedback prompt, reduced to fit CASE_FEEDBACK_TOKEN_BUDGET.
+
+    Returns:
+        Tuple of (messages, token report)
+    """
+    structured = isinstance(case, CardCase)
     # Ensure case is a string
     if not isinstance(case, str):
         if hasattr(case, '__str__'):
@@ -64,10 +398,5 @@ def case_feedback(resolution, case, side, upload_format="plaintext"):
         else:
             case = "Error: Invalid case format provided"
     
-    if upload_format == "card format":
-        prompt = f'You are a public forum debate coach. Your job is to analyze structured debate cards provided of high school public forum debate and provide detailed feedback on how they could be improved. The resolution being debated is {resolution}. Give detailed feedback (4-5 pieces of feedback per card at MINIMUM) on the content, evidence quality, and strategic value of each card. The team you are analyzing is debating the {side} side of the resolution. Focus on analyzing the warrant, evidence credibility, impact, and how well each card supports the overall argument structure. Consider how these cards would work in a 4 minute constructive speech and provide suggestions for card organization and presentation. Be warned; the text will likely appear as an incoherent jumble, but in reality it is a case of cards with citations deleted'
-    else:
-        prompt = f'You are a public forum debate coach. Your job is to analyze cases provided of high school public forum debate and provide detailed feedback on how it could be improved. The resolution being debated in this round is {resolution} Give as much feedback (4-5 pieces of feedback per contention at MINIMUM) as possible on the content and strategy of the case. The team you are analyzing is debating the {side} side of the resolution. Make sure to analyze the uniqueness, link, internal link, and impact of each and every contention. Remember that the case will be delivered in a 4 minute speech.'
-    
-    messages = [{"role": "system", "content": prompt}, {"role": "user", "content": case}]
-    return call_ai(messages)
\ No newline at end of file
+    prompt = case_feedback_prompt(resolution, side, upload_format, structured)
+    return budget_messages(prompt, case, CASE_FEEDBACK_TOKEN_BUDGET)
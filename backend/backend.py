@@ -1,20 +1,39 @@
 from fastapi import FastAPI
-import whisper
 import os
 from dotenv import load_dotenv
 from backend.transcription import router as audio_router
 from backend.case import router as text_router
+from backend.jobs import router as jobs_router, job_queue
+from backend.chat import router as chat_router
+from backend.compression import CompressionMiddleware
+from backend.workers import transcription_pool, long_transcription_pool, extraction_pool, shutdown_chunk_executor, shutdown_pdf_executor
 
 # Load environment variables at startup
 load_dotenv()
 
 app = FastAPI()
 
-# Load the Whisper model once during startup
-model = whisper.load_model("tiny.en")
+# Compress JSON responses above COMPRESSION_MIN_BYTES (brotli when installed, else gzip)
+app.add_middleware(CompressionMiddleware)
 
 # Include the Audio Feedback router
 app.include_router(audio_router)
 
 # Include the text processing router
-app.include_router(text_router)
\ No newline at end of file
+app.include_router(text_router)
+
+# Include the background job status router
+app.include_router(jobs_router)
+
+# Include the coaching chat router
+app.include_router(chat_router)
+
+@app.on_event("shutdown")
+def shutdown_worker_pools():
+    # Let running jobs and transcriptions finish before the worker exits
+    job_queue.stop()
+    transcription_pool.shutdown(wait=True)
+    long_transcription_pool.shutdown(wait=True)
+    extraction_pool.shutdown(wait=True)
+    shutdown_chunk_executor(wait=True)
+    shutdown_pdf_executor(wait=True)
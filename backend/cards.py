@@ -0,0 +1,171 @@
+"""
+Structured debate cards.
+Groups the paragraphs of a card-format DOCX file (see backend.docx_reader) into
+cards: the tag (the claim the card makes), its citation, the highlighted text
+that is read aloud and the full card text. Feedback prompts only need the tag,
+a short cite and the read text, which is a fraction of the full document.
+"""
+import re
+from dataclasses import dataclass, field
+
+# Cites open with "Author YY" or "Author ND", followed by the date and credentials
+_CITE_START = re.compile(r"^[^\n,]{2,80}?\b(\d{2}|\d{4}|ND)\b", re.IGNORECASE)
+_URL = re.compile(r"^\s*(https?://|www\.)\S+\s*$", re.IGNORECASE)
+# Fields of the full cite kept in the short cite (author and year, then the date)
+_SHORT_CITE_FIELDS = 2
+_SHORT_CITE_WORDS = 12
+# Bold body paragraphs up to this length are tags in files without heading styles
+_MAX_TAG_WORDS = 60
+
+
+@dataclass(slots=True)
+class Card:
+    tag: str
+    cite: str = ""
+    read_text: str = ""
+    full_text: str = ""
+    # Headings the card is filed under, e.g. "1AC > Advantage One"
+    section: str = ""
+
+    @property
+    def short_cite(self) -> str:
+        """Author, year and date of the cite, without credentials, title or URL."""
+        if not self.cite:
+            return ""
+        first_line = self.cite.split("\n", 1)[0]
+        short = ",".join(first_line.split(",")[:_SHORT_CITE_FIELDS])
+        return " ".join(short.split()[:_SHORT_CITE_WORDS])
+
+    def format_for_prompt(self) -> str:
+        lines = []
+        if self.tag:
+            lines.append(f"Tag: {self.tag}")
+        if self.cite:
+            lines.append(f"Cite: {self.short_cite}")
+        if self.read_text:
+            lines.append(f"Read: {self.read_text}")
+        return "\n".join(lines)
+
+    def to_dict(self) -> dict:
+        return {
+            "tag": self.tag,
+            "cite": self.cite,
+            "short_cite": self.short_cite,
+            "read_text": self.read_text,
+            "full_text": self.full_text,
+            "section": self.section,
+        }
+
+
+@dataclass(slots=True)
+class CardCase:
+    cards: list = field(default_factory=list)
+
+    def sections(self) -> list:
+        """(section, cards) groups in document order."""
+        groups = []
+        for card in self.cards:
+            if not groups or groups[-1][0] != card.section:
+                groups.append((card.section, []))
+            groups[-1][1].append(card)
+        return groups
+
+    def format_for_prompt(self) -> str:
+        return "\n\n".join(format_cards(cards, section) for section, cards in self.sections())
+
+    def to_dict(self) -> dict:
+        return {"cards": [card.to_dict() for card in self.cards]}
+
+    def __str__(self) -> str:
+        return self.format_for_prompt()
+
+
+def format_cards(cards: list, section: str = "") -> str:
+    blocks = [card.format_for_prompt() for card in cards]
+    if section:
+        blocks.insert(0, f"[{section}]")
+    return "\n\n".join(block for block in blocks if block)
+
+
+def _is_bold_tag(paragraph) -> bool:
+    # Files without heading styles mark tags by bolding the whole paragraph
+    runs = [run for run in paragraph.runs if run.text.strip()]
+    return (
+        bool(runs)
+        and all(run.bold and not run.marked for run in runs)
+        and len(paragraph.text.split()) <= _MAX_TAG_WORDS
+    )
+
+
+def _build_card(tag: str, section: str, body: list) -> Card:
+    """
+    Card from its tag and body paragraphs.
+    The first body paragraph is the cite when it looks like one and highlighted
+    text follows; a following URL line belongs to the cite. Bodies without any
+    highlighting (analytics, plan texts) are read in full.
+    """
+    texts = [" ".join(paragraph.text.split()) for paragraph in body]
+    cite_lines = 0
+    if texts and _CITE_START.match(texts[0]) and any(paragraph.marked_text for paragraph in body[1:]):
+        cite_lines = 1
+        if len(texts) > 1 and _URL.match(texts[1]):
+            cite_lines = 2
+
+    evidence = body[cite_lines:]
+    read = [paragraph.marked_text for paragraph in evidence]
+    read = [text for text in read if text] or texts[cite_lines:]
+    return Card(
+        tag=tag,
+        cite="\n".join(texts[:cite_lines]),
+        read_text=" ".join(read),
+        full_text="\n".join(texts[cite_lines:]),
+        section=section,
+    )
+
+
+def build_cards(paragraphs) -> CardCase:
+    """
+    Group DOCX paragraphs into cards.
+
+    Args:
+        paragraphs: DocxParagraph objects in document order (backend.docx_reader.read_docx)
+
+    Returns:
+        CardCase holding one Card per tag; text before the first tag becomes a card without a tag
+    """
+    cards = []
+    headings = {}
+    tag, section, body = "", "", []
+
+    def close():
+        if tag or body:
+            cards.append(_build_card(tag, section, body))
+
+    for paragraph in paragraphs:
+        text = " ".join(paragraph.text.split())
+        if not text:
+            continue
+        level = paragraph.heading_level
+        if level is None and _is_bold_tag(paragraph):
+            level = 4
+
+        if level is None:
+            body.append(paragraph)
+            continue
+
+        close()
+        body = []
+        if level >= 4:
+            tag = text
+            continue
+        # A new pocket, hat or block replaces the headings below it
+        headings = {lvl: heading for lvl, heading in headings.items() if lvl < level}
+        headings[level] = text
+        path = []
+        for lvl in sorted(headings):
+            if headings[lvl] not in path:
+                path.append(headings[lvl])
+        tag, section = "", " > ".join(path)
+
+    close()
+    return CardCase(cards)
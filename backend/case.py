@@ -1,45 +1,98 @@
 from fileinput import filename
-from fastapi import APIRouter, UploadFile, File, Request
-from fastapi.responses import JSONResponse
-from backend.azure import case_feedback
-from backend.text_extraction import extract_text_from_file
-import tempfile
+import asyncio
 import os
+import tempfile
+from fastapi import APIRouter, Request
+from fastapi.responses import JSONResponse
+from starlette.concurrency import run_in_threadpool
+from backend.analysis import case_analysis_messages_async, resolve_analysis_mode
+from backend.azure import call_ai_async, call_ai_stream_async
+from backend.cards import CardCase
+from backend.rate_limit import PRIORITY_BULK
+from backend.retrieval import index_analysis
+from backend.streaming import stream_llm_response
+from backend.text_extraction import extract_text_from_path
+from backend.uploads import MAX_DOCUMENT_UPLOAD_BYTES, UploadTooLargeError, form_flag, get_upload, read_form, save_upload, too_large_response, upload_path
+from backend.workers import PoolFullError, extraction_pool
 
 router = APIRouter()
 
+# Case feedback requests in the LLM stage (map phase or final call) at the same time
+CASE_FEEDBACK_CONCURRENCY = int(os.getenv("CASE_FEEDBACK_CONCURRENCY", "8"))
+feedback_slots = asyncio.Semaphore(max(1, CASE_FEEDBACK_CONCURRENCY))
+
+async def _holding_feedback_slot(deltas):
+    # A streamed response keeps its LLM slot until the last token is sent
+    async with feedback_slots:
+        async for delta in deltas:
+            yield delta
+
 @router.post("/process-text/")
-async def process_text(request: Request, file: UploadFile = File(...), debate_topic: str = "", side: str = "", upload_format: str = "plaintext"):
+async def process_text(request: Request, debate_topic: str = "", side: str = "", upload_format: str = "plaintext", debug: bool = False):
     """
     Endpoint to process an uploaded text file.
     Supports plaintext, DOCX, and PDF uploads with format-specific processing.
+    The multipart body is parsed once here, refusing documents over MAX_DOCUMENT_UPLOAD_MB.
+    The extracted text and debug info are only returned with `debug=true`.
     """
-    # Get the raw form data and override parameters to fix FastAPI parsing issue
     try:
-        form_data = await request.form()
-        
-        # Override parameters with actual form data values
-        actual_debate_topic = form_data.get("debate_topic", debate_topic)
-        actual_side = form_data.get("side", side)
-        actual_upload_format = form_data.get("upload_format", upload_format)
-        actual_file_extension = form_data.get("file_extension")
+        form_data = await read_form(request, MAX_DOCUMENT_UPLOAD_BYTES)
+    except UploadTooLargeError as e:
+        return too_large_response(e)
+
+    try:
+        return await _process_form(form_data, debate_topic, side, upload_format, debug)
+    finally:
+        await form_data.close()
+
+async def _process_form(form_data, debate_topic: str, side: str, upload_format: str, debug: bool):
+    try:
+        file = get_upload(form_data)
+    except ValueError as e:
+        return JSONResponse(content={"error": str(e)}, status_code=400)
+
+    # Form fields take precedence over the query parameters
+    actual_debate_topic = form_data.get("debate_topic", debate_topic)
+    actual_side = form_data.get("side", side)
+    actual_upload_format = form_data.get("upload_format", upload_format)
+    actual_file_extension = form_data.get("file_extension")
+    stream = form_flag(form_data, "stream")
+    analysis_mode = form_data.get("analysis_mode")
+    regenerate = form_flag(form_data, "regenerate")
+    debug = form_flag(form_data, "debug", debug)
         
-    except Exception as e:
-        # Fallback to original parameters
-        actual_debate_topic = debate_topic
-        actual_side = side
-        actual_upload_format = upload_format
+    try:
+        analysis_mode = resolve_analysis_mode(analysis_mode)
+    except ValueError as e:
+        return JSONResponse(content={"error": str(e)}, status_code=400)
         
+    cards = None
+    document_path = upload_path(tempfile.gettempdir(), file.filename)
     try:
-        # Extract text
-        extracted_text = extract_text_from_file(file, actual_file_extension, actual_upload_format)
+        # Parse the document in the extraction pool so large PDFs do not stall the event loop
+        await save_upload(file, document_path)
+        extracted_text = await extraction_pool.run(
+            extract_text_from_path, document_path, actual_file_extension, actual_upload_format
+        )
 
     except ValueError as e:
         return JSONResponse(content={"error": f"File processing error: {str(e)}"}, status_code=400)
+    except PoolFullError as e:
+        return JSONResponse(
+            content={"error": str(e)},
+            status_code=503,
+            headers={"Retry-After": str(e.retry_after)},
+        )
+    finally:
+        if os.path.exists(document_path):
+            os.remove(document_path)
         
     # Send to Azure with format information
-    # Ensure extracted_text is a string
-    if isinstance(extracted_text, bytes):
+    # Ensure extracted_text is a string (card-format DOCX files arrive as structured cards)
+    if isinstance(extracted_text, CardCase):
+        cards = extracted_text
+        extracted_text = str(cards)
+    elif isinstance(extracted_text, bytes):
         try:
             extracted_text = extracted_text.decode('utf-8')
         except UnicodeDecodeError:
@@ -47,14 +100,38 @@ async def process_text(request: Request, file: UploadFile = File(...), debate_to
     elif not isinstance(extracted_text, str):
         extracted_text = str(extracted_text)
     
-    output = case_feedback(actual_debate_topic, extracted_text, actual_side, actual_upload_format)
-
-    return JSONResponse(content={
-        "processed_text": output,
-        "extracted_text": extracted_text,  # Add for debugging
-        "debug_info": {
-            "filename": file.filename,
-            "upload_format": actual_upload_format,
-            "text_length": len(extracted_text)
-        }
-    }, status_code=200)
\ No newline at end of file
+    debug_info = {
+        "filename": file.filename,
+        "upload_format": actual_upload_format,
+        "text_length": len(extracted_text)
+    }
+    if cards is not None:
+        debug_info["cards"] = len(cards.cards)
+
+    # Long cases are analyzed contention by contention in parallel before the final call
+    async with feedback_slots:
+        messages, token_usage = await case_analysis_messages_async(
+            actual_debate_topic, cards if cards is not None else extracted_text, actual_side, actual_upload_format, analysis_mode, regenerate
+        )
+
+    async def payload(output: str) -> dict:
+        content = {"processed_text": output, "token_usage": token_usage}
+        # Index the feedback and the case so /chat/ can retrieve from them
+        content["context_id"] = await run_in_threadpool(index_analysis, output, case=cards if cards is not None else extracted_text)
+        if debug:
+            # The extracted text can be larger than the feedback itself, so it is opt-in
+            content.update(extracted_text=extracted_text, debug_info=debug_info)
+        return content
+
+    if stream:
+        # Send feedback token by token as server-sent events
+        return stream_llm_response(
+            _holding_feedback_slot(call_ai_stream_async(messages, priority=PRIORITY_BULK, usage=token_usage, cache=True, regenerate=regenerate)),
+            done_payload=payload
+        )
+
+    # Identical submissions are answered from the response cache when LLM_CACHE is enabled
+    async with feedback_slots:
+        output = await call_ai_async(messages, priority=PRIORITY_BULK, usage=token_usage, cache=True, regenerate=regenerate)
+
+    return JSONResponse(content=await payload(output), status_code=200)
\ No newline at end of file
@@ -0,0 +1,382 @@
+"""
+Coaching chat about a finished analysis.
+Conversations are kept server-side in a store keyed by session id, so clients
+send only the new message on each turn. The most recent turns are sent to the
+model verbatim up to CHAT_HISTORY_TOKEN_BUDGET; older turns are folded into a
+rolling summary, so prompts stay the same size however long a session runs.
+Prompts are laid out by backend.chat_context; sessions started with the
+context_id of an indexed analysis are grounded in its transcript and case.
+"""
+import json
+import os
+import sqlite3
+from abc import ABC, abstractmethod
+import tempfile
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from fastapi import APIRouter, Request
+from fastapi.responses import JSONResponse
+from starlette.concurrency import run_in_threadpool
+from backend.azure import call_ai_async, call_ai_stream_async
+from backend.streaming import stream_llm_response
+from backend.chat_context import chat_messages, split_history
+from backend.retrieval import load_index
+from backend.tokens import count_message_tokens, shorten
+
+# "sqlite" or "memory"
+CHAT_STORE = os.getenv("CHAT_STORE", "sqlite")
+CHAT_DB_PATH = os.getenv("CHAT_DB_PATH", os.path.join(tempfile.gettempdir(), "coachr_chat.db"))
+# Conversations idle for longer than this are deleted
+CHAT_SESSION_TTL_SECONDS = int(os.getenv("CHAT_SESSION_TTL_SECONDS", str(24 * 3600)))
+# Sessions kept by the in-memory store
+CHAT_MAX_SESSIONS = int(os.getenv("CHAT_MAX_SESSIONS", "1000"))
+# Longest rolling summary of folded turns
+CHAT_SUMMARY_TOKENS = int(os.getenv("CHAT_SUMMARY_TOKENS", "500"))
+
+_SUMMARY_PROMPT = (
+    "You maintain the running summary of a conversation between a debate coach and a student. "
+    "Merge the existing summary with the new turns into one summary of at most {words} words. "
+    "Keep the student's questions, the advice given, and any commitments or open questions. "
+    "Reply with the summary only."
+)
+
+
+class ConversationStore(ABC):
+    """
+    Interface for conversation persistence. Conversations are plain dicts with the keys
+    id, debate_topic, context, context_id, summary, turns, created_at, updated_at; `turns`
+    holds the {"role", "content"} messages not yet folded into `summary` and `context_id`
+    names the retrieval index of the analysis (backend.retrieval), if any.
+    """
+
+    @abstractmethod
+    def create(self, debate_topic: str, context: str, turns: list = None, context_id: str = None) -> dict:
+        ...
+
+    @abstractmethod
+    def get(self, session_id: str):
+        ...
+
+    @abstractmethod
+    def save(self, conversation: dict):
+        ...
+
+    @abstractmethod
+    def update(self, session_id: str, change):
+        """
+        Apply `change(conversation)` to a stored conversation atomically, so concurrent
+        requests for one session do not overwrite each other's turns.
+
+        Returns:
+            The updated conversation, or None when the session is unknown
+        """
+
+    @abstractmethod
+    def delete(self, session_id: str) -> bool:
+        ...
+
+    @abstractmethod
+    def purge(self, older_than: float) -> int:
+        """Delete conversations last updated before `older_than` (epoch seconds)."""
+
+    @staticmethod
+    def _new_conversation(debate_topic, context, turns, context_id=None):
+        now = time.time()
+        return {
+            "id": uuid.uuid4().hex,
+            "debate_topic": debate_topic,
+            "context": context,
+            "context_id": context_id,
+            "summary": "",
+            "turns": list(turns or []),
+            "created_at": now,
+            "updated_at": now,
+        }
+
+
+class InMemoryConversationStore(ConversationStore):
+    """Conversation store for a single process; the least recently used sessions are dropped first."""
+
+    def __init__(self, max_sessions: int = CHAT_MAX_SESSIONS):
+        self.max_sessions = max_sessions
+        self._conversations = OrderedDict()
+        self._lock = threading.Lock()
+
+    def create(self, debate_topic, context, turns=None, context_id=None):
+        conversation = self._new_conversation(debate_topic, context, turns, context_id)
+        self.save(conversation)
+        return json.loads(json.dumps(conversation))
+
+    def get(self, session_id):
+        with self._lock:
+            conversation = self._conversations.get(session_id)
+            if conversation is None:
+                return None
+            self._conversations.move_to_end(session_id)
+            # Callers change the copy and save it back
+            return json.loads(json.dumps(conversation))
+
+    def save(self, conversation):
+        conversation["updated_at"] = time.time()
+        with self._lock:
+            self._conversations[conversation["id"]] = json.loads(json.dumps(conversation))
+            self._conversations.move_to_end(conversation["id"])
+            while len(self._conversations) > self.max_sessions:
+                self._conversations.popitem(last=False)
+
+    def update(self, session_id, change):
+        with self._lock:
+            stored = self._conversations.get(session_id)
+            if stored is None:
+                return None
+            conversation = json.loads(json.dumps(stored))
+            change(conversation)
+            conversation["updated_at"] = time.time()
+            self._conversations[session_id] = conversation
+            self._conversations.move_to_end(session_id)
+            return json.loads(json.dumps(conversation))
+
+    def delete(self, session_id):
+        with self._lock:
+            return self._conversations.pop(session_id, None) is not None
+
+    def purge(self, older_than):
+        with self._lock:
+            expired = [key for key, value in self._conversations.items() if value["updated_at"] < older_than]
+            for key in expired:
+                del self._conversations[key]
+        return len(expired)
+
+
+class SQLiteConversationStore(ConversationStore):
+    """Conversation store backed by a SQLite file shared by every API process on the host."""
+
+    def __init__(self, path: str = CHAT_DB_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False, isolation_level=None)
+        self._conn.row_factory = sqlite3.Row
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                """CREATE TABLE IF NOT EXISTS conversations (
+                    id TEXT PRIMARY KEY,
+                    debate_topic TEXT NOT NULL,
+                    context TEXT NOT NULL,
+                    context_id TEXT,
+                    summary TEXT NOT NULL,
+                    turns TEXT NOT NULL,
+                    created_at REAL NOT NULL,
+                    updated_at REAL NOT NULL
+                )"""
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS conversations_updated ON conversations (updated_at)")
+
+    def create(self, debate_topic, context, turns=None, context_id=None):
+        conversation = self._new_conversation(debate_topic, context, turns, context_id)
+        self.save(conversation)
+        return conversation
+
+    def _read(self, session_id):
+        row = self._conn.execute("SELECT * FROM conversations WHERE id = ?", (session_id,)).fetchone()
+        if row is None:
+            return None
+        conversation = dict(row)
+        conversation["turns"] = json.loads(conversation["turns"])
+        return conversation
+
+    def _write(self, conversation):
+        conversation["updated_at"] = time.time()
+        self._conn.execute(
+            "INSERT OR REPLACE INTO conversations (id, debate_topic, context, context_id, summary, turns, created_at, updated_at) "
+            "VALUES (:id, :debate_topic, :context, :context_id, :summary, :turns, :created_at, :updated_at)",
+            dict(conversation, turns=json.dumps(conversation["turns"])),
+        )
+
+    def get(self, session_id):
+        with self._lock:
+            return self._read(session_id)
+
+    def save(self, conversation):
+        with self._lock:
+            self._write(conversation)
+
+    def update(self, session_id, change):
+        with self._lock:
+            # Take the write lock before reading, so other processes wait for this update
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                conversation = self._read(session_id)
+                if conversation is not None:
+                    change(conversation)
+                    self._write(conversation)
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._conn.execute("COMMIT")
+        return conversation
+
+    def delete(self, session_id):
+        with self._lock:
+            cursor = self._conn.execute("DELETE FROM conversations WHERE id = ?", (session_id,))
+        return cursor.rowcount > 0
+
+    def purge(self, older_than):
+        with self._lock:
+            cursor = self._conn.execute("DELETE FROM conversations WHERE updated_at < ?", (older_than,))
+        return cursor.rowcount
+
+
+def create_conversation_store(kind: str = CHAT_STORE) -> ConversationStore:
+    if kind == "memory":
+        return InMemoryConversationStore()
+    if kind == "sqlite":
+        return SQLiteConversationStore(CHAT_DB_PATH)
+    raise ValueError(f"Unsupported chat store: {kind}")
+
+
+# Shared conversation store for the whole process
+conversation_store = create_conversation_store()
+
+
+def _format_turns(turns: list) -> str:
+    return "\n\n".join(f"{'Student' if turn['role'] == 'user' else 'Coach'}: {turn['content']}" for turn in turns)
+
+
+async def summarize_turns(summary: str, turns: list, usage: dict = None) -> str:
+    """Fold `turns` into the rolling `summary` with one short model call."""
+    content = f"Existing summary:\n{summary or '(none)'}\n\nNew turns:\n{_format_turns(turns)}"
+    messages = [
+        {"role": "system", "content": _SUMMARY_PROMPT.format(words=int(CHAT_SUMMARY_TOKENS * 0.75))},
+        {"role": "user", "content": content},
+    ]
+    return shorten((await call_ai_async(messages, usage=usage)).strip(), CHAT_SUMMARY_TOKENS)
+
+
+async def fold_history(conversation: dict, usage: dict = None) -> int:
+    """
+    Fold the turns that no longer fit the history budget into the summary.
+
+    Returns:
+        Number of turns folded
+    """
+    start = split_history(conversation["turns"])
+    if start == 0:
+        return 0
+    folded, conversation["turns"] = conversation["turns"][:start], conversation["turns"][start:]
+    conversation["summary"] = await summarize_turns(conversation["summary"], folded, usage)
+    return start
+
+
+def _apply_fold(stored: dict, folded_turns: list, summary: str):
+    # Another request for the session may have folded these turns already
+    if stored["turns"][:len(folded_turns)] == folded_turns:
+        stored["turns"] = stored["turns"][len(folded_turns):]
+        stored["summary"] = summary
+
+
+def build_chat_messages(conversation: dict) -> list:
+    """Messages for the conversation's latest question (see backend.chat_context for the layout)."""
+    # An evicted index leaves the session grounded in the analysis alone
+    index = load_index(conversation.get("context_id"))
+    return chat_messages(
+        conversation["debate_topic"], conversation["context"], conversation["turns"], conversation["summary"], index
+    )
+
+
+def _add_usage(total: dict, usage: dict):
+    for key in ("prompt_tokens", "completion_tokens", "total_tokens"):
+        total[key] = total.get(key, 0) + usage.get(key, 0)
+
+
+def _seed_turns(history) -> list:
+    # Turns a client had before its first call to the backend
+    return [
+        {"role": turn["role"], "content": str(turn["content"])}
+        for turn in history or []
+        if isinstance(turn, dict) and turn.get("role") in ("user", "assistant") and turn.get("content")
+    ]
+
+
+router = APIRouter()
+
+@router.post("/chat/")
+async def chat_endpoint(request: Request):
+    """
+    Answer one chat message.
+    JSON body: user_message, session_id (omit on the first turn), stream (optional).
+    The first turn also sends initial_context (the analysis), debate_topic, the context_id
+    returned with the analysis and, when the client already has turns, chat_history. Returns the response and the session_id to
+    send with the next message; an unknown or expired session_id gives a 404.
+    """
+    try:
+        body = await request.json()
+    except ValueError:
+        return JSONResponse(content={"error": "Request body must be JSON"}, status_code=400)
+    user_message = str(body.get("user_message") or "").strip()
+    if not user_message:
+        return JSONResponse(content={"error": "user_message is required"}, status_code=400)
+
+    # The question is saved before the model is called, so a failed reply does not lose it.
+    # Store calls run in the threadpool: a SQLite write can wait on another process's lock
+    user_turn = {"role": "user", "content": user_message}
+    session_id = body.get("session_id")
+    if session_id:
+        conversation = await run_in_threadpool(
+            conversation_store.update, session_id, lambda stored: stored["turns"].append(user_turn)
+        )
+        if conversation is None:
+            return JSONResponse(content={"error": "Chat session not found or expired"}, status_code=404)
+    else:
+        await run_in_threadpool(conversation_store.purge, time.time() - CHAT_SESSION_TTL_SECONDS)
+        conversation = await run_in_threadpool(
+            conversation_store.create,
+            str(body.get("debate_topic") or ""),
+            str(body.get("initial_context") or ""),
+            _seed_turns(body.get("chat_history")) + [user_turn],
+            body.get("context_id") or None,
+        )
+
+    try:
+        token_usage = {}
+        summary_usage = {}
+        turns = list(conversation["turns"])
+        folded = await fold_history(conversation, summary_usage)
+        if folded:
+            await run_in_threadpool(
+                conversation_store.update,
+                conversation["id"],
+                lambda stored: _apply_fold(stored, turns[:folded], conversation["summary"]),
+            )
+        # Loading the retrieval index reads from disk and builds the BM25 arrays
+        messages = await run_in_threadpool(build_chat_messages, conversation)
+        token_usage["input_tokens"] = count_message_tokens(messages)
+        token_usage["summarized_turns"] = folded
+
+        async def finish(text: str) -> dict:
+            assistant_turn = {"role": "assistant", "content": text}
+            await run_in_threadpool(
+                conversation_store.update, conversation["id"], lambda stored: stored["turns"].append(assistant_turn)
+            )
+            _add_usage(token_usage, summary_usage)
+            return {"response": text, "session_id": conversation["id"], "token_usage": token_usage}
+
+        if body.get("stream"):
+            return stream_llm_response(call_ai_stream_async(messages, usage=token_usage), done_payload=finish)
+
+        response = await call_ai_async(messages, usage=token_usage)
+        return JSONResponse(content=await finish(response), status_code=200)
+
+    except Exception as e:
+        return JSONResponse(content={"error": str(e)}, status_code=500)
+
+# A plain def route, so FastAPI runs the store call in its threadpool
+@router.delete("/chat/{session_id}")
+def delete_chat(session_id: str):
+    """Forget a conversation (the client's "clear chat")."""
+    if not conversation_store.delete(session_id):
+        return JSONResponse(content={"error": "Chat session not found or expired"}, status_code=404)
+    return JSONResponse(content={"deleted": session_id}, status_code=200)
@@ -0,0 +1,150 @@
+"""
+Prompt layout for coaching chat turns.
+Every turn of a session opens with the same system message (instructions, topic
+and the analysis, or an outline of it when it is long), followed by the rolling
+summary and the recent turns, which only grow between summaries. Only the tail
+changes per question: the excerpts relevant to it, ranked by the session's
+retrieval index (backend.retrieval), and the question itself. The unchanged
+prefix lets provider-side prompt caching reuse the start of the prompt on every
+turn, and the prompt stays the same size no matter how long the analysis, the
+round or the session is.
+"""
+import os
+from functools import lru_cache
+from backend.retrieval import RetrievalIndex, text_chunks
+from backend.tokens import count_tokens, shorten
+
+# Tokens of recent turns sent verbatim; older turns are folded into the summary
+CHAT_HISTORY_TOKEN_BUDGET = int(os.getenv("CHAT_HISTORY_TOKEN_BUDGET", "3000"))
+# Analyses up to this many tokens are included whole instead of outlined
+CHAT_FULL_CONTEXT_TOKENS = int(os.getenv("CHAT_FULL_CONTEXT_TOKENS", "1500"))
+# Longest outline of a long analysis in the session prefix
+CHAT_OUTLINE_TOKENS = int(os.getenv("CHAT_OUTLINE_TOKENS", "800"))
+# Tokens of analysis, transcript and case excerpts retrieved for each question
+CHAT_RETRIEVED_TOKENS = int(os.getenv("CHAT_RETRIEVED_TOKENS", "1200"))
+
+# Words of each section shown in the outline
+_OUTLINE_WORDS = 25
+
+_INSTRUCTIONS = """You are an expert debate coach having a conversation with a student about their debate performance.
+
+Your role is to:
+1. Provide helpful, specific advice about debate techniques
+2. Answer questions about the initial feedback clearly
+3. Suggest practical improvement strategies
+4. Be encouraging and constructive
+5. Keep responses concise but informative (2-3 paragraphs max)
+
+Conversation style:
+- Friendly and supportive
+- Use relevant examples when helpful
+- Focus on actionable advice
+- Reference the initial analysis when relevant"""
+
+
+@lru_cache(maxsize=64)
+def split_sections(text: str) -> tuple:
+    """Chunks of an analysis, split at its headings and then at paragraph breaks."""
+    return tuple(chunk for chunk in text_chunks(text, "feedback") if chunk.title or chunk.text)
+
+
+@lru_cache(maxsize=64)
+def analysis_index(text: str) -> RetrievalIndex:
+    """Index over the analysis alone, for sessions without a stored retrieval index."""
+    return RetrievalIndex(split_sections(text))
+
+
+def outline(sections) -> str:
+    """One line per section: its heading and opening words."""
+    lines = []
+    for section in sections:
+        words = section.text.split()
+        opening = " ".join(words[:_OUTLINE_WORDS]) + (" ..." if len(words) > _OUTLINE_WORDS else "")
+        lines.append(f"- {section.title}: {opening}" if section.title else f"- {opening}")
+    return "\n".join(lines)
+
+
+def relevant_chunks(index: RetrievalIndex, question: str, budget: int = None, sources=None) -> list:
+    """
+    The chunks of `index` ranking highest for `question` (at most RETRIEVAL_TOP_K),
+    up to `budget` tokens, in document order.
+    """
+    budget = CHAT_RETRIEVED_TOKENS if budget is None else budget
+    chosen, used = [], 0
+    for position, chunk, _score in index.search(question, sources=sources):
+        size = count_tokens(chunk.format())
+        if used + size > budget:
+            continue
+        chosen.append((position, chunk))
+        used += size
+    return [chunk for _position, chunk in sorted(chosen, key=lambda item: item[0])]
+
+
+def session_prefix(debate_topic: str, analysis: str, grounded: bool = False) -> str:
+    """System message shared by every turn of a session; `grounded` sessions also get transcript and case excerpts."""
+    context = f"{_INSTRUCTIONS}\n\nCONTEXT:\n- Debate Topic: {debate_topic}\n"
+    if count_tokens(analysis) <= CHAT_FULL_CONTEXT_TOKENS:
+        context += f"- Initial Analysis:\n{analysis}"
+        if grounded:
+            context += "\n\nExcerpts of the round transcript or case relevant to each question are given just before it."
+        return context
+    sources = "analysis, round transcript or case" if grounded else "analysis"
+    return (
+        f"{context}- Outline of the initial analysis:\n{shorten(outline(split_sections(analysis)), CHAT_OUTLINE_TOKENS)}\n\n"
+        f"The parts of the {sources} relevant to each question are given just before it."
+    )
+
+
+def chat_messages(debate_topic: str, analysis: str, turns: list, summary: str = "", index: RetrievalIndex = None) -> list:
+    """
+    Messages for one chat turn.
+
+    Args:
+        debate_topic: The resolution
+        analysis: The feedback the chat is about
+        turns: Recent {"role", "content"} turns, ending with the current question
+        summary: Rolling summary of the turns before `turns`
+        index: Retrieval index of the analysis, transcript and case (backend.retrieval);
+            without one, long analyses are searched on their own
+
+    Returns:
+        [session prefix, summary?, earlier turns..., relevant excerpts?, current question]
+    """
+    messages = [{"role": "system", "content": session_prefix(debate_topic, analysis, grounded=index is not None)}]
+    if summary:
+        messages.append({"role": "system", "content": f"Summary of the earlier conversation:\n{summary}"})
+    messages.extend(turns[:-1])
+    full_analysis = count_tokens(analysis) <= CHAT_FULL_CONTEXT_TOKENS
+    if turns and (index is not None or not full_analysis):
+        if index is None:
+            index = analysis_index(analysis)
+        # An analysis already in the prefix is not repeated
+        sources = ("transcript", "case") if full_analysis else None
+        excerpts = relevant_chunks(index, turns[-1]["content"], sources=sources)
+        if excerpts:
+            messages.append({
+                "role": "system",
+                "content": "Excerpts relevant to the next question:\n\n"
+                + "\n\n".join(chunk.format() for chunk in excerpts),
+            })
+    messages.extend(turns[-1:])
+    return messages
+
+
+def split_history(turns: list, budget: int = None) -> int:
+    """
+    Index of the first turn kept verbatim: the newest turns that fit in `budget`
+    tokens stay, everything before is folded into the summary. Once the history
+    overflows, it is cut back to half the budget so the summary (and with it the
+    cached prompt prefix) is not rewritten on every turn.
+    """
+    budget = CHAT_HISTORY_TOKEN_BUDGET if budget is None else budget
+    sizes = [count_tokens(turn["content"]) for turn in turns]
+    if sum(sizes) <= budget:
+        return 0
+    kept, start = 0, len(turns)
+    while start > 0 and kept + sizes[start - 1] <= budget // 2:
+        start -= 1
+        kept += sizes[start]
+    # Always keep the newest turn, however long it is
+    return min(start, len(turns) - 1)
@@ -0,0 +1,115 @@
+"""
+Size-bounded key/value store of JSON values on local disk.
+Each entry is one file named after its key. Files are written atomically, and
+the least recently used entries are evicted once the directory grows past its
+size limit.
+"""
+import json
+import os
+import tempfile
+import threading
+
+# Puts between full rescans of the directory, which other processes also write to
+RESCAN_EVERY = 64
+
+
+class DiskCache:
+    """
+    Size-bounded LRU store of JSON values on local disk.
+    File modification times record recency, so the cache survives restarts
+    and can be shared by every worker process on the machine.
+    """
+
+    def __init__(self, directory: str, max_bytes: int):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        # Running total of the directory size since the last scan (None until the first one)
+        self._size = None
+        self._puts = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_bytes > 0
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.json")
+
+    def get(self, key: str):
+        """Return the value stored under `key`, or None on a miss."""
+        if not self.enabled:
+            return None
+        path = self._path(key)
+        try:
+            with open(path, "r", encoding="utf-8") as cache_file:
+                result = json.load(cache_file)
+            # Mark as recently used
+            os.utime(path)
+            return result
+        except (OSError, ValueError):
+            return None
+
+    def put(self, key: str, result: dict):
+        """Store `result` under `key` and evict old entries if the store is over its limit."""
+        if not self.enabled:
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        path = self._path(key)
+        fd, temp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as temp_file:
+                json.dump(result, temp_file)
+            written = os.path.getsize(temp_path)
+            try:
+                replaced = os.path.getsize(path)
+            except OSError:
+                replaced = 0
+            # Atomic rename so readers never see a partial entry
+            os.replace(temp_path, path)
+        except Exception:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+
+        # Scan the directory only when the running total says it is over the limit
+        # (or every RESCAN_EVERY puts, to pick up other processes' writes)
+        with self._lock:
+            self._puts += 1
+            if self._size is not None:
+                self._size += written - replaced
+            due = self._size is None or self._size > self.max_bytes or self._puts % RESCAN_EVERY == 0
+        if due:
+            self.evict()
+
+    def evict(self) -> int:
+        """Delete least recently used entries until the store fits its size limit."""
+        with self._lock:
+            entries = []
+            try:
+                with os.scandir(self.directory) as it:
+                    for entry in it:
+                        if not entry.name.endswith(".json"):
+                            continue
+                        try:
+                            stat = entry.stat()
+                        except FileNotFoundError:
+                            # Evicted by another process during the scan
+                            continue
+                        entries.append((stat.st_mtime, stat.st_size, entry.path))
+            except FileNotFoundError:
+                self._size = 0
+                return 0
+
+            total = sum(size for _, size, _ in entries)
+            removed = 0
+            for _, size, path in sorted(entries):
+                if total <= self.max_bytes:
+                    break
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+                total -= size
+                removed += 1
+            self._size = total
+            return removed
@@ -0,0 +1,200 @@
+"""
+Single-pass reader for DOCX debate files.
+Streams word/document.xml out of the zip with iterparse and reports every run's
+text together with the formatting that marks what a debater reads aloud
+(highlight, shading) and how cards are emphasized (bold, underline, size).
+Character and paragraph styles are resolved, so template-based files such as
+Verbatim are read the same way as directly formatted ones.
+"""
+import re
+import zipfile
+import xml.etree.ElementTree as ET
+from dataclasses import dataclass, field
+
+_W = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+
+# Shading fills that do not mark text
+_NO_FILL = {"", "auto", "ffffff", "none"}
+# Paragraph styles that hold structure rather than card text: headings, and the
+# Verbatim template's Pocket / Hat / Block / Tag styles
+_HEADING_STYLE = re.compile(r"^(heading\s*[1-4]|title|pocket|hat|block|tag)$", re.IGNORECASE)
+# Outline level of each heading style; level 4 headings are card tags
+_HEADING_LEVELS = {"title": 0, "pocket": 1, "hat": 2, "block": 3, "tag": 4}
+# Run properties tracked while reading
+_PROPERTIES = ("highlight", "shading", "bold", "underline", "size")
+
+
+@dataclass
+class DocxRun:
+    text: str
+    highlight: bool = False
+    shading: bool = False
+    bold: bool = False
+    underline: bool = False
+    # Font size in points (None when the document does not set one)
+    size: float = None
+
+    @property
+    def marked(self) -> bool:
+        """Highlighted or shaded: the part of a card that is read in round."""
+        return self.highlight or self.shading
+
+
+@dataclass
+class DocxParagraph:
+    style: str
+    runs: list = field(default_factory=list)
+
+    @property
+    def text(self) -> str:
+        return "".join(run.text for run in self.runs)
+
+    @property
+    def is_heading(self) -> bool:
+        return bool(_HEADING_STYLE.match(self.style or ""))
+
+    @property
+    def heading_level(self) -> int:
+        """Outline level of a heading (4 for card tags), None for body paragraphs."""
+        if not self.is_heading:
+            return None
+        name = self.style.lower().replace(" ", "")
+        return _HEADING_LEVELS[name] if name in _HEADING_LEVELS else int(name[-1])
+
+    @property
+    def marked_text(self) -> str:
+        """
+        Highlighted and shaded text of the paragraph.
+        Skipped words become a single space, but letters highlighted inside words
+        (e.g. the "a" and "i" of "artificial intelligence") are joined.
+        """
+        runs = self.runs
+        pieces = []
+        skipped = ""
+        for index, run in enumerate(runs):
+            if not run.marked:
+                skipped += run.text
+                continue
+            if pieces and skipped and any(c.isspace() for c in skipped) and not skipped[-1].isalnum():
+                # Only the first letters of both words were read: an acronym
+                following = runs[index + 1] if index + 1 < len(runs) else None
+                acronym = (
+                    skipped[0].isalnum()
+                    and run.text[-1:].isalnum()
+                    and following is not None
+                    and not following.marked
+                    and following.text[:1].isalnum()
+                )
+                if not acronym:
+                    pieces.append(" ")
+            pieces.append(run.text)
+            skipped = ""
+        return " ".join("".join(pieces).split())
+
+
+def _toggle(element) -> bool:
+    # <w:b/> is on; <w:b w:val="0"/> (or "false") turns an inherited value off
+    return element.get(_W + "val", "true").lower() not in ("0", "false", "off", "none")
+
+
+def _run_properties(rPr) -> dict:
+    """Formatting set directly in a <w:rPr> element (only the properties present)."""
+    properties = {}
+    if rPr is None:
+        return properties
+    for child in rPr:
+        tag = child.tag
+        if tag == _W + "highlight":
+            properties["highlight"] = child.get(_W + "val", "none").lower() != "none"
+        elif tag == _W + "shd":
+            properties["shading"] = (child.get(_W + "fill") or "").lower() not in _NO_FILL
+        elif tag == _W + "b":
+            properties["bold"] = _toggle(child)
+        elif tag == _W + "u":
+            properties["underline"] = _toggle(child)
+        elif tag == _W + "sz":
+            try:
+                properties["size"] = int(child.get(_W + "val")) / 2
+            except (TypeError, ValueError):
+                pass
+    return properties
+
+
+def _read_styles(archive: zipfile.ZipFile) -> dict:
+    """Resolved run formatting of every paragraph and character style, by style id."""
+    try:
+        root = ET.fromstring(archive.read("word/styles.xml"))
+    except KeyError:
+        return {}
+
+    own, based_on = {}, {}
+    for style in root.iter(_W + "style"):
+        style_id = style.get(_W + "styleId")
+        own[style_id] = _run_properties(style.find(_W + "rPr"))
+        parent = style.find(_W + "basedOn")
+        if parent is not None:
+            based_on[style_id] = parent.get(_W + "val")
+
+    def resolve(style_id, seen=()):
+        if style_id not in own or style_id in seen:
+            return {}
+        return {**resolve(based_on.get(style_id), seen + (style_id,)), **own[style_id]}
+
+    return {style_id: resolve(style_id) for style_id in own}
+
+
+def _run_text(run) -> str:
+    pieces = []
+    for child in run:
+        tag = child.tag
+        if tag == _W + "t":
+            pieces.append(child.text or "")
+        elif tag == _W + "tab":
+            pieces.append("\t")
+        elif tag in (_W + "br", _W + "cr"):
+            pieces.append("\n")
+        elif tag == _W + "noBreakHyphen":
+            pieces.append("-")
+    return "".join(pieces)
+
+
+def read_docx(source):
+    """
+    Read the paragraphs of a DOCX file in document order.
+
+    Args:
+        source: Path or binary file object of the .docx file
+
+    Yields:
+        DocxParagraph objects whose runs carry resolved formatting
+    """
+    with zipfile.ZipFile(source) as archive:
+        styles = _read_styles(archive)
+        # Paragraphs can nest (text boxes), so runs are collected on a stack
+        stack = []
+        with archive.open("word/document.xml") as document:
+            for event, element in ET.iterparse(document, events=("start", "end")):
+                tag = element.tag
+                if event == "start":
+                    if tag == _W + "p":
+                        stack.append(DocxParagraph(style=None))
+                    continue
+
+                if tag == _W + "pStyle" and stack:
+                    stack[-1].style = element.get(_W + "val")
+                elif tag == _W + "r" and stack:
+                    text = _run_text(element)
+                    if text:
+                        properties = dict(styles.get(stack[-1].style, {}))
+                        rPr = element.find(_W + "rPr")
+                        if rPr is not None:
+                            character_style = rPr.find(_W + "rStyle")
+                            if character_style is not None:
+                                properties.update(styles.get(character_style.get(_W + "val"), {}))
+                        properties.update(_run_properties(rPr))
+                        stack[-1].runs.append(DocxRun(text, **{k: properties[k] for k in _PROPERTIES if k in properties}))
+                    element.clear()
+                elif tag == _W + "p":
+                    paragraph = stack.pop()
+                    element.clear()
+                    yield paragraph
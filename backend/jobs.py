@@ -0,0 +1,411 @@
+"""
+Background job subsystem for long-running analyses.
+Submitting a job returns an id immediately; status, per-stage progress and the
+result are read back through the /jobs/ endpoints while workers run the pipeline.
+
+Jobs live in a pluggable store (SQLite by default, in-memory for tests and
+single-process use). Because workers claim jobs from the store, web and worker
+processes can be scaled separately by pointing them at the same database and
+running `python -m backend.jobs` for dedicated workers.
+"""
+import json
+import os
+import sqlite3
+from abc import ABC, abstractmethod
+import tempfile
+import threading
+import time
+import uuid
+from fastapi import APIRouter
+from fastapi.responses import JSONResponse
+
+# "sqlite" or "memory"
+JOB_STORE = os.getenv("JOB_STORE", "sqlite")
+JOBS_DB_PATH = os.getenv("JOBS_DB_PATH", os.path.join(tempfile.gettempdir(), "coachr_jobs.db"))
+# Directory holding job inputs (e.g. uploaded audio) until the job finishes
+JOBS_DATA_DIR = os.getenv("JOBS_DATA_DIR", os.path.join(tempfile.gettempdir(), "coachr_jobs"))
+# Worker threads started in this process (0 leaves jobs to dedicated worker processes)
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "2"))
+# Finished jobs older than this are purged from the store
+JOB_RETENTION_SECONDS = int(os.getenv("JOB_RETENTION_SECONDS", str(24 * 3600)))
+# Running jobs with no progress update for this long are assumed to belong to a dead worker
+JOB_STALE_SECONDS = int(os.getenv("JOB_STALE_SECONDS", "3600"))
+
+QUEUED, RUNNING, COMPLETED, FAILED = "queued", "running", "completed", "failed"
+PENDING, DONE = "pending", "done"
+
+# Pipeline stages and their share of the overall progress
+STAGE_WEIGHTS = {"decode": 0.1, "transcribe": 0.6, "llm": 0.3}
+
+
+def new_stages(stages=STAGE_WEIGHTS) -> dict:
+    return {stage: PENDING for stage in stages}
+
+
+def stage_progress(stages: dict) -> float:
+    """Overall progress (0-1) from the per-stage states."""
+    total = sum(STAGE_WEIGHTS.get(stage, 0) for stage in stages) or 1
+    done = sum(STAGE_WEIGHTS.get(stage, 0) for stage, state in stages.items() if state == DONE)
+    return round(done / total, 3)
+
+
+class JobStore(ABC):
+    """
+    Interface for job persistence. Jobs are plain dicts with the keys
+    id, kind, status, stages, progress, params, result, error, created_at, updated_at.
+    """
+
+    @abstractmethod
+    def create(self, kind: str, params: dict, stages: dict = None) -> dict:
+        ...
+
+    @abstractmethod
+    def get(self, job_id: str):
+        ...
+
+    @abstractmethod
+    def update(self, job_id: str, **fields):
+        ...
+
+    @abstractmethod
+    def claim(self, kinds):
+        """Atomically move the oldest queued job of one of `kinds` to running and return it."""
+
+    @abstractmethod
+    def purge(self, older_than: float) -> int:
+        """Delete finished jobs last updated before `older_than` (epoch seconds)."""
+
+    @abstractmethod
+    def recover(self, stale_before: float) -> int:
+        """
+        Fail running jobs last updated before `stale_before`, i.e. jobs left behind
+        by a worker that died. Returns the number of jobs changed.
+        """
+
+    def set_stage(self, job_id: str, stage: str, state: str):
+        job = self.get(job_id)
+        if job is None:
+            return
+        stages = dict(job["stages"])
+        stages[stage] = state
+        self.update(job_id, stages=stages, progress=stage_progress(stages))
+
+    @staticmethod
+    def _new_job(kind, params, stages):
+        now = time.time()
+        stages = stages or new_stages()
+        return {
+            "id": uuid.uuid4().hex,
+            "kind": kind,
+            "status": QUEUED,
+            "stages": stages,
+            "progress": stage_progress(stages),
+            "params": params,
+            "result": None,
+            "error": None,
+            "created_at": now,
+            "updated_at": now,
+        }
+
+
+class InMemoryJobStore(JobStore):
+    """Job store for a single process; jobs are lost on restart."""
+
+    def __init__(self):
+        self._jobs = {}
+        self._lock = threading.Lock()
+
+    def create(self, kind, params, stages=None):
+        job = self._new_job(kind, params, stages)
+        with self._lock:
+            self._jobs[job["id"]] = job
+        return dict(job)
+
+    def get(self, job_id):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return dict(job) if job is not None else None
+
+    def update(self, job_id, **fields):
+        with self._lock:
+            if job_id in self._jobs:
+                self._jobs[job_id].update(fields, updated_at=time.time())
+
+    def claim(self, kinds):
+        with self._lock:
+            queued = [job for job in self._jobs.values() if job["status"] == QUEUED and job["kind"] in kinds]
+            if not queued:
+                return None
+            job = min(queued, key=lambda j: j["created_at"])
+            job.update(status=RUNNING, updated_at=time.time())
+            return dict(job)
+
+    def purge(self, older_than):
+        with self._lock:
+            expired = [job_id for job_id, job in self._jobs.items()
+                       if job["status"] in (COMPLETED, FAILED) and job["updated_at"] < older_than]
+            for job_id in expired:
+                del self._jobs[job_id]
+        return len(expired)
+
+    def recover(self, stale_before):
+        return 0
+
+
+class SQLiteJobStore(JobStore):
+    """Job store backed by a SQLite file that survives restarts and can be shared between processes."""
+
+    _JSON_FIELDS = ("stages", "params", "result")
+
+    def __init__(self, path: str = JOBS_DB_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False, isolation_level=None)
+        self._conn.row_factory = sqlite3.Row
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                """CREATE TABLE IF NOT EXISTS jobs (
+                    id TEXT PRIMARY KEY,
+                    kind TEXT NOT NULL,
+                    status TEXT NOT NULL,
+                    stages TEXT NOT NULL,
+                    progress REAL NOT NULL,
+                    params TEXT,
+                    result TEXT,
+                    error TEXT,
+                    created_at REAL NOT NULL,
+                    updated_at REAL NOT NULL
+                )"""
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS jobs_status_created ON jobs (status, created_at)")
+
+    def _row_to_job(self, row):
+        if row is None:
+            return None
+        job = dict(row)
+        for field in self._JSON_FIELDS:
+            job[field] = json.loads(job[field]) if job[field] is not None else None
+        return job
+
+    def create(self, kind, params, stages=None):
+        job = self._new_job(kind, params, stages)
+        row = dict(job)
+        for field in self._JSON_FIELDS:
+            row[field] = json.dumps(row[field]) if row[field] is not None else None
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO jobs VALUES (:id, :kind, :status, :stages, :progress, :params, :result, :error, :created_at, :updated_at)",
+                row,
+            )
+        return job
+
+    def get(self, job_id):
+        with self._lock:
+            row = self._conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return self._row_to_job(row)
+
+    def update(self, job_id, **fields):
+        fields["updated_at"] = time.time()
+        for field in self._JSON_FIELDS:
+            if field in fields and fields[field] is not None:
+                fields[field] = json.dumps(fields[field])
+        assignments = ", ".join(f"{name} = :{name}" for name in fields)
+        with self._lock:
+            self._conn.execute(f"UPDATE jobs SET {assignments} WHERE id = :job_id", dict(fields, job_id=job_id))
+
+    def claim(self, kinds):
+        kinds = list(kinds)
+        if not kinds:
+            return None
+        placeholders = ", ".join("?" for _ in kinds)
+        with self._lock:
+            # BEGIN IMMEDIATE takes the write lock so two workers never claim the same job
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._conn.execute(
+                    f"SELECT id FROM jobs WHERE status = ? AND kind IN ({placeholders}) ORDER BY created_at LIMIT 1",
+                    [QUEUED, *kinds],
+                ).fetchone()
+                if row is not None:
+                    self._conn.execute(
+                        "UPDATE jobs SET status = ?, updated_at = ? WHERE id = ?",
+                        (RUNNING, time.time(), row["id"]),
+                    )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        return self.get(row["id"]) if row is not None else None
+
+    def purge(self, older_than):
+        with self._lock:
+            cursor = self._conn.execute(
+                "DELETE FROM jobs WHERE status IN (?, ?) AND updated_at < ?",
+                (COMPLETED, FAILED, older_than),
+            )
+        return cursor.rowcount
+
+    def recover(self, stale_before):
+        with self._lock:
+            cursor = self._conn.execute(
+                "UPDATE jobs SET status = ?, error = ?, updated_at = ? WHERE status = ? AND updated_at < ?",
+                (FAILED, "Job interrupted by a worker restart. Please submit it again.", time.time(), RUNNING, stale_before),
+            )
+        return cursor.rowcount
+
+
+def create_job_store(kind: str = JOB_STORE) -> JobStore:
+    if kind == "memory":
+        return InMemoryJobStore()
+    if kind == "sqlite":
+        return SQLiteJobStore(JOBS_DB_PATH)
+    raise ValueError(f"Unsupported job store: {kind}")
+
+
+class JobQueue:
+    """
+    Runs queued jobs on worker threads.
+
+    Handlers are registered per job kind and called as handler(job, report), where
+    report(stage, state, result=None) records stage progress and optionally a partial result. The handler's return value is
+    stored as the job result; an exception fails the job with its message.
+    """
+
+    def __init__(self, store: JobStore, workers: int = JOB_WORKERS, poll_interval: float = 1.0):
+        self.store = store
+        self.workers = workers
+        self.poll_interval = poll_interval
+        self._handlers = {}
+        self._threads = []
+        self._wakeup = threading.Event()
+        self._stopping = threading.Event()
+        self._lock = threading.Lock()
+
+    def register(self, kind: str, handler):
+        self._handlers[kind] = handler
+
+    def submit(self, kind: str, params: dict, stages: dict = None) -> dict:
+        if kind not in self._handlers:
+            raise ValueError(f"No handler registered for job kind: {kind}")
+        self.store.purge(time.time() - JOB_RETENTION_SECONDS)
+        job = self.store.create(kind, params, stages)
+        self.start()
+        self._wakeup.set()
+        return job
+
+    def start(self):
+        """Start the worker threads once per process."""
+        with self._lock:
+            if self._threads or self.workers <= 0:
+                return
+            self.store.recover(time.time() - JOB_STALE_SECONDS)
+            self._stopping.clear()
+            for i in range(self.workers):
+                thread = threading.Thread(target=self._work, name=f"job-worker-{i}", daemon=True)
+                thread.start()
+                self._threads.append(thread)
+
+    def stop(self, timeout: float = None):
+        self._stopping.set()
+        self._wakeup.set()
+        with self._lock:
+            threads, self._threads = self._threads, []
+        for thread in threads:
+            thread.join(timeout)
+
+    def run_next(self) -> bool:
+        """Claim and run a single job. Returns False when nothing was queued."""
+        job = self.store.claim(self._handlers)
+        if job is None:
+            return False
+        self._run(job)
+        return True
+
+    def _work(self):
+        while not self._stopping.is_set():
+            if not self.run_next():
+                self._wakeup.wait(self.poll_interval)
+                self._wakeup.clear()
+
+    def _run(self, job):
+        job_id = job["id"]
+
+        def report(stage, state, result=None):
+            self.store.set_stage(job_id, stage, state)
+            if result is not None:
+                # Partial result published while the job is still running
+                self.store.update(job_id, result=result)
+
+        try:
+            result = self._handlers[job["kind"]](job, report)
+        except Exception as e:
+            current = self.store.get(job_id) or job
+            stages = {stage: FAILED if state == RUNNING else state for stage, state in current["stages"].items()}
+            self.store.update(job_id, status=FAILED, error=str(e), stages=stages)
+        else:
+            self.store.update(job_id, status=COMPLETED, result=result, progress=1.0)
+
+
+# Shared queue for the whole process
+job_queue = JobQueue(create_job_store())
+
+
+def job_status(job: dict) -> dict:
+    """Public view of a job without its input parameters or result."""
+    return {
+        "job_id": job["id"],
+        "kind": job["kind"],
+        "status": job["status"],
+        "stages": job["stages"],
+        "progress": job["progress"],
+        "error": job["error"],
+        # Partial output (e.g. feedback streamed so far) while the job is running
+        "partial_result": job["result"] if job["status"] == RUNNING else None,
+        "created_at": job["created_at"],
+        "updated_at": job["updated_at"],
+        "status_url": f"/jobs/{job['id']}",
+        "result_url": f"/jobs/{job['id']}/result",
+    }
+
+
+router = APIRouter()
+
+# Plain def routes run in FastAPI's threadpool, so a store read waiting on a
+# worker's write lock does not hold up the event loop
+@router.get("/jobs/{job_id}")
+def get_job(job_id: str):
+    """Return the status and per-stage progress of a job."""
+    job = job_queue.store.get(job_id)
+    if job is None:
+        return JSONResponse(content={"error": "Job not found"}, status_code=404)
+    return JSONResponse(content=job_status(job), status_code=200)
+
+@router.get("/jobs/{job_id}/result")
+def get_job_result(job_id: str):
+    """Return the result of a finished job (202 while it is still running)."""
+    job = job_queue.store.get(job_id)
+    if job is None:
+        return JSONResponse(content={"error": "Job not found"}, status_code=404)
+    if job["status"] == FAILED:
+        return JSONResponse(content={"error": job["error"], **job_status(job)}, status_code=500)
+    if job["status"] != COMPLETED:
+        return JSONResponse(content=job_status(job), status_code=202)
+    return JSONResponse(content=job["result"], status_code=200)
+
+
+if __name__ == "__main__":
+    # Dedicated worker process: register the pipelines and work the shared store
+    # Import through the package so handlers land on the same queue instance
+    import backend.transcription  # noqa: F401  (registers job handlers)
+    from backend.jobs import job_queue as worker_queue
+
+    worker_queue.workers = max(1, JOB_WORKERS)
+    worker_queue.start()
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        worker_queue.stop()
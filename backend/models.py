@@ -0,0 +1,140 @@
+"""
+Process-wide registry of Whisper models.
+Models are loaded lazily the first time they are requested, shared by every caller
+in the process, and dropped again once they have sat idle for too long.
+"""
+import gc
+import os
+import threading
+import time
+
+SUPPORTED_MODELS = ("tiny.en", "base.en", "small.en")
+
+# Model used when a caller does not ask for a specific size
+DEFAULT_MODEL = os.getenv("WHISPER_MODEL", "tiny.en")
+
+# Approximate memory (MB) of a process holding each model: torch runtime plus fp32 weights
+MODEL_MEMORY_MB = {"tiny.en": 500, "base.en": 700, "small.en": 1500}
+
+# Seconds a model may go unused before it is evicted (0 disables eviction)
+IDLE_TIMEOUT = float(os.getenv("WHISPER_MODEL_IDLE_SECONDS", "900"))
+
+
+def resolve_model_name(name: str = None) -> str:
+    """Return a supported model name, falling back to the configured default."""
+    name = (name or DEFAULT_MODEL).strip()
+    if name not in SUPPORTED_MODELS:
+        raise ValueError(f"Unsupported Whisper model: {name}. Choose one of {', '.join(SUPPORTED_MODELS)}")
+    return name
+
+
+def _load_whisper_model(name: str):
+    import whisper
+    return whisper.load_model(name)
+
+
+class ModelRegistry:
+    """
+    Lazily loads each Whisper model once and hands out the shared instance.
+
+    Args:
+        loader: Callable taking a model name and returning a loaded model
+        idle_timeout: Seconds of inactivity after which a model is evicted
+    """
+
+    def __init__(self, loader=_load_whisper_model, idle_timeout: float = IDLE_TIMEOUT):
+        self._loader = loader
+        self.idle_timeout = idle_timeout
+        self._models = {}      # name -> [model, last_used]
+        self._load_locks = {}  # name -> lock held while that model loads
+        self._lock = threading.Lock()
+        self._reaper = None
+
+    def get(self, name: str = None):
+        """Return the shared model for `name`, loading it on first use."""
+        name = resolve_model_name(name)
+
+        with self._lock:
+            entry = self._models.get(name)
+            if entry is not None:
+                entry[1] = time.monotonic()
+                return entry[0]
+            load_lock = self._load_locks.setdefault(name, threading.Lock())
+
+        # Load outside the registry lock so other models stay available,
+        # but make sure concurrent callers of the same model only load it once
+        with load_lock:
+            with self._lock:
+                entry = self._models.get(name)
+                if entry is not None:
+                    entry[1] = time.monotonic()
+                    return entry[0]
+
+            model = self._loader(name)
+
+            with self._lock:
+                self._models[name] = [model, time.monotonic()]
+
+        self._ensure_reaper()
+        return model
+
+    def loaded(self) -> list:
+        """Names of the models currently held in memory."""
+        with self._lock:
+            return list(self._models)
+
+    def evict_idle(self, now: float = None) -> list:
+        """
+        Drop models that have not been used within the idle timeout.
+        Callers still holding a reference keep their model until they finish.
+
+        Returns:
+            Names of the evicted models
+        """
+        if self.idle_timeout <= 0:
+            return []
+
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            expired = [name for name, (_, last_used) in self._models.items()
+                       if now - last_used >= self.idle_timeout]
+            for name in expired:
+                del self._models[name]
+
+        if expired:
+            gc.collect()
+        return expired
+
+    def clear(self):
+        """Drop every loaded model."""
+        with self._lock:
+            self._models.clear()
+        gc.collect()
+
+    def _ensure_reaper(self):
+        if self.idle_timeout <= 0:
+            return
+        with self._lock:
+            if self._reaper is not None and self._reaper.is_alive():
+                return
+            self._reaper = threading.Thread(target=self._reap, name="whisper-model-reaper", daemon=True)
+            self._reaper.start()
+
+    def _reap(self):
+        interval = max(1.0, min(self.idle_timeout / 2, 60.0))
+        while True:
+            time.sleep(interval)
+            self.evict_idle()
+            with self._lock:
+                if not self._models:
+                    self._reaper = None
+                    return
+
+
+# Shared registry for the whole process
+registry = ModelRegistry()
+
+
+def get_model(name: str = None):
+    """Return the shared Whisper model for `name` (defaults to WHISPER_MODEL)."""
+    return registry.get(name)
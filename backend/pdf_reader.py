@@ -0,0 +1,255 @@
+"""
+Layout-aware reader for PDF debate files.
+Walks every page's content stream with PyPDF2 and reports each piece of text
+together with its position, font weight and whether it sits on a highlight:
+either a highlight annotation (added in a PDF viewer) or a filled rectangle
+drawn behind the text (how Word and Google Docs export highlighting).
+Lines are grouped into the same paragraph records as backend.docx_reader, so
+card-format PDFs go through the same card builder as DOCX files.
+Large files are read page-parallel in a process pool and pages are yielded in
+order as soon as they are ready; inside an extraction worker process, which
+already runs in parallel with other uploads, pages are read serially.
+"""
+import io
+import os
+import re
+import tempfile
+from concurrent.futures import FIRST_COMPLETED, wait
+from dataclasses import dataclass, field
+
+import PyPDF2
+
+from backend.docx_reader import DocxParagraph, DocxRun
+from backend.workers import get_pdf_executor, in_extraction_worker
+
+# Files with at least this many pages are read in parallel
+PDF_PARALLEL_MIN_PAGES = int(os.getenv("PDF_PARALLEL_MIN_PAGES", "16"))
+# Pages read by one worker task
+PDF_PAGES_PER_TASK = int(os.getenv("PDF_PAGES_PER_TASK", "8"))
+
+_BOLD_FONT = re.compile(r"bold|black|heavy|semibold|demibold", re.IGNORECASE)
+# Font descriptor flag set by fonts that are always drawn bold
+_FORCE_BOLD = 1 << 18
+# Filled rectangles thinner than this (in points) are rules and underlines
+_MIN_HIGHLIGHT_HEIGHT = 4.0
+# Average glyph width as a fraction of the font size, used to estimate text width
+_GLYPH_WIDTH = 0.5
+# A gap between lines this many times the font size starts a new paragraph
+_PARAGRAPH_GAP = 1.6
+
+
+@dataclass
+class PdfPage:
+    number: int
+    paragraphs: list = field(default_factory=list)
+
+    @property
+    def text(self) -> str:
+        return "\n".join(paragraph.text for paragraph in self.paragraphs)
+
+
+def _transform(matrix, x: float, y: float) -> tuple:
+    return (
+        matrix[0] * x + matrix[2] * y + matrix[4],
+        matrix[1] * x + matrix[3] * y + matrix[5],
+    )
+
+
+def _is_bold(font) -> bool:
+    if not font:
+        return False
+    if _BOLD_FONT.search(str(font.get("/BaseFont", ""))):
+        return True
+    descriptor = font.get("/FontDescriptor")
+    if descriptor is not None:
+        descriptor = descriptor.get_object()
+        if float(descriptor.get("/FontWeight", 0)) >= 600 or int(descriptor.get("/Flags", 0)) & _FORCE_BOLD:
+            return True
+    return False
+
+
+def _is_highlight_color(color: tuple) -> bool:
+    # White fills are page backgrounds; black fills are rules, boxes and bullets
+    return bool(color) and not all(c >= 0.99 for c in color) and not all(c <= 0.01 for c in color)
+
+
+def _annotation_regions(page) -> list:
+    """Bounding boxes (x0, y0, x1, y1) of the page's highlight annotations."""
+    regions = []
+    for annotation in page.get("/Annots") or []:
+        annotation = annotation.get_object()
+        if annotation.get("/Subtype") != "/Highlight":
+            continue
+        points = [float(value) for value in annotation.get("/QuadPoints") or annotation.get("/Rect") or []]
+        # Every highlighted line is its own quadrilateral of four points
+        step = 8 if annotation.get("/QuadPoints") else 4
+        for i in range(0, len(points) - step + 1, step):
+            xs, ys = points[i:i + step:2], points[i + 1:i + step:2]
+            regions.append((min(xs), min(ys), max(xs), max(ys)))
+    return regions
+
+
+def _inside(regions: list, x: float, y: float) -> bool:
+    return any(x0 <= x <= x1 and y0 <= y <= y1 for x0, y0, x1, y1 in regions)
+
+
+def _read_page(page, number: int) -> PdfPage:
+    regions = _annotation_regions(page)
+    pending_rects = []
+    fill = ()
+    chunks = []
+    start = None
+
+    def before(operator, operands, cm, tm):
+        nonlocal fill, pending_rects, start
+        if operator in (b"rg", b"g", b"k", b"sc", b"scn"):
+            try:
+                values = tuple(float(value) for value in operands)
+            except (TypeError, ValueError):
+                return
+            # Convert CMYK to RGB so every color model compares the same way
+            if operator == b"k" and len(values) == 4:
+                c, m, y, k = values
+                values = ((1 - c) * (1 - k), (1 - m) * (1 - k), (1 - y) * (1 - k))
+            fill = values
+        elif operator == b"re":
+            x, y, width, height = (float(value) for value in operands)
+            corners = [_transform(cm, x, y), _transform(cm, x + width, y + height)]
+            xs, ys = [c[0] for c in corners], [c[1] for c in corners]
+            pending_rects.append((min(xs), min(ys), max(xs), max(ys)))
+        elif operator in (b"f", b"F", b"f*", b"B", b"B*", b"b", b"b*"):
+            if _is_highlight_color(fill):
+                regions.extend(rect for rect in pending_rects if rect[3] - rect[1] >= _MIN_HIGHLIGHT_HEIGHT)
+            pending_rects = []
+        elif operator in (b"n", b"S", b"s"):
+            pending_rects = []
+        elif operator in (b"Tj", b"TJ", b"'", b'"') and start is None:
+            start = (_transform(cm, tm[4], tm[5]), abs(cm[3] * tm[3]) or 1.0)
+
+    def text_visitor(text, cm, tm, font, font_size):
+        nonlocal start
+        if not text:
+            return
+        if start is None:
+            position, scale = _transform(cm, tm[4], tm[5]), abs(cm[3] * tm[3]) or 1.0
+        else:
+            position, scale = start
+        start = None
+        size = (font_size or 0) * scale
+        x, y = position
+        # Probe the start and the (estimated) middle of the text, a little above the baseline
+        probe_y = y + size * 0.3
+        middle = x + len(text.strip()) * size * _GLYPH_WIDTH / 2
+        highlighted = _inside(regions, x + 1, probe_y) or _inside(regions, middle, probe_y)
+        chunks.append((text, y, size, highlighted, _is_bold(font)))
+
+    page.extract_text(visitor_operand_before=before, visitor_text=text_visitor)
+    return PdfPage(number, _paragraphs(chunks))
+
+
+def _paragraphs(chunks: list) -> list:
+    """Group text chunks into lines and lines into paragraphs."""
+    lines = [[]]
+    line_positions = [None]
+    for text, y, size, highlighted, bold in chunks:
+        for index, piece in enumerate(text.split("\n")):
+            if index > 0:
+                lines.append([])
+                line_positions.append(None)
+            if piece:
+                lines[-1].append(DocxRun(piece, highlight=highlighted, bold=bold, size=size or None))
+                if line_positions[-1] is None:
+                    line_positions[-1] = (y, size)
+
+    paragraphs = []
+    previous = None
+    for runs, position in zip(lines, line_positions):
+        if not "".join(run.text for run in runs).strip():
+            continue
+        bold = all(run.bold for run in runs if run.text.strip())
+        if paragraphs and previous is not None and position is not None:
+            (last_y, last_size), last_bold = previous
+            gap = abs(last_y - position[0])
+            same_paragraph = bold == last_bold and gap <= _PARAGRAPH_GAP * max(last_size, position[1], 1.0)
+        else:
+            same_paragraph = False
+        if same_paragraph:
+            paragraph = paragraphs[-1]
+            # Wrapped lines are joined with a space, as in the original paragraph
+            if not paragraph.runs[-1].text.endswith((" ", "-")):
+                paragraph.runs.append(DocxRun(" ", highlight=runs[0].highlight and paragraph.runs[-1].highlight))
+            paragraph.runs.extend(runs)
+        else:
+            paragraphs.append(DocxParagraph(style=None, runs=list(runs)))
+        previous = ((position or (0.0, 0.0)), bold)
+    return paragraphs
+
+
+def _read_pages(path: str, first: int, last: int) -> list:
+    """Read pages [first, last) of the PDF at `path` (runs in a worker process)."""
+    reader = PyPDF2.PdfReader(path)
+    return [_read_page(reader.pages[index], index + 1) for index in range(first, last)]
+
+
+def _source_path(source):
+    """Path of the file on disk behind `source`, or None for in-memory data."""
+    if isinstance(source, (str, os.PathLike)):
+        return os.fspath(source)
+    name = getattr(source, "name", None)
+    return name if isinstance(name, str) and os.path.isfile(name) else None
+
+
+def read_pdf(source):
+    """
+    Read the pages of a PDF file in order.
+
+    Files with PDF_PARALLEL_MIN_PAGES pages or more are split into batches of
+    PDF_PAGES_PER_TASK pages that are read in the PDF process pool; each page is
+    yielded as soon as it and every page before it are done. Files on disk are
+    read in place; in-memory uploads are copied to a temporary file for the pool.
+
+    Args:
+        source: Path or binary file object of the .pdf file
+
+    Yields:
+        PdfPage objects whose paragraphs carry bold and highlight information
+    """
+    path = _source_path(source)
+    data = None if path else source.read()
+    reader = PyPDF2.PdfReader(path or io.BytesIO(data))
+    count = len(reader.pages)
+
+    if count < PDF_PARALLEL_MIN_PAGES or in_extraction_worker():
+        for index, page in enumerate(reader.pages):
+            yield _read_page(page, index + 1)
+        return
+
+    temp_path = None
+    if path is None:
+        # Workers open the file themselves; a temporary copy avoids pickling it per task
+        handle, temp_path = tempfile.mkstemp(suffix=".pdf")
+        with os.fdopen(handle, "wb") as f:
+            f.write(data)
+        path = temp_path
+    del data, reader
+    try:
+        executor = get_pdf_executor()
+        step = max(1, PDF_PAGES_PER_TASK)
+        futures = {executor.submit(_read_pages, path, first, min(first + step, count)): first for first in range(0, count, step)}
+        done_batches = {}
+        next_first = 0
+        pending = set(futures)
+        try:
+            while pending:
+                finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    done_batches[futures[future]] = future.result()
+                while next_first in done_batches:
+                    yield from done_batches.pop(next_first)
+                    next_first += step
+        finally:
+            for future in pending:
+                future.cancel()
+    finally:
+        if temp_path:
+            os.remove(temp_path)
@@ -0,0 +1,201 @@
+"""
+Client-side scheduling of Azure OpenAI calls.
+Token buckets keep each process under its requests-per-minute and tokens-per-minute
+quota, waiting callers are admitted in priority order (interactive chat before bulk
+analysis), and throttled or transient failures are retried with jittered exponential
+backoff that honors the server's Retry-After hint.
+"""
+import asyncio
+import heapq
+import itertools
+import os
+import random
+import threading
+import time
+
+import openai
+from backend.tokens import count_message_tokens
+
+# Per-process quota (0 disables the limit); split the deployment's quota across processes
+AZURE_OPENAI_RPM = int(os.getenv("AZURE_OPENAI_RPM", "0"))
+AZURE_OPENAI_TPM = int(os.getenv("AZURE_OPENAI_TPM", "0"))
+# Completion tokens reserved per call until the real usage is known
+AZURE_OPENAI_COMPLETION_RESERVE = int(os.getenv("AZURE_OPENAI_COMPLETION_RESERVE", "1500"))
+AZURE_OPENAI_MAX_RETRIES = int(os.getenv("AZURE_OPENAI_MAX_RETRIES", "5"))
+AZURE_OPENAI_BACKOFF_BASE = float(os.getenv("AZURE_OPENAI_BACKOFF_BASE", "1"))
+AZURE_OPENAI_BACKOFF_MAX = float(os.getenv("AZURE_OPENAI_BACKOFF_MAX", "60"))
+
+# Lower values are admitted first
+PRIORITY_INTERACTIVE = 0
+PRIORITY_BULK = 10
+
+# How often callers queued behind a higher priority request re-check the queue
+_QUEUE_POLL_SECONDS = 0.05
+
+
+class TokenBucket:
+    """
+    Continuously refilling bucket holding at most one minute of quota.
+    A rate of 0 means unlimited.
+    """
+
+    def __init__(self, per_minute: int, clock=time.monotonic):
+        self.per_minute = per_minute
+        self.clock = clock
+        self.level = float(per_minute)
+        self.updated = clock()
+
+    def _refill(self, now: float):
+        elapsed = max(now - self.updated, 0.0)
+        self.level = min(float(self.per_minute), self.level + elapsed * self.per_minute / 60.0)
+        self.updated = now
+
+    def wait_time(self, amount: float, now: float = None) -> float:
+        """Seconds until `amount` can be taken (0 if available now)."""
+        if self.per_minute <= 0:
+            return 0.0
+        now = self.clock() if now is None else now
+        self._refill(now)
+        # Requests larger than the whole bucket wait for a full bucket rather than forever
+        amount = min(amount, self.per_minute)
+        missing = amount - self.level
+        return max(missing, 0.0) * 60.0 / self.per_minute
+
+    def take(self, amount: float, now: float = None):
+        if self.per_minute <= 0:
+            return
+        now = self.clock() if now is None else now
+        self._refill(now)
+        self.level -= min(amount, self.per_minute)
+
+    def give_back(self, amount: float):
+        """Return over-reserved quota (or charge more when `amount` is negative)."""
+        if self.per_minute <= 0:
+            return
+        self.level = min(float(self.per_minute), self.level + amount)
+
+
+class RateLimiter:
+    """
+    Admits Azure OpenAI calls in priority order within the configured rpm/tpm quota.
+    Only the highest priority waiter (FIFO within a priority) may take quota, so
+    bulk work queued first cannot starve a chat message that arrives later.
+    """
+
+    def __init__(self, rpm: int = AZURE_OPENAI_RPM, tpm: int = AZURE_OPENAI_TPM, clock=time.monotonic):
+        self.clock = clock
+        self.requests = TokenBucket(rpm, clock)
+        self.tokens = TokenBucket(tpm, clock)
+        self.paused_until = 0.0
+        self._waiting = []
+        self._sequence = itertools.count()
+        self._lock = threading.Lock()
+
+    @property
+    def waiting(self) -> int:
+        return len(self._waiting)
+
+    def _enqueue(self, priority: int):
+        ticket = (priority, next(self._sequence))
+        with self._lock:
+            heapq.heappush(self._waiting, ticket)
+        return ticket
+
+    def _dequeue(self, ticket):
+        with self._lock:
+            if ticket in self._waiting:
+                self._waiting.remove(ticket)
+                heapq.heapify(self._waiting)
+
+    def _try_admit(self, ticket, tokens: int) -> float:
+        """Take quota for `ticket` and return 0, or return how long to wait before retrying."""
+        with self._lock:
+            if self._waiting[0] != ticket:
+                return _QUEUE_POLL_SECONDS
+            now = self.clock()
+            wait = max(
+                self.paused_until - now,
+                self.requests.wait_time(1, now),
+                self.tokens.wait_time(tokens, now),
+            )
+            if wait > 0:
+                return wait
+            self.requests.take(1, now)
+            self.tokens.take(tokens, now)
+            heapq.heappop(self._waiting)
+            return 0.0
+
+    def acquire(self, tokens: int, priority: int = PRIORITY_BULK):
+        """Block until the call may be sent."""
+        ticket = self._enqueue(priority)
+        try:
+            while (wait := self._try_admit(ticket, tokens)) > 0:
+                time.sleep(wait)
+        finally:
+            self._dequeue(ticket)
+
+    async def acquire_async(self, tokens: int, priority: int = PRIORITY_BULK):
+        """Async variant of acquire that waits without blocking the event loop."""
+        ticket = self._enqueue(priority)
+        try:
+            while (wait := self._try_admit(ticket, tokens)) > 0:
+                await asyncio.sleep(wait)
+        finally:
+            self._dequeue(ticket)
+
+    def settle(self, reserved: int, used: int):
+        """Correct the token bucket once the real usage of a call is known."""
+        with self._lock:
+            self.tokens.give_back(reserved - used)
+
+    def pause(self, seconds: float):
+        """Hold back every caller after the server reports throttling."""
+        with self._lock:
+            self.paused_until = max(self.paused_until, self.clock() + seconds)
+
+
+def estimate_tokens(messages: list) -> int:
+    """Tokens to reserve for a call: its prompt plus the completion reserve."""
+    return count_message_tokens(messages) + AZURE_OPENAI_COMPLETION_RESERVE
+
+
+def is_retryable(error: Exception) -> bool:
+    """Throttling, timeouts, connection failures and server errors are worth retrying."""
+    if isinstance(error, (openai.APIConnectionError, openai.APITimeoutError)):
+        return True
+    if isinstance(error, openai.APIStatusError):
+        return error.status_code in (408, 409, 429) or error.status_code >= 500
+    return False
+
+
+def retry_after(error: Exception):
+    """Seconds the server asked us to wait before retrying, if it said."""
+    response = getattr(error, "response", None)
+    if response is None:
+        return None
+    headers = response.headers
+    for header, scale in (("retry-after-ms", 0.001), ("retry-after", 1.0)):
+        try:
+            return float(headers[header]) * scale
+        except (KeyError, TypeError, ValueError):
+            continue
+    return None
+
+
+def backoff_delay(attempt: int, error: Exception = None) -> float:
+    """
+    Delay before retry number `attempt` (0-based).
+
+    Uses full-jitter exponential backoff, but never retries sooner than the
+    server's Retry-After so throttled requests are not wasted.
+    """
+    delay = random.uniform(0, min(AZURE_OPENAI_BACKOFF_MAX, AZURE_OPENAI_BACKOFF_BASE * 2 ** attempt))
+    hint = retry_after(error) if error is not None else None
+    if hint is not None:
+        # Spread retries slightly so callers throttled together do not return together
+        delay = min(hint, AZURE_OPENAI_BACKOFF_MAX) + random.uniform(0, AZURE_OPENAI_BACKOFF_BASE)
+    return delay
+
+
+# Shared limiter for the whole process
+rate_limiter = RateLimiter()
@@ -0,0 +1,264 @@
+"""
+Retrieval index over a finished analysis, used to ground the coaching chat.
+When round or case feedback is generated, the feedback, the transcript (one
+chunk per speech) and the case (one chunk per card or section) are split into
+chunks and stored under a hash of their content; the id is returned with the
+feedback. Chat turns rank the chunks against the question with BM25 and include
+only the top few. Scores come from NumPy over precomputed per-posting weights,
+so a query over a long round takes well under a millisecond.
+"""
+import hashlib
+import json
+import logging
+import os
+import re
+import tempfile
+import threading
+from collections import Counter, OrderedDict
+from dataclasses import asdict, dataclass
+import numpy as np
+from backend.cards import CardCase
+from backend.disk_cache import DiskCache
+from backend.speeches import Transcript, format_timestamp
+from backend.tokens import count_tokens, shorten
+
+logger = logging.getLogger(__name__)
+
+RETRIEVAL_CACHE_DIR = os.getenv("RETRIEVAL_CACHE_DIR", os.path.join(tempfile.gettempdir(), "coachr_retrieval"))
+# Maximum total size of stored chunks in bytes (0 disables the index)
+RETRIEVAL_CACHE_MAX_BYTES = int(os.getenv("RETRIEVAL_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+# Chunks longer than this are split at paragraph (or sentence) breaks
+RETRIEVAL_CHUNK_TOKENS = int(os.getenv("RETRIEVAL_CHUNK_TOKENS", "300"))
+# Chunks returned per query
+RETRIEVAL_TOP_K = int(os.getenv("RETRIEVAL_TOP_K", "5"))
+# Indexes kept in memory per process
+RETRIEVAL_MEMORY_INDEXES = int(os.getenv("RETRIEVAL_MEMORY_INDEXES", "64"))
+
+# BM25 term frequency saturation and document length normalization
+_BM25_K1 = 1.5
+_BM25_B = 0.75
+
+# Markdown headings, bold lines and short "Label:" lines start a section
+_HEADING = re.compile(r"^\s*(#{1,6}\s+\S.*|\*\*[^*]{2,80}\*\*:?|[A-Z][\w ,/&'()-]{2,60}:)\s*$")
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s+")
+_WORD = re.compile(r"[a-z0-9]+")
+_CONTEXT_ID = re.compile(r"[0-9a-f]{64}")
+_STOPWORDS = frozenset(
+    "a an and are as at be but by can could do does for from had has have how i if in into is it its "
+    "me my of on or our should so that the their them then there these they this to was we were what "
+    "when where which who why will with would you your".split()
+)
+
+
+@dataclass(slots=True)
+class Chunk:
+    # "feedback", "transcript" or "case"
+    source: str
+    title: str
+    text: str
+
+    def format(self) -> str:
+        label = f"{self.source.capitalize()}: {self.title}" if self.title else self.source.capitalize()
+        return f"[{label}]\n{self.text}"
+
+    def to_dict(self) -> dict:
+        return asdict(self)
+
+
+def terms(text: str) -> list:
+    """Lower-cased content words of `text`."""
+    return [word for word in _WORD.findall(text.lower()) if word not in _STOPWORDS]
+
+
+def _pieces(paragraphs: list, max_tokens: int) -> list:
+    """Join paragraphs into pieces of at most `max_tokens`."""
+    pieces, piece = [], []
+    for paragraph in paragraphs:
+        if piece and count_tokens("\n\n".join(piece + [paragraph])) > max_tokens:
+            pieces.append("\n\n".join(piece))
+            piece = []
+        piece.append(shorten(paragraph, max_tokens))
+    if piece:
+        pieces.append("\n\n".join(piece))
+    return pieces
+
+
+def text_chunks(text: str, source: str, max_tokens: int = None) -> list:
+    """Chunks of a text split at its headings, then at paragraph breaks."""
+    max_tokens = RETRIEVAL_CHUNK_TOKENS if max_tokens is None else max_tokens
+    groups = [["", []]]
+    for line in text.splitlines():
+        if _HEADING.match(line):
+            groups.append([line.strip().strip("#* ").rstrip(":*").strip(), []])
+        else:
+            groups[-1][1].append(line)
+
+    chunks = []
+    for heading, lines in groups:
+        paragraphs = [p.strip() for p in re.split(r"\n\s*\n", "\n".join(lines)) if p.strip()]
+        pieces = _pieces(paragraphs, max_tokens)
+        chunks.extend(Chunk(source, heading, piece) for piece in pieces)
+        if heading and not pieces:
+            chunks.append(Chunk(source, heading, ""))
+    return chunks
+
+
+def transcript_chunks(transcript, max_tokens: int = None) -> list:
+    """One chunk per speech (split at sentence breaks when long), or text chunks for plain transcripts."""
+    max_tokens = RETRIEVAL_CHUNK_TOKENS if max_tokens is None else max_tokens
+    if not isinstance(transcript, Transcript):
+        return text_chunks(str(transcript or ""), "transcript", max_tokens)
+    if not transcript.speeches:
+        return text_chunks(transcript.text, "transcript", max_tokens)
+    chunks = []
+    for speech in transcript.speeches:
+        title = f"{speech.name} ({speech.speaker}), {format_timestamp(speech.start)}-{format_timestamp(speech.end)}"
+        for piece in _pieces(_SENTENCE_END.split(speech.text.strip()), max_tokens):
+            chunks.append(Chunk("transcript", title, piece))
+    return chunks
+
+
+def case_chunks(case, max_tokens: int = None) -> list:
+    """One chunk per card of a card-format case, or text chunks for plain cases."""
+    max_tokens = RETRIEVAL_CHUNK_TOKENS if max_tokens is None else max_tokens
+    if isinstance(case, CardCase):
+        return [
+            Chunk("case", card.section, shorten(card.format_for_prompt(), max_tokens))
+            for card in case.cards
+            if card.format_for_prompt()
+        ]
+    return text_chunks(str(case or ""), "case", max_tokens)
+
+
+class RetrievalIndex:
+    """
+    BM25 index over a list of chunks.
+    Postings are kept term by term in flat NumPy arrays together with their
+    precomputed BM25 weight, so scoring a query is one gather and one bincount.
+    """
+
+    def __init__(self, chunks: list):
+        self.chunks = list(chunks)
+        counts = [Counter(terms(f"{chunk.title} {chunk.text}")) for chunk in self.chunks]
+        self.vocabulary = {}
+        for chunk_counts in counts:
+            for term in chunk_counts:
+                self.vocabulary.setdefault(term, len(self.vocabulary))
+
+        term_ids, chunk_ids, frequencies = [], [], []
+        for chunk_id, chunk_counts in enumerate(counts):
+            for term, frequency in chunk_counts.items():
+                term_ids.append(self.vocabulary[term])
+                chunk_ids.append(chunk_id)
+                frequencies.append(frequency)
+        term_ids = np.asarray(term_ids, dtype=np.int64)
+        order = np.argsort(term_ids, kind="stable")
+        self._chunk_ids = np.asarray(chunk_ids, dtype=np.int64)[order]
+        frequencies = np.asarray(frequencies, dtype=np.float32)[order]
+        # Postings of term t are _chunk_ids[_starts[t]:_starts[t + 1]]
+        document_frequency = np.bincount(term_ids, minlength=len(self.vocabulary))
+        self._starts = np.concatenate(([0], np.cumsum(document_frequency)))
+
+        lengths = np.asarray([sum(chunk_counts.values()) for chunk_counts in counts], dtype=np.float32)
+        average_length = float(lengths.mean()) if len(lengths) and lengths.mean() > 0 else 1.0
+        n = len(self.chunks)
+        idf = np.log1p((n - document_frequency + 0.5) / (document_frequency + 0.5)).astype(np.float32)
+        posting_terms = term_ids[order]
+        normalization = _BM25_K1 * (1 - _BM25_B + _BM25_B * lengths[self._chunk_ids] / average_length)
+        self._weights = idf[posting_terms] * frequencies * (_BM25_K1 + 1) / (frequencies + normalization)
+
+    def __len__(self) -> int:
+        return len(self.chunks)
+
+    def scores(self, query: str) -> np.ndarray:
+        """BM25 score of every chunk for `query`."""
+        ids = [self.vocabulary[term] for term in set(terms(query)) if term in self.vocabulary]
+        if not ids or not self.chunks:
+            return np.zeros(len(self.chunks), dtype=np.float32)
+        postings = np.concatenate([np.arange(self._starts[i], self._starts[i + 1]) for i in ids])
+        return np.bincount(self._chunk_ids[postings], weights=self._weights[postings], minlength=len(self.chunks))
+
+    def search(self, query: str, k: int = None, sources=None) -> list:
+        """
+        The `k` best matching chunks for `query`, best first.
+
+        Args:
+            query: Question text
+            k: Number of chunks (default RETRIEVAL_TOP_K)
+            sources: Only return chunks from these sources ("feedback", "transcript", "case")
+
+        Returns:
+            List of (position, chunk, score) tuples with a positive score
+        """
+        k = RETRIEVAL_TOP_K if k is None else k
+        scores = self.scores(query)
+        if sources is not None:
+            allowed = np.asarray([chunk.source in sources for chunk in self.chunks], dtype=bool)
+            scores = np.where(allowed, scores, 0.0)
+        candidates = np.flatnonzero(scores > 0)
+        if len(candidates) > k:
+            candidates = candidates[np.argpartition(-scores[candidates], k - 1)[:k]]
+        candidates = candidates[np.argsort(-scores[candidates], kind="stable")]
+        return [(int(i), self.chunks[i], float(scores[i])) for i in candidates]
+
+
+# Chunks of finished analyses, shared by every process on the host
+chunk_store = DiskCache(RETRIEVAL_CACHE_DIR, RETRIEVAL_CACHE_MAX_BYTES)
+_indexes = OrderedDict()
+_indexes_lock = threading.Lock()
+
+
+def _remember(context_id: str, index: RetrievalIndex) -> RetrievalIndex:
+    with _indexes_lock:
+        _indexes[context_id] = index
+        _indexes.move_to_end(context_id)
+        while len(_indexes) > RETRIEVAL_MEMORY_INDEXES:
+            _indexes.popitem(last=False)
+    return index
+
+
+def index_analysis(feedback: str, transcript=None, case=None):
+    """
+    Chunk and store a finished analysis for chat retrieval.
+
+    Args:
+        feedback: The generated feedback
+        transcript: Transcript (or text) of the analyzed round
+        case: CardCase or extracted text of the analyzed case
+
+    Returns:
+        context_id to pass to /chat/, or None when the index is disabled or fails
+    """
+    if not chunk_store.enabled or not feedback:
+        return None
+    try:
+        chunks = text_chunks(feedback, "feedback")
+        if transcript is not None:
+            chunks += transcript_chunks(transcript)
+        if case is not None:
+            chunks += case_chunks(case)
+        payload = {"chunks": [chunk.to_dict() for chunk in chunks]}
+        context_id = hashlib.sha256(json.dumps(payload, sort_keys=True).encode("utf-8")).hexdigest()
+        chunk_store.put(context_id, payload)
+        _remember(context_id, RetrievalIndex(chunks))
+        return context_id
+    except Exception as e:
+        # Chat falls back to the feedback text alone; the analysis itself must not fail
+        logger.warning("Could not index analysis for chat retrieval: %s", e)
+        return None
+
+
+def load_index(context_id: str):
+    """The RetrievalIndex stored under `context_id`, or None when it is unknown or evicted."""
+    # Ids come from clients and name files in the chunk store
+    if not isinstance(context_id, str) or not _CONTEXT_ID.fullmatch(context_id):
+        return None
+    with _indexes_lock:
+        index = _indexes.get(context_id)
+        if index is not None:
+            _indexes.move_to_end(context_id)
+            return index
+    stored = chunk_store.get(context_id)
+    if stored is None:
+        return None
+    return _remember(context_id, RetrievalIndex([Chunk(**chunk) for chunk in stored["chunks"]]))
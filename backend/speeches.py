@@ -0,0 +1,185 @@
+"""
+Structured round transcripts.
+Groups timestamped Whisper segments into public forum speeches (constructive,
+crossfire, rebuttal, summary, grand crossfire, final focus) using the standard
+speech times plus pauses and verbal cues where speakers change.
+"""
+import re
+from dataclasses import dataclass, field
+
+# Public forum speech order: (name, kind, speaker, expected speaking time in seconds)
+PF_SCHEDULE = (
+    ("First Constructive", "constructive", "first team", 240),
+    ("Second Constructive", "constructive", "second team", 240),
+    ("First Crossfire", "crossfire", "both", 180),
+    ("First Rebuttal", "rebuttal", "first team", 240),
+    ("Second Rebuttal", "rebuttal", "second team", 240),
+    ("Second Crossfire", "crossfire", "both", 180),
+    ("First Summary", "summary", "first team", 180),
+    ("Second Summary", "summary", "second team", 180),
+    ("Grand Crossfire", "crossfire", "both", 180),
+    ("First Final Focus", "final focus", "first team", 120),
+    ("Second Final Focus", "final focus", "second team", 120),
+)
+
+# Phrases that typically open a speech
+_START_CUES = re.compile(
+    r"^\W*(thank you|thanks|my partner and i|we (affirm|negate)|i('ll| will) (now )?(be )?(start|begin)|"
+    r"(off|on)[- ]time road ?map|time (starts|begins)|starting (now|with|on|off)|first question|"
+    r"i('ll| will) ask|go ahead|so (first|to start)|in (this|my|our) (speech|summary|final focus|rebuttal))\b",
+    re.IGNORECASE,
+)
+# Phrases that typically close a speech
+_END_CUES = re.compile(
+    r"\b(thank you|for (these|those|all these) reasons|(i|we) (strongly |proudly )?urge|"
+    r"vote (for the )?(pro|con|aff|neg)|(i'm|i am) out of time|that's (my )?time)\W*$",
+    re.IGNORECASE,
+)
+
+# Weight of timing penalties relative to pause/cue evidence
+_DURATION_WEIGHT = 4.0
+# Candidate boundaries considered by the segmentation search
+_MAX_CANDIDATES = 150
+
+
+@dataclass
+class Speech:
+    name: str
+    kind: str
+    speaker: str
+    start: float
+    end: float
+    segments: list = field(default_factory=list)
+
+    @property
+    def text(self) -> str:
+        return " ".join(segment["text"] for segment in self.segments)
+
+    def to_dict(self) -> dict:
+        return {
+            "name": self.name,
+            "kind": self.kind,
+            "speaker": self.speaker,
+            "start": self.start,
+            "end": self.end,
+            "text": self.text,
+        }
+
+
+@dataclass
+class Transcript:
+    text: str
+    segments: list
+    speeches: list
+
+    def to_dict(self) -> dict:
+        return {
+            "text": self.text,
+            "segments": self.segments,
+            "speeches": [speech.to_dict() for speech in self.speeches],
+        }
+
+    def format_for_prompt(self) -> str:
+        """Transcript text with a labelled header per speech."""
+        if not self.speeches:
+            return self.text
+        return "\n\n".join(format_speech(speech) for speech in self.speeches)
+
+
+def format_timestamp(seconds: float) -> str:
+    minutes, seconds = divmod(int(seconds), 60)
+    return f"{minutes}:{seconds:02d}"
+
+
+def format_speech(speech: Speech) -> str:
+    return f"[{speech.name} ({speech.speaker}), {format_timestamp(speech.start)}-{format_timestamp(speech.end)}]\n{speech.text}"
+
+
+def _boundary_scores(segments: list) -> list:
+    """Evidence that a new speech starts at each segment (index 0 is always a start)."""
+    scores = [0.0] * len(segments)
+    for i in range(1, len(segments)):
+        gap = segments[i]["start"] - segments[i - 1]["end"]
+        score = min(max(gap, 0.0), 10.0) / 2.0
+        if _START_CUES.search(segments[i]["text"]):
+            score += 1.5
+        if _END_CUES.search(segments[i - 1]["text"]):
+            score += 1.5
+        scores[i] = score
+    return scores
+
+
+def _speeches_covered(duration: float) -> int:
+    """Number of leading speeches whose combined expected length best matches the recording."""
+    elapsed, best, best_error = 0.0, 1, float("inf")
+    for count, (_, _, _, expected) in enumerate(PF_SCHEDULE, 1):
+        elapsed += expected
+        error = abs(elapsed - duration)
+        if error < best_error:
+            best, best_error = count, error
+    return best
+
+
+def segment_speeches(segments: list) -> list:
+    """
+    Group timestamped segments into PF speeches.
+
+    Finds the split into consecutive speeches that best balances pauses and verbal
+    cues at the boundaries against each speech's deviation from its expected length.
+
+    Args:
+        segments: Dicts with "start", "end" (seconds) and "text", in order
+
+    Returns:
+        List of Speech objects in round order
+    """
+    if not segments:
+        return []
+
+    n = len(segments)
+    duration = segments[-1]["end"] - segments[0]["start"]
+    schedule = PF_SCHEDULE[:min(_speeches_covered(duration), n)]
+    k_total = len(schedule)
+
+    scores = _boundary_scores(segments)
+    ranked = sorted(range(1, n), key=lambda i: scores[i], reverse=True)[:_MAX_CANDIDATES]
+    points = [0] + sorted(ranked) + [n]
+
+    def penalty(speech_index, first, last):
+        expected = schedule[speech_index][3]
+        actual = segments[last - 1]["end"] - segments[first]["start"]
+        return _DURATION_WEIGHT * ((actual - expected) / expected) ** 2
+
+    # best[k][j]: best score placing the first k speeches so that speech k ends at points[j]
+    neg_inf = float("-inf")
+    m = len(points)
+    best = [[neg_inf] * m for _ in range(k_total + 1)]
+    back = [[0] * m for _ in range(k_total + 1)]
+    best[0][0] = 0.0
+    for k in range(1, k_total + 1):
+        for j in range(k, m):
+            boundary = scores[points[j]] if points[j] < n else 0.0
+            for i in range(k - 1, j):
+                if best[k - 1][i] == neg_inf:
+                    continue
+                value = best[k - 1][i] + boundary - penalty(k - 1, points[i], points[j])
+                if value > best[k][j]:
+                    best[k][j], back[k][j] = value, i
+
+    # Walk back from the final speech ending at the last segment
+    bounds = [m - 1]
+    for k in range(k_total, 0, -1):
+        bounds.append(back[k][bounds[-1]])
+    bounds.reverse()
+
+    speeches = []
+    for (name, kind, speaker, _), first, last in zip(schedule, bounds, bounds[1:]):
+        chunk = segments[points[first]:points[last]]
+        speeches.append(Speech(name, kind, speaker, chunk[0]["start"], chunk[-1]["end"], chunk))
+    return speeches
+
+
+def build_transcript(result: dict) -> Transcript:
+    """Build a structured transcript from a {"text", "segments"} transcription result."""
+    segments = result.get("segments", [])
+    return Transcript(result.get("text", ""), segments, segment_speeches(segments))
@@ -0,0 +1,49 @@
+"""
+Server-sent events (SSE) helpers for streaming LLM output to the frontend.
+
+Each response is a sequence of events:
+    data: {"delta": "..."}                 one per generated text fragment
+    event: done / data: {...}              final payload once generation finishes
+    event: error / data: {"error": "..."}  if generation fails part way
+"""
+import inspect
+import json
+from fastapi.responses import StreamingResponse
+
+
+def sse_event(data: dict, event: str = None) -> str:
+    """Format one server-sent event."""
+    prefix = f"event: {event}\n" if event else ""
+    return f"{prefix}data: {json.dumps(data)}\n\n"
+
+
+def stream_llm_response(deltas, done_payload=None) -> StreamingResponse:
+    """
+    Stream an async iterator of text fragments as server-sent events.
+
+    Args:
+        deltas: Async iterator yielding text fragments
+        done_payload: Callable (or async callable) taking the full generated text and returning the final event payload
+    """
+    async def events():
+        pieces = []
+        try:
+            async for delta in deltas:
+                pieces.append(delta)
+                yield sse_event({"delta": delta})
+            text = "".join(pieces)
+            # Building the payload can fail too (e.g. saving the result); report it like a model error
+            payload = done_payload(text) if done_payload else {"text": text}
+            if inspect.isawaitable(payload):
+                payload = await payload
+        except Exception as e:
+            yield sse_event({"error": str(e)}, event="error")
+            return
+        yield sse_event(payload, event="done")
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        # Stop proxies from buffering the stream
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
@@ -0,0 +1,221 @@
+"""
+Token accounting for Azure OpenAI prompts.
+Counts prompt tokens with tiktoken and deterministically shrinks transcripts and
+cases that exceed an endpoint's budget: whitespace and filler words go first, then
+crossfire is condensed, and finally every part is trimmed to a fair share.
+"""
+import logging
+import os
+import re
+from functools import lru_cache
+from backend.speeches import Transcript, format_speech
+
+logger = logging.getLogger(__name__)
+
+# gpt-4.1 tokenizer
+TOKEN_ENCODING = os.getenv("TOKEN_ENCODING", "o200k_base")
+
+# Maximum prompt tokens (system prompt + content) sent by each endpoint
+PF_FEEDBACK_TOKEN_BUDGET = int(os.getenv("PF_FEEDBACK_TOKEN_BUDGET", "24000"))
+CASE_FEEDBACK_TOKEN_BUDGET = int(os.getenv("CASE_FEEDBACK_TOKEN_BUDGET", "16000"))
+
+# Chat format overhead per message and for priming the reply
+_TOKENS_PER_MESSAGE = 3
+_TOKENS_PER_REPLY = 3
+# Share of a crossfire kept when condensing it
+_CROSSFIRE_MIN_SHARE = 0.25
+# Share of a trimmed part kept from its start (the rest comes from its end)
+_HEAD_SHARE = 0.75
+_TRIM_MARKER = " [...] "
+# Token counts are not exactly additive across joins, so fitting may need a few passes
+_FIT_ATTEMPTS = 3
+
+_FILLER = re.compile(
+    r"\b(?:u+m+|u+h+|e+r+m+|a+h+|h+m+|m+h*m+|you know|i mean)\b[,.]?\s*",
+    re.IGNORECASE,
+)
+_REPEATED_WORD = re.compile(r"\b(\w+)(?:[,\s]+\1\b)+", re.IGNORECASE)
+_SPACES = re.compile(r"[ \t]+")
+_BLANK_LINES = re.compile(r"\n\s*\n+")
+
+
+@lru_cache(maxsize=1)
+def _encoding():
+    try:
+        import tiktoken
+        return tiktoken.get_encoding(TOKEN_ENCODING)
+    except Exception as e:
+        # tiktoken downloads encodings on first use; offline hosts fall back to an estimate
+        logger.warning("Could not load tiktoken encoding %s (%s); estimating tokens from length", TOKEN_ENCODING, e)
+        return None
+
+
+def count_tokens(text: str) -> int:
+    encoding = _encoding()
+    if encoding is None:
+        return (len(text) + 3) // 4
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+def count_message_tokens(messages: list) -> int:
+    """Prompt tokens of a chat completion request."""
+    total = _TOKENS_PER_REPLY
+    for message in messages:
+        total += _TOKENS_PER_MESSAGE + count_tokens(str(message.get("content") or ""))
+    return total
+
+
+def shorten(text: str, max_tokens: int) -> str:
+    """Cut `text` to at most `max_tokens`, keeping its start and end around a [...] marker."""
+    if count_tokens(text) <= max_tokens:
+        return text
+    keep = max_tokens - count_tokens(_TRIM_MARKER)
+    if keep <= 0:
+        return ""
+    head = int(keep * _HEAD_SHARE)
+    tail = keep - head
+    encoding = _encoding()
+    if encoding is None:
+        head, tail = head * 4, tail * 4
+        return text[:head] + _TRIM_MARKER + (text[-tail:] if tail else "")
+    tokens = encoding.encode(text, disallowed_special=())
+    return encoding.decode(tokens[:head]) + _TRIM_MARKER + (encoding.decode(tokens[-tail:]) if tail else "")
+
+
+def fair_shares(sizes: list, budget: int) -> list:
+    """
+    Split `budget` across parts of the given sizes so that small parts stay whole
+    and every larger part gets the same cap (water-filling).
+    """
+    if sum(sizes) <= budget:
+        return list(sizes)
+    shares = [0] * len(sizes)
+    remaining = budget
+    order = sorted(range(len(sizes)), key=lambda i: sizes[i])
+    for position, i in enumerate(order):
+        cap = remaining // (len(order) - position)
+        shares[i] = min(sizes[i], cap)
+        remaining -= shares[i]
+    return shares
+
+
+def remove_filler(text: str) -> str:
+    """Drop spoken filler ("um", "uh", "you know") and stuttered repeats from a transcript."""
+    text = _FILLER.sub("", text)
+    text = _REPEATED_WORD.sub(r"\1", text)
+    return _SPACES.sub(" ", text).strip()
+
+
+def normalize_whitespace(text: str) -> str:
+    text = _SPACES.sub(" ", text)
+    return _BLANK_LINES.sub("\n\n", text).strip()
+
+
+def _trim_parts(parts: list, budget: int) -> list:
+    shares = fair_shares([count_tokens(part) for part in parts], budget)
+    return [shorten(part, share) for part, share in zip(parts, shares)]
+
+
+def _fit_speeches(transcript, available: int, reductions: list) -> str:
+    headers = [format_speech(speech).split("\n", 1)[0] for speech in transcript.speeches]
+    texts = [remove_filler(speech.text) for speech in transcript.speeches]
+    reductions.append("filler")
+
+    def render():
+        return "\n\n".join(f"{header}\n{text}" for header, text in zip(headers, texts))
+
+    def overhead():
+        # Tokens spent on headers and separators rather than speech text
+        return count_tokens(render()) - sum(count_tokens(text) for text in texts)
+
+    if count_tokens(render()) <= available:
+        return render()
+
+    crossfire = [i for i, speech in enumerate(transcript.speeches) if speech.kind == "crossfire"]
+    if crossfire:
+        reductions.append("crossfire")
+        original = [texts[i] for i in crossfire]
+        fixed = sum(count_tokens(texts[i]) for i in range(len(texts)) if i not in crossfire)
+        # Condense crossfire before touching speeches, but keep at least a quarter of it
+        floor = int(sum(count_tokens(text) for text in original) * _CROSSFIRE_MIN_SHARE)
+        budget = available - overhead() - fixed
+        for _ in range(_FIT_ATTEMPTS):
+            for i, text in zip(crossfire, _trim_parts(original, max(budget, floor))):
+                texts[i] = text
+            excess = count_tokens(render()) - available
+            if excess <= 0:
+                return render()
+            if budget <= floor:
+                break
+            budget -= excess
+
+    reductions.append("trim")
+    original = list(texts)
+    budget = available - overhead()
+    for _ in range(_FIT_ATTEMPTS):
+        texts = _trim_parts(original, max(budget, 0))
+        excess = count_tokens(render()) - available
+        if excess <= 0:
+            break
+        budget -= excess
+    # Never exceed the budget, even if the passes above still overshoot
+    return shorten(render(), available)
+
+
+def _fit_text(text: str, available: int, reductions: list, spoken: bool) -> str:
+    if spoken:
+        text = remove_filler(text)
+        reductions.append("filler")
+    else:
+        text = normalize_whitespace(text)
+        reductions.append("whitespace")
+    if count_tokens(text) <= available:
+        return text
+
+    reductions.append("trim")
+    paragraphs = text.split("\n\n")
+    budget = available - count_tokens("\n\n") * (len(paragraphs) - 1)
+    for _ in range(_FIT_ATTEMPTS):
+        text = "\n\n".join(_trim_parts(paragraphs, max(budget, 0)))
+        excess = count_tokens(text) - available
+        if excess <= 0:
+            break
+        budget -= excess
+    return shorten(text, available)
+
+
+def fit_to_budget(system_prompt: str, content, budget: int, spoken: bool = False):
+    """
+    Reduce prompt content until the system prompt plus content fits in `budget` tokens.
+
+    Args:
+        system_prompt: System message sent with the content
+        content: Case text (str) or round Transcript
+        budget: Maximum prompt tokens for the request
+        spoken: Whether plain-text content is a transcript (filler words can be dropped)
+
+    Returns:
+        Tuple of (content text, token report); the report lists the reductions applied
+        in order along with the prompt size before and after
+    """
+    structured = isinstance(content, Transcript)
+    spoken = spoken or structured
+    text = content.format_for_prompt() if structured else str(content)
+    fixed = count_message_tokens([{"content": system_prompt}, {"content": ""}])
+    original = fixed + count_tokens(text)
+    reductions = []
+
+    if original > budget:
+        available = max(budget - fixed, 0)
+        if structured and content.speeches:
+            text = _fit_speeches(content, available, reductions)
+        else:
+            text = _fit_text(text, available, reductions, spoken)
+
+    report = {
+        "budget": budget,
+        "original_input_tokens": original,
+        "input_tokens": fixed + count_tokens(text),
+        "reductions": reductions,
+    }
+    return text, report
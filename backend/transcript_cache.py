@@ -0,0 +1,45 @@
+"""
+Content-addressed cache of Whisper transcriptions.
+Entries are keyed by a hash of the audio bytes plus the model and decode settings,
+stored in a DiskCache (backend.disk_cache).
+"""
+import hashlib
+import json
+import os
+import tempfile
+from backend.disk_cache import DiskCache
+
+TRANSCRIPT_CACHE_DIR = os.getenv("TRANSCRIPT_CACHE_DIR", os.path.join(tempfile.gettempdir(), "coachr_transcripts"))
+# Maximum total size of cached transcripts in bytes (0 disables the cache)
+TRANSCRIPT_CACHE_MAX_BYTES = int(os.getenv("TRANSCRIPT_CACHE_MAX_BYTES", str(256 * 1024 * 1024)))
+
+_HASH_CHUNK_SIZE = 1024 * 1024
+
+
+def hash_audio(source) -> str:
+    """SHA-256 of an upload given as bytes or as a path to a file on disk."""
+    digest = hashlib.sha256()
+    if isinstance(source, (str, os.PathLike)):
+        with open(source, "rb") as audio_file:
+            for chunk in iter(lambda: audio_file.read(_HASH_CHUNK_SIZE), b""):
+                digest.update(chunk)
+    else:
+        digest.update(source)
+    return digest.hexdigest()
+
+
+def transcript_cache_key(audio_hash: str, model_name: str, **decode_params) -> str:
+    """Cache key for an audio hash transcribed with a given model and decode settings."""
+    settings = json.dumps({"model": model_name, **decode_params}, sort_keys=True)
+    return hashlib.sha256(f"{audio_hash}:{settings}".encode("utf-8")).hexdigest()
+
+
+class TranscriptCache(DiskCache):
+    """Disk cache of transcription results, configured by TRANSCRIPT_CACHE_DIR / TRANSCRIPT_CACHE_MAX_BYTES."""
+
+    def __init__(self, directory: str = TRANSCRIPT_CACHE_DIR, max_bytes: int = TRANSCRIPT_CACHE_MAX_BYTES):
+        super().__init__(directory, max_bytes)
+
+
+# Shared cache for the whole process
+transcript_cache = TranscriptCache()
@@ -1,40 +1,309 @@
 import os
 import tempfile
-from fastapi import UploadFile, APIRouter, File
+import time
+from fastapi import APIRouter, Request
 from fastapi.responses import JSONResponse
-from pydub import AudioSegment
-import whisper
-from backend.azure import pf_feedback
+from starlette.concurrency import run_in_threadpool
+from backend.analysis import pf_analysis_messages, pf_analysis_messages_async, resolve_analysis_mode
+from backend.azure import call_ai_async, call_ai_stream, call_ai_stream_async
+from backend.rate_limit import PRIORITY_BULK
+from backend.streaming import stream_llm_response
+from backend.audio import decode_audio, split_on_silence, SAMPLE_RATE
+from backend.audio_probe import probe_audio
+from backend.retrieval import index_analysis
+from backend.speeches import build_transcript, Transcript
+from backend.transcript_cache import transcript_cache, transcript_cache_key, hash_audio
+from backend.models import get_model, resolve_model_name
+from backend.workers import transcription_pool, long_transcription_pool, PoolFullError, get_chunk_executor
+from backend.uploads import MAX_AUDIO_UPLOAD_BYTES, UploadTooLargeError, form_flag, get_upload, read_form, save_upload, too_large_response, upload_path
+from backend import jobs
 
 router = APIRouter()
 
+# "single" transcribes in one Whisper call, "chunked" splits at pauses and
+# transcribes chunks in parallel, "auto" chunks recordings longer than TRANSCRIBE_CHUNK_MIN_SECONDS
+# Chunking stays opt-in until unit_tests/benchmark_transcription.py has been run on production recordings
+TRANSCRIBE_MODE = os.getenv("TRANSCRIBE_MODE", "single")
+TRANSCRIBE_CHUNK_MIN_SECONDS = float(os.getenv("TRANSCRIBE_CHUNK_MIN_SECONDS", "300"))
+TRANSCRIBE_CHUNK_SECONDS = float(os.getenv("TRANSCRIBE_CHUNK_SECONDS", "90"))
+# Recordings longer than this are refused before any decoding (0 disables the limit)
+MAX_AUDIO_SECONDS = float(os.getenv("MAX_AUDIO_SECONDS", "7200"))
+# Recordings at least this long are transcribed in the long recording pool
+LONG_AUDIO_SECONDS = float(os.getenv("LONG_AUDIO_SECONDS", "1800"))
+# Seconds between partial feedback updates written by transcription jobs. Each update
+# rewrites the feedback so far in the job row, so shorter intervals write more data per job
+JOB_PARTIAL_INTERVAL = float(os.getenv("JOB_PARTIAL_INTERVAL", "2"))
+
+def _segments(result: dict, offset: float = 0.0) -> list:
+    return [
+        {"start": round(segment["start"] + offset, 2), "end": round(segment["end"] + offset, 2), "text": segment["text"].strip()}
+        for segment in result.get("segments", [])
+    ]
+
+def transcribe_chunk(audio, model_name: str = None, offset: float = 0.0) -> list:
+    """Transcribe one chunk and return its segments shifted to recording time."""
+    # Shared, lazily loaded Whisper model (defaults to WHISPER_MODEL)
+    model = get_model(model_name)
+    return _segments(model.transcribe(audio), offset)
+
+def stitch_segments(chunk_segments: list) -> dict:
+    """Join per-chunk segment lists (already in recording order) into one transcript."""
+    segments = [segment for chunk in chunk_segments for segment in chunk if segment["text"]]
+    return {"text": " ".join(segment["text"] for segment in segments), "segments": segments}
+
+def transcribe_chunked(audio, model_name: str = None, chunk_seconds: float = TRANSCRIBE_CHUNK_SECONDS) -> dict:
+    """Split a long recording at pauses and transcribe the chunks in parallel processes."""
+    chunks = split_on_silence(audio, SAMPLE_RATE, target_seconds=chunk_seconds, max_seconds=chunk_seconds * 2)
+    executor = get_chunk_executor()
+    futures = [
+        executor.submit(transcribe_chunk, audio[start:end], model_name, start / SAMPLE_RATE)
+        for start, end in chunks
+    ]
+    return stitch_segments([future.result() for future in futures])
+
+def transcribe_pcm(audio, model_name: str = None, mode: str = None) -> dict:
+    """
+    Transcribe decoded 16 kHz mono PCM.
+
+    Returns:
+        Dict with the full "text" and timestamped "segments"
+    """
+    mode = mode or TRANSCRIBE_MODE
+    if mode == "chunked" or (mode == "auto" and len(audio) / SAMPLE_RATE > TRANSCRIBE_CHUNK_MIN_SECONDS):
+        return transcribe_chunked(audio, model_name)
+    return stitch_segments([transcribe_chunk(audio, model_name)])
+
+def transcript_key(audio_source, model_name: str) -> str:
+    """Transcript cache key for an upload (bytes or stored path) and the current decode settings."""
+    return transcript_cache_key(
+        hash_audio(audio_source),
+        model_name,
+        sample_rate=SAMPLE_RATE,
+        mode=TRANSCRIBE_MODE,
+        chunk_seconds=TRANSCRIBE_CHUNK_SECONDS,
+    )
+
+def cached_transcript(cache_key: str):
+    """Return the cached Transcript for `cache_key`, or None on a miss."""
+    result = transcript_cache.get(cache_key)
+    return build_transcript(result) if result is not None else None
+
+def transcribe_to_speeches(audio, model_name: str = None, cache_key: str = None) -> Transcript:
+    """Transcribe decoded PCM, cache the raw result and group the segments into PF speeches."""
+    result = transcribe_pcm(audio, model_name)
+    if cache_key:
+        transcript_cache.put(cache_key, result)
+    return build_transcript(result)
+
+def transcribe_audio(audio_source, model_name: str = None, cache_key: str = None) -> Transcript:
+    """
+    Decode and transcribe an uploaded recording (bytes or a stored path), grouped into PF speeches.
+    Blocking; runs inside the transcription worker pool.
+    """
+    return transcribe_to_speeches(decode_audio(audio_source), model_name, cache_key)
+
+def admit_audio(audio_path: str):
+    """
+    Probe a stored upload's headers and check that it may be transcribed.
+
+    Returns:
+        AudioInfo, or None when the format is not recognised (ffmpeg then decides)
+
+    Raises:
+        ValueError: If the recording is longer than MAX_AUDIO_SECONDS
+    """
+    info = probe_audio(audio_path)
+    if info is not None and info.duration and MAX_AUDIO_SECONDS and info.duration > MAX_AUDIO_SECONDS:
+        raise ValueError(
+            f"Recording is {info.duration / 60:.0f} minutes long. "
+            f"The maximum is {MAX_AUDIO_SECONDS / 60:g} minutes."
+        )
+    return info
+
+def pool_for(duration):
+    """Worker pool for a recording of `duration` seconds (None when unknown)."""
+    if duration and duration >= LONG_AUDIO_SECONDS:
+        return long_transcription_pool
+    return transcription_pool
+
+def run_transcription_job(job: dict, report) -> dict:
+    """Job handler: decode, transcribe and analyze a stored upload, reporting each stage."""
+    params = job["params"]
+    audio_path = params["audio_path"]
+    audio_info = params.get("audio")
+    pool = pool_for((audio_info or {}).get("duration"))
+    try:
+        cache_key = transcript_key(audio_path, params.get("model_name"))
+        transcript = cached_transcript(cache_key)
+        if transcript is None:
+            report("decode", jobs.RUNNING)
+            # Job workers wait for a free slot behind interactive requests instead of failing
+            audio = pool.submit_blocking(decode_audio, audio_path).result()
+            report("decode", jobs.DONE)
+
+            report("transcribe", jobs.RUNNING)
+            transcript = pool.submit_blocking(transcribe_to_speeches, audio, params.get("model_name"), cache_key).result()
+        else:
+            # Same recording transcribed before: skip straight to the analysis
+            report("decode", jobs.DONE)
+        report("transcribe", jobs.DONE)
+
+        report("llm", jobs.RUNNING)
+        # Long rounds are analyzed speech by speech in parallel before the final call
+        messages, token_usage = pf_analysis_messages(
+            params.get("debate_topic", ""), transcript, params.get("side", ""),
+            params.get("analysis_mode"), params.get("regenerate", False)
+        )
+        azure_output = ""
+        last_report = time.monotonic()
+        for delta in call_ai_stream(messages, priority=PRIORITY_BULK, usage=token_usage, cache=True, regenerate=params.get("regenerate", False)):
+            azure_output += delta
+            # Publish partial feedback so pollers can render it as it is written
+            if time.monotonic() - last_report >= JOB_PARTIAL_INTERVAL:
+                report("llm", jobs.RUNNING, result={"azure_output": azure_output})
+                last_report = time.monotonic()
+        report("llm", jobs.DONE)
+
+        return {
+            "azure_output": azure_output, "transcript": transcript.to_dict(), "token_usage": token_usage, "audio": audio_info,
+            "context_id": index_analysis(azure_output, transcript),
+        }
+    finally:
+        if os.path.exists(audio_path):
+            os.remove(audio_path)
+
+jobs.job_queue.register("transcribe", run_transcription_job)
+
 @router.post("/transcribe/")
-async def transcribe_endpoint(file: UploadFile = File(...), model=whisper.load_model("tiny.en"), debate_topic: str = "", side: str = ""):
+async def transcribe_endpoint(request: Request, debate_topic: str = "", side: str = "", model_name: str = "", stream: bool = False, analysis_mode: str = "", regenerate: bool = False):
+    """
+    Transcribe and analyze an uploaded round recording (multipart field "file").
+    Recordings over MAX_AUDIO_UPLOAD_MB are refused with a 413 while they stream in, and
+    recordings whose headers give a duration over MAX_AUDIO_SECONDS with a 400 before decoding.
+    """
+    try:
+        model_name = resolve_model_name(model_name or None)
+        analysis_mode = resolve_analysis_mode(analysis_mode)
+    except ValueError as e:
+        return JSONResponse(content={"error": str(e)}, status_code=400)
+
     try:
-        # Save the uploaded file temporarily
-        with tempfile.NamedTemporaryFile(delete=False, suffix=".mp3") as temp_audio:
-            temp_audio.write(await file.read())
-            temp_audio_path = temp_audio.name
-
-        # Convert the audio file to WAV format
-        with tempfile.NamedTemporaryFile(delete=False, suffix=".wav") as temp_wav:
-            AudioSegment.from_file(temp_audio_path).export(temp_wav.name, format="wav")
-            temp_wav_path = temp_wav.name
-
-        # Transcribe the audio using Whisper
-        transcription = model.transcribe(temp_wav_path)["text"]
-
-        # Clean up temporary files
-        os.remove(temp_audio_path)
-        os.remove(temp_wav_path)
-
-        # Process the transcription with Azure OpenAI
-        azure_output = pf_feedback(debate_topic, transcription, side)
-    
+        form = await read_form(request, MAX_AUDIO_UPLOAD_BYTES)
+    except UploadTooLargeError as e:
+        return too_large_response(e)
+
+    audio_path = None
+    try:
+        file = get_upload(form)
+        # Copy the spooled upload to a named file in blocks; hashing and ffmpeg read it from disk
+        audio_path = upload_path(tempfile.gettempdir(), file.filename)
+        await save_upload(file, audio_path)
+        # Read the duration from the headers; too-long rounds are refused, long ones routed
+        audio_info = await run_in_threadpool(admit_audio, audio_path)
+        audio = audio_info.to_dict() if audio_info else None
+
+        # Re-submitted recordings come straight from the transcript cache
+        cache_key = await run_in_threadpool(transcript_key, audio_path, model_name)
+        transcript = await run_in_threadpool(cached_transcript, cache_key)
+        if transcript is None:
+            # Decode and transcribe in the bounded pool so the event loop stays free
+            pool = pool_for(audio_info.duration if audio_info else None)
+            transcript = await pool.run(transcribe_audio, audio_path, model_name, cache_key)
+
+        if stream:
+            # Send feedback token by token as server-sent events
+            messages, token_usage = await pf_analysis_messages_async(debate_topic, transcript, side, analysis_mode, regenerate)
+            async def payload(text: str) -> dict:
+                # Index the feedback and transcript so /chat/ can retrieve from them
+                context_id = await run_in_threadpool(index_analysis, text, transcript)
+                return {
+                    "azure_output": text, "transcript": transcript.to_dict(), "token_usage": token_usage, "audio": audio,
+                    "context_id": context_id,
+                }
+
+            return stream_llm_response(
+                call_ai_stream_async(messages, priority=PRIORITY_BULK, usage=token_usage, cache=True, regenerate=regenerate),
+                done_payload=payload
+            )
+
+        # Process the speech-labelled transcript with Azure OpenAI
+        # Long rounds are analyzed speech by speech in parallel before the final call
+        messages, token_usage = await pf_analysis_messages_async(debate_topic, transcript, side, analysis_mode, regenerate)
+        azure_output = await call_ai_async(messages, priority=PRIORITY_BULK, usage=token_usage, cache=True, regenerate=regenerate)
+        # Index the feedback and transcript so /chat/ can retrieve from them
+        context_id = await run_in_threadpool(index_analysis, azure_output, transcript)
+
         return JSONResponse(
-            content={"azure_output": azure_output},
+            content={
+                "azure_output": azure_output, "transcript": transcript.to_dict(), "token_usage": token_usage, "audio": audio,
+                "context_id": context_id,
+            },
             status_code=200,
         )
 
+    except PoolFullError as e:
+        return JSONResponse(
+            content={"error": str(e)},
+            status_code=503,
+            headers={"Retry-After": str(e.retry_after)},
+        )
+    except ValueError as e:
+        return JSONResponse(content={"error": str(e)}, status_code=400)
+    except Exception as e:
+        return JSONResponse(content={"error": str(e)}, status_code=500)
+    finally:
+        await form.close()
+        if audio_path and os.path.exists(audio_path):
+            os.remove(audio_path)
+
+@router.post("/jobs/transcribe/")
+async def submit_transcription_job(request: Request):
+    """
+    Queue an audio analysis job and return its id immediately.
+    Form fields: file, debate_topic, side, model_name, analysis_mode, regenerate.
+    Poll GET /jobs/{job_id} for stage progress and GET /jobs/{job_id}/result for the feedback.
+    """
+    try:
+        form = await read_form(request, MAX_AUDIO_UPLOAD_BYTES)
+    except UploadTooLargeError as e:
+        return too_large_response(e)
+
+    try:
+        try:
+            file = get_upload(form)
+            model_name = resolve_model_name(form.get("model_name") or None)
+            analysis_mode = resolve_analysis_mode(form.get("analysis_mode") or "")
+        except ValueError as e:
+            return JSONResponse(content={"error": str(e)}, status_code=400)
+
+        # Keep the upload on disk until a worker picks the job up
+        os.makedirs(jobs.JOBS_DATA_DIR, exist_ok=True)
+        audio_path = upload_path(jobs.JOBS_DATA_DIR, file.filename)
+        await save_upload(file, audio_path)
+
+        try:
+            # Refuse too-long rounds now rather than after they wait in the queue
+            audio_info = await run_in_threadpool(admit_audio, audio_path)
+        except ValueError as e:
+            os.remove(audio_path)
+            return JSONResponse(content={"error": str(e)}, status_code=400)
+
+        try:
+            job = jobs.job_queue.submit("transcribe", {
+                "audio_path": audio_path,
+                "audio": audio_info.to_dict() if audio_info else None,
+                "debate_topic": form.get("debate_topic", ""),
+                "side": form.get("side", ""),
+                "model_name": model_name,
+                "analysis_mode": analysis_mode,
+                "regenerate": form_flag(form, "regenerate"),
+            })
+        except Exception:
+            os.remove(audio_path)
+            raise
+        return JSONResponse(content=jobs.job_status(job), status_code=202)
+
     except Exception as e:
-        return JSONResponse(content={"error": str(e)}, status_code=500)
\ No newline at end of file
+        return JSONResponse(content={"error": str(e)}, status_code=500)
+    finally:
+        await form.close()
@@ -0,0 +1,103 @@
+"""
+Size-bounded multipart upload handling.
+Request bodies are parsed once, straight from the ASGI stream into a spooled
+temporary file, and uploads larger than their type's limit are refused with a
+413 before (Content-Length) or while (streamed bytes) they arrive. Uploads are
+copied on in fixed-size chunks, so memory per request stays flat.
+"""
+import os
+import uuid
+
+from fastapi import Request, UploadFile
+from fastapi.responses import JSONResponse
+from starlette.concurrency import run_in_threadpool
+
+MB = 1024 * 1024
+# Largest accepted recording and document uploads
+MAX_AUDIO_UPLOAD_BYTES = int(float(os.getenv("MAX_AUDIO_UPLOAD_MB", "500")) * MB)
+MAX_DOCUMENT_UPLOAD_BYTES = int(float(os.getenv("MAX_DOCUMENT_UPLOAD_MB", "25")) * MB)
+# Size of the blocks uploads are copied in
+UPLOAD_CHUNK_BYTES = int(os.getenv("UPLOAD_CHUNK_BYTES", str(MB)))
+# Form fields other than the file are short strings
+_MAX_FIELDS = 20
+
+
+class UploadTooLargeError(Exception):
+    """Raised when a request body is larger than the limit for its upload type."""
+
+    def __init__(self, limit: int):
+        super().__init__(f"Upload too large. The maximum size is {limit / MB:g} MB.")
+        self.limit = limit
+
+
+def too_large_response(error: UploadTooLargeError) -> JSONResponse:
+    return JSONResponse(content={"error": str(error)}, status_code=413)
+
+
+def _limited_receive(receive, limit: int):
+    received = 0
+
+    async def receive_within_limit():
+        nonlocal received
+        message = await receive()
+        if message["type"] == "http.request":
+            received += len(message.get("body", b""))
+            if received > limit:
+                raise UploadTooLargeError(limit)
+        return message
+
+    return receive_within_limit
+
+
+async def read_form(request: Request, limit: int):
+    """
+    Parse a multipart request body once, refusing bodies larger than `limit` bytes.
+
+    File parts are spooled to disk by Starlette as they arrive. The caller owns the
+    returned form and must `await form.close()` to delete its temporary files.
+
+    Raises:
+        UploadTooLargeError: If Content-Length or the streamed body exceeds `limit`
+    """
+    content_length = request.headers.get("content-length")
+    if content_length and content_length.isdigit() and int(content_length) > limit:
+        raise UploadTooLargeError(limit)
+    # A request bound to a counting receive; parsing stops at the first byte over the limit
+    limited = Request(request.scope, receive=_limited_receive(request.receive, limit))
+    return await limited.form(max_files=1, max_fields=_MAX_FIELDS)
+
+
+def get_upload(form, name: str = "file") -> UploadFile:
+    """The uploaded file in form field `name`, raising ValueError when it is missing."""
+    upload = form.get(name)
+    if not hasattr(upload, "read"):
+        raise ValueError(f"Missing file upload '{name}'")
+    return upload
+
+
+def form_flag(form, name: str, default: bool = False) -> bool:
+    value = form.get(name)
+    if value is None:
+        return default
+    return str(value).lower() in ("1", "true", "yes", "on")
+
+
+def upload_path(directory: str, filename: str) -> str:
+    """Unique path in `directory` for storing an upload, keeping its extension for ffmpeg and the extractors."""
+    suffix = os.path.splitext(filename or "")[1] or ".upload"
+    return os.path.join(directory, uuid.uuid4().hex + suffix)
+
+
+async def save_upload(upload: UploadFile, path: str, chunk_size: int = UPLOAD_CHUNK_BYTES):
+    """Copy an upload to `path` in `chunk_size` blocks, writing each block in the threadpool."""
+    await upload.seek(0)
+    destination = await run_in_threadpool(open, path, "wb")
+    try:
+        while True:
+            chunk = await upload.read(chunk_size)
+            if not chunk:
+                break
+            await run_in_threadpool(destination.write, chunk)
+    finally:
+        await run_in_threadpool(destination.close)
+
@@ -0,0 +1,252 @@
+"""
+Bounded worker pools for blocking, CPU-heavy work (audio decoding, Whisper).
+Keeps that work off the asyncio event loop and refuses new work once the pool
+and its queue are full so callers can answer with a Retry-After instead of piling up.
+"""
+import asyncio
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from backend.models import DEFAULT_MODEL, MODEL_MEMORY_MB
+
+# "thread" or "process"
+TRANSCRIBE_EXECUTOR = os.getenv("TRANSCRIBE_EXECUTOR", "thread")
+# Number of transcriptions that run at the same time
+TRANSCRIBE_WORKERS = int(os.getenv("TRANSCRIBE_WORKERS", "2"))
+# Number of transcriptions allowed to wait for a free worker
+TRANSCRIBE_QUEUE_DEPTH = int(os.getenv("TRANSCRIBE_QUEUE_DEPTH", "4"))
+# Seconds clients are told to wait before retrying when the pool is full
+TRANSCRIBE_RETRY_AFTER = int(os.getenv("TRANSCRIBE_RETRY_AFTER", "30"))
+# Separate pool for recordings of at least LONG_AUDIO_SECONDS, so long rounds
+# never hold up the workers that serve ordinary speeches
+LONG_TRANSCRIBE_EXECUTOR = os.getenv("LONG_TRANSCRIBE_EXECUTOR", TRANSCRIBE_EXECUTOR)
+LONG_TRANSCRIBE_WORKERS = int(os.getenv("LONG_TRANSCRIBE_WORKERS", "1"))
+LONG_TRANSCRIBE_QUEUE_DEPTH = int(os.getenv("LONG_TRANSCRIBE_QUEUE_DEPTH", "2"))
+LONG_TRANSCRIBE_RETRY_AFTER = int(os.getenv("LONG_TRANSCRIBE_RETRY_AFTER", "120"))
+# Memory (MB) for chunked transcription processes, each of which loads its own copy of WHISPER_MODEL
+TRANSCRIBE_CHUNK_MEMORY_MB = int(os.getenv("TRANSCRIBE_CHUNK_MEMORY_MB", "2048"))
+_CHUNK_WORKERS_BY_MEMORY = TRANSCRIBE_CHUNK_MEMORY_MB // MODEL_MEMORY_MB.get(DEFAULT_MODEL, max(MODEL_MEMORY_MB.values()))
+# Processes used to transcribe the chunks of one long recording in parallel
+CHUNK_WORKERS = int(os.getenv("TRANSCRIBE_CHUNK_WORKERS", str(max(1, min(os.cpu_count() or 1, 4, _CHUNK_WORKERS_BY_MEMORY)))))
+# "process" or "thread" pool that parses uploaded DOCX/PDF/TXT cases
+EXTRACT_EXECUTOR = os.getenv("EXTRACT_EXECUTOR", "process")
+# Number of case documents parsed at the same time
+EXTRACT_WORKERS = int(os.getenv("EXTRACT_WORKERS", str(min(os.cpu_count() or 1, 4))))
+# Number of case documents allowed to wait for a free worker
+EXTRACT_QUEUE_DEPTH = int(os.getenv("EXTRACT_QUEUE_DEPTH", "16"))
+EXTRACT_RETRY_AFTER = int(os.getenv("EXTRACT_RETRY_AFTER", "10"))
+# Processes used to read the pages of large PDF uploads in parallel
+PDF_WORKERS = int(os.getenv("PDF_WORKERS", str(min(os.cpu_count() or 1, 4))))
+
+
+# Fresh interpreters for worker processes; forking a threaded server with torch loaded can deadlock
+_SPAWN = multiprocessing.get_context("spawn")
+
+
+class PoolFullError(Exception):
+    """Raised when a worker pool has no free worker and no room left in its queue."""
+
+    def __init__(self, pool_name: str, retry_after: int):
+        super().__init__(f"The {pool_name} queue is full. Please retry in {retry_after} seconds.")
+        self.retry_after = retry_after
+
+
+class WorkerPool:
+    """
+    Thread or process pool with a hard limit on running plus queued jobs.
+
+    Args:
+        name: Human readable name used in error messages
+        workers: Maximum number of jobs running at once
+        queue_depth: Maximum number of jobs waiting for a worker
+        kind: "thread" or "process"
+        retry_after: Seconds suggested to clients when the pool is full
+        initializer: Called once in each worker process (process pools only)
+    """
+
+    def __init__(self, name: str, workers: int, queue_depth: int, kind: str = "thread", retry_after: int = 30, initializer=None):
+        if kind not in ("thread", "process"):
+            raise ValueError(f"Unsupported executor kind: {kind}")
+        self.name = name
+        self.workers = max(1, workers)
+        self.queue_depth = max(0, queue_depth)
+        self.kind = kind
+        self.retry_after = retry_after
+        self.initializer = initializer
+        self._executor = None
+        self._pending = 0
+        self._lock = threading.Lock()
+        # Signalled whenever a job leaves the pool
+        self._slot_free = threading.Condition(self._lock)
+
+    @property
+    def pending(self) -> int:
+        """Number of jobs running or waiting in the pool."""
+        return self._pending
+
+    def _get_executor(self):
+        if self._executor is None:
+            if self.kind == "process":
+                self._executor = ProcessPoolExecutor(max_workers=self.workers, mp_context=_SPAWN, initializer=self.initializer)
+            else:
+                self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix=self.name)
+        return self._executor
+
+    def _release(self, _future=None):
+        with self._lock:
+            self._pending -= 1
+            self._slot_free.notify()
+
+    def _full(self) -> bool:
+        return self._pending >= self.workers + self.queue_depth
+
+    def submit(self, fn, *args, **kwargs):
+        """
+        Submit `fn` to the pool, raising PoolFullError when it is saturated.
+
+        Returns:
+            concurrent.futures.Future for the job
+        """
+        with self._lock:
+            if self._full():
+                raise PoolFullError(self.name, self.retry_after)
+            self._pending += 1
+            executor = self._get_executor()
+        return self._start(executor, fn, *args, **kwargs)
+
+    def submit_blocking(self, fn, *args, **kwargs):
+        """
+        Submit `fn` to the pool, waiting for room when it is saturated.
+        For background job threads, which should queue behind interactive requests
+        rather than fail; never call it from the event loop.
+
+        Returns:
+            concurrent.futures.Future for the job
+        """
+        with self._slot_free:
+            self._slot_free.wait_for(lambda: not self._full())
+            self._pending += 1
+            executor = self._get_executor()
+        return self._start(executor, fn, *args, **kwargs)
+
+    def _start(self, executor, fn, *args, **kwargs):
+        try:
+            future = executor.submit(fn, *args, **kwargs)
+        except Exception:
+            self._release()
+            raise
+        # Release the slot when the job really finishes, even if the awaiting request went away
+        future.add_done_callback(self._release)
+        return future
+
+    async def run(self, fn, *args, **kwargs):
+        """Run `fn` in the pool and await its result without blocking the event loop."""
+        return await asyncio.wrap_future(self.submit(fn, *args, **kwargs))
+
+    def shutdown(self, wait: bool = True):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=wait)
+
+
+def _init_chunk_worker(threads: int):
+    # Split the CPU between chunk workers instead of letting each grab every core
+    try:
+        import torch
+        torch.set_num_threads(threads)
+    except ImportError:
+        pass
+
+
+_chunk_executor = None
+_chunk_lock = threading.Lock()
+
+
+def get_chunk_executor() -> ProcessPoolExecutor:
+    """
+    Process pool for chunked transcription. Processes are used because a Whisper
+    model cannot run concurrent transcriptions from several threads.
+    """
+    global _chunk_executor
+    with _chunk_lock:
+        if _chunk_executor is None:
+            threads = max(1, (os.cpu_count() or 1) // max(1, CHUNK_WORKERS))
+            _chunk_executor = ProcessPoolExecutor(
+                max_workers=max(1, CHUNK_WORKERS),
+                mp_context=_SPAWN,
+                initializer=_init_chunk_worker,
+                initargs=(threads,),
+            )
+        return _chunk_executor
+
+
+def shutdown_chunk_executor(wait: bool = True):
+    global _chunk_executor
+    with _chunk_lock:
+        executor, _chunk_executor = _chunk_executor, None
+    if executor is not None:
+        executor.shutdown(wait=wait)
+
+
+_pdf_executor = None
+_pdf_lock = threading.Lock()
+# Set in extraction worker processes, which read PDFs page by page themselves
+# instead of starting a nested PDF pool per worker
+_in_extraction_worker = False
+
+
+def _init_extraction_worker():
+    global _in_extraction_worker
+    _in_extraction_worker = True
+
+
+def in_extraction_worker() -> bool:
+    return _in_extraction_worker
+
+
+def get_pdf_executor() -> ProcessPoolExecutor:
+    """Process pool for page-parallel PDF reading; parsing PDFs is pure-Python CPU work."""
+    global _pdf_executor
+    with _pdf_lock:
+        if _pdf_executor is None:
+            _pdf_executor = ProcessPoolExecutor(max_workers=max(1, PDF_WORKERS), mp_context=_SPAWN)
+        return _pdf_executor
+
+
+def shutdown_pdf_executor(wait: bool = True):
+    global _pdf_executor
+    with _pdf_lock:
+        executor, _pdf_executor = _pdf_executor, None
+    if executor is not None:
+        executor.shutdown(wait=wait)
+
+
+# Shared pool for audio decoding and Whisper transcription
+transcription_pool = WorkerPool(
+    "transcription",
+    workers=TRANSCRIBE_WORKERS,
+    queue_depth=TRANSCRIBE_QUEUE_DEPTH,
+    kind=TRANSCRIBE_EXECUTOR,
+    retry_after=TRANSCRIBE_RETRY_AFTER,
+)
+
+# Pool for recordings the metadata probe reports as long (see backend.transcription)
+long_transcription_pool = WorkerPool(
+    "long recording",
+    workers=LONG_TRANSCRIBE_WORKERS,
+    queue_depth=LONG_TRANSCRIBE_QUEUE_DEPTH,
+    kind=LONG_TRANSCRIBE_EXECUTOR,
+    retry_after=LONG_TRANSCRIBE_RETRY_AFTER,
+)
+
+# Shared pool for parsing uploaded case documents
+extraction_pool = WorkerPool(
+    "extraction",
+    workers=EXTRACT_WORKERS,
+    queue_depth=EXTRACT_QUEUE_DEPTH,
+    kind=EXTRACT_EXECUTOR,
+    retry_after=EXTRACT_RETRY_AFTER,
+    initializer=_init_extraction_worker,
+)
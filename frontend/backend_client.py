@@ -0,0 +1,63 @@
+"""
+Shared HTTP client for calls from the Streamlit frontend to the FastAPI backend.
+One keep-alive session per Streamlit server process (st.cache_resource), with
+connect/read timeouts per endpoint and retries for idempotent status polls.
+"""
+import os
+from urllib.parse import urljoin
+
+import requests
+import streamlit as st
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+# Base URL of the FastAPI backend
+BACKEND_URL = os.getenv("BACKEND_URL", "http://127.0.0.1:8000/")
+# Seconds to wait for a connection to the backend
+BACKEND_CONNECT_TIMEOUT = float(os.getenv("BACKEND_CONNECT_TIMEOUT", "5"))
+# Connections kept open to the backend, shared by every Streamlit session
+BACKEND_POOL_SIZE = int(os.getenv("BACKEND_POOL_SIZE", "20"))
+# Retries of idempotent requests (status polls) on connection errors and 502/503/504
+BACKEND_RETRIES = int(os.getenv("BACKEND_RETRIES", "3"))
+
+# Seconds to wait for each endpoint's response (for streams: between chunks)
+READ_TIMEOUTS = {
+    "process_text": 300,
+    "submit_job": 120,
+    "job_status": 30,
+    # A chat turn may first fold old turns into the conversation summary
+    "chat": 60,
+}
+
+
+def backend_url(path: str) -> str:
+    """Absolute URL of a backend path such as "process-text/"."""
+    return urljoin(BACKEND_URL.rstrip("/") + "/", path.lstrip("/"))
+
+
+def timeout(endpoint: str) -> tuple:
+    """(connect, read) timeout for a backend endpoint."""
+    return (BACKEND_CONNECT_TIMEOUT, READ_TIMEOUTS[endpoint])
+
+
+def create_session() -> requests.Session:
+    """Session with a pooled keep-alive adapter; only GET requests are retried."""
+    retry = Retry(
+        total=BACKEND_RETRIES,
+        backoff_factor=0.5,
+        status_forcelist=(502, 503, 504),
+        allowed_methods=frozenset(["GET"]),
+        respect_retry_after_header=True,
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=BACKEND_POOL_SIZE, max_retries=retry)
+    session = requests.Session()
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+@st.cache_resource(show_spinner=False)
+def get_session() -> requests.Session:
+    """The process-wide backend session, created on first use."""
+    return create_session()
@@ -1,8 +1,7 @@
 import streamlit as st
-import requests
+from frontend.backend_client import backend_url, get_session, timeout
 from frontend.chat import render_chat_interface
-
-FASTAPI_URL = "http://127.0.0.1:8000/process-text/"
+from frontend.streaming import LLMStream
 
 def text_upload(debate_topic, side):
     """Enhanced text file upload with better UI/UX design principles"""
@@ -82,6 +81,8 @@ def text_upload(debate_topic, side):
             st.button("🚀 Analyze Text", disabled=True, use_container_width=True)
             return
 
+        regenerate = st.checkbox("🔄 Regenerate feedback", help="Ignore feedback saved from an earlier analysis of this same file")
+
         # **TIP 6: Enhanced call-to-action** with primary styling
         if st.button("🚀 Analyze Text", type="primary", use_container_width=True):
             with st.spinner("🔄 Analyzing your text with AI... This may take a moment"):
@@ -99,31 +100,56 @@ def text_upload(debate_topic, side):
                     # Send the file, debate topic, and upload format to the FastAPI backend
                     current_upload_format = upload_format  # Direct variable
                     
-                    response = requests.post(
-                        FASTAPI_URL,
+                    response = get_session().post(
+                        backend_url("process-text/"),
                         files={"file": uploaded_file},
                         data={
                             "debate_topic": debate_topic, 
                             "side": side,
                             "upload_format": current_upload_format,
-                            "file_extension": file_extension
+                            "file_extension": file_extension,
+                            "stream": "true",
+                            "regenerate": str(regenerate).lower()
                         },
+                        stream=True,
+                        timeout=timeout("process_text")
                     )
                     
                     progress_bar.progress(75, "Processing with AI...")
 
-                    if response.status_code == 200:
+                    processed_text, context_id, error_msg = None, None, None
+                    if response.status_code != 200:
+                        error_msg = response.json().get('error', 'Unknown error occurred')
+                    elif response.headers.get("content-type", "").startswith("text/event-stream"):
+                        # Render the feedback as it is generated
+                        live_output = st.empty()
+                        feedback_stream = LLMStream(response)
+                        with live_output.container():
+                            streamed_text = st.write_stream(feedback_stream)
+                        live_output.empty()  # Full results are shown below
+                        
+                        if feedback_stream.error:
+                            error_msg = feedback_stream.error
+                        else:
+                            processed_text = (feedback_stream.final or {}).get("processed_text", streamed_text)
+                            context_id = (feedback_stream.final or {}).get("context_id")
+                    else:
+                        response_data = response.json()
+                        processed_text = response_data.get("processed_text", "")
+                        context_id = response_data.get("context_id")
+
+                    if error_msg is None:
                         progress_bar.progress(100, "Complete!")
                         progress_bar.empty()  # Remove progress bar
                         
-                        processed_text = response.json().get("processed_text", "")
-                        
                         # Store results in session state to persist across reruns
                         st.session_state.analysis_results = {
                             "processed_text": processed_text,
                             "debate_topic": debate_topic,
                             "filename": uploaded_file.name,
                             "upload_format": current_upload_format,
+                            # Grounds the chat in the case as well as the feedback
+                            "context_id": context_id,
                             "completed": True
                         }
                         
@@ -132,7 +158,6 @@ def text_upload(debate_topic, side):
                     
                     else:
                         progress_bar.empty()
-                        error_msg = response.json().get('error', 'Unknown error occurred')
                         
                         # Enhanced error handling for document processing
                         if "File processing error" in error_msg:
@@ -230,8 +255,8 @@ def text_upload(debate_topic, side):
             
             # Import and render chat interface
             try:
-                # Use direct Azure connection for reliability
-                render_chat_interface(processed_text, debate_topic, use_api=False)
+                # The backend keeps the conversation; the frontend falls back to Azure if it is down
+                render_chat_interface(processed_text, debate_topic, use_api=True, context_id=results.get('context_id'))
                 
             except Exception as chat_error:
                 st.error(f"Chat feature temporarily unavailable: {str(chat_error)}")
@@ -8,63 +8,93 @@ import os
 sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
 
 try:
-    from backend.azure import call_ai
+    from backend.azure import call_ai, call_ai_stream
 except ImportError:
     # Fallback import path
     sys.path.append(os.path.dirname(os.path.dirname(__file__)))
-    from backend.azure import call_ai
+    from backend.azure import call_ai, call_ai_stream
+from backend.chat_context import chat_messages, split_history
 
-CHAT_API_URL = "http://127.0.0.1:8000/chat/"
+from frontend.backend_client import backend_url, get_session, timeout
+from frontend.streaming import LLMStream
+
+CHAT_API_URL = backend_url("chat/")
+
+def end_chat_session():
+    """Forget the backend conversation so the next message starts a new one"""
+    session_id = st.session_state.pop("chat_session_id", None)
+    if session_id:
+        try:
+            get_session().delete(backend_url(f"chat/{session_id}"), timeout=timeout("chat"))
+        except requests.exceptions.RequestException:
+            pass  # The backend expires idle conversations on its own
 
 def clear_chat():
     """Clear the chat messages and reset session state"""
+    end_chat_session()
     st.session_state.chat_messages = []
     st.session_state.chat_context = ""
     st.session_state.chat_topic = ""
     st.success("🗑️ Chat cleared successfully!")
     
-def ai_response(user_input, use_api=False):
-    """Generate AI response without UI elements to avoid interference with reruns"""
+def stream_api_response(user_input):
+    """Render the assistant reply streamed by the backend /chat/ endpoint and return the full text"""
+    reply_stream = None
     try:
-        if use_api:
-            # Try API first but fall back to direct if it fails
-            assistant_response = generate_chat_response_api(
-                user_input, 
-                st.session_state.chat_context,
-                st.session_state.chat_topic,
-                st.session_state.chat_messages
-            )
+        response = post_chat_message(user_input, stream=True)
+        if response.status_code == 200:
+            reply_stream = LLMStream(response)
+            reply = st.write_stream(reply_stream)
+            if reply_stream.final:
+                st.session_state.chat_session_id = reply_stream.final.get("session_id")
+                return reply_stream.final.get("response") or reply
+            raise Exception(reply_stream.error or "The reply stream ended early")
         else:
-            # Use direct Azure connection (recommended)
-            assistant_response = generate_chat_response_direct(
-                user_input, 
-                st.session_state.chat_context,
-                st.session_state.chat_topic,
-                st.session_state.chat_messages
-            )
-        return assistant_response
-    
+            raise Exception(response.json().get("error", "Unknown API error"))
+    except Exception as e:
+        if reply_stream is not None and reply_stream.text:
+            # Part of the reply is already on screen; keep it rather than answering a second time
+            st.session_state.chat_error = f"⚠️ The AI Coach reply was cut off ({str(e)})"
+            return reply_stream.text
+        st.session_state.chat_error = f"🔄 AI Coach service issue ({str(e)}) - answered directly instead"
+    # Backend unavailable: answer from this process instead
+    return stream_ai_response(user_input)
+
+def stream_ai_response(user_input):
+    """Render the assistant reply token by token as it is generated and return the full text"""
+    messages = build_chat_messages(
+        st.session_state.chat_context,
+        st.session_state.chat_topic,
+        st.session_state.chat_messages
+    )
+    try:
+        response = st.write_stream(call_ai_stream(messages))
+        if response and response.strip():
+            return response
     except Exception as e:
         error_msg = str(e).lower()
         if any(word in error_msg for word in ["connection", "timeout", "refused", "azure", "api"]):
-            # Store error in session state to display later
             st.session_state.chat_error = "🔄 AI Coach connection issues - using fallback responses"
-        fallback_response = generate_fallback_response(
-            user_input,
-            st.session_state.chat_context,
-            st.session_state.chat_topic
-        )
-        return "I encountered a technical issue, but here's some general guidance: " + fallback_response
-
-def render_chat_interface(initial_context, debate_topic, use_api=False):
+    
+    fallback_response = generate_fallback_response(
+        user_input,
+        st.session_state.chat_context,
+        st.session_state.chat_topic
+    )
+    st.markdown(fallback_response)
+    return fallback_response
+
+def render_chat_interface(initial_context, debate_topic, use_api=False, context_id=None):
     """
     Render an interactive chat interface for discussing feedback with AI
     
     Args:
         initial_context (str): The initial feedback/analysis to provide context
         debate_topic (str): The debate topic for context
-        use_api (bool): Whether to use the FastAPI backend or direct Azure calls
-                       Default False since FastAPI backend may not be running
+        use_api (bool): Whether to use the FastAPI backend /chat/ endpoint (falling back
+                       to direct Azure calls when it is unreachable) or direct Azure calls only
+        context_id (str): Retrieval index returned with the analysis; backend chat sessions
+                       use it to quote the transcript or case
     """
     
     # **TIP 1: Chat UI Header** with clear purpose and styling
@@ -83,9 +113,14 @@ def render_chat_interface(initial_context, debate_topic, use_api=False):
     if "chat_messages" not in st.session_state:
         st.session_state.chat_messages = []
     
+    # A new analysis starts a new backend conversation
+    if st.session_state.get("chat_context") != initial_context:
+        end_chat_session()
+    
     # Always update context and topic for the current analysis
     st.session_state.chat_context = initial_context
     st.session_state.chat_topic = debate_topic
+    st.session_state.chat_context_id = context_id
     
     # **TIP 3: Chat container** with better styling
     chat_container = st.container()
@@ -140,9 +175,14 @@ def render_chat_interface(initial_context, debate_topic, use_api=False):
             "content": user_input
         })
         
-        # Generate AI response with spinner
-        with st.spinner("🤖 AI Coach is thinking..."):
-            assistant_response = ai_response(user_input, use_api)
+        if use_api:
+            # Stream the reply from the backend, which keeps the conversation
+            with st.chat_message("assistant", avatar="🤖"):
+                assistant_response = stream_api_response(user_input)
+        else:
+            # Stream the reply into the chat as it is generated
+            with st.chat_message("assistant", avatar="🤖"):
+                assistant_response = stream_ai_response(user_input)
         
         # Add AI response to chat
         st.session_state.chat_messages.append({
@@ -158,43 +198,54 @@ def render_chat_interface(initial_context, debate_topic, use_api=False):
         # Trigger rerun to display the new messages
         st.rerun()
 
-def generate_chat_response_api(user_message, initial_context, debate_topic, chat_history):
+def post_chat_message(user_message, stream=False):
     """
-    Generate AI response using the FastAPI backend
-    Note: Falls back to direct Azure connection if API is not available
+    Send one message to the backend /chat/ endpoint.
+    The backend keeps the conversation, so after the first turn only the new message
+    and the session id are sent. The analysis and earlier turns are sent only to
+    start a session, or to start a new one when the old session has expired.
     """
-    try:
-        # Prepare chat history for API
-        api_history = [
-            {"role": msg["role"], "content": msg["content"]} 
-            for msg in chat_history[:-1]  # Exclude current message
-        ]
-        
-        response = requests.post(CHAT_API_URL, json={
-            "user_message": user_message,
-            "initial_context": initial_context,
-            "debate_topic": debate_topic,
-            "chat_history": api_history
-        }, timeout=10)  # Add timeout to prevent hanging
-        
-        if response.status_code == 200:
-            return response.json().get("response", "Sorry, I couldn't generate a response.")
-        else:
-            error_msg = response.json().get("error", "Unknown API error")
-            raise Exception(f"API Error: {error_msg}")
-            
-    except requests.exceptions.ConnectionError:
-        # API server not running - fall back to direct method
-        st.info("🔄 API server not available, using direct Azure connection...")
-        return generate_chat_response_direct(user_message, initial_context, debate_topic, chat_history)
-    except requests.exceptions.Timeout:
-        # API timeout - fall back to direct method
-        st.warning("⏱️ API timeout, using direct Azure connection...")
-        return generate_chat_response_direct(user_message, initial_context, debate_topic, chat_history)
-    except Exception as e:
-        # Other API errors - fall back to direct method
-        st.warning(f"🔄 API issue ({str(e)}), using direct Azure connection...")
-        return generate_chat_response_direct(user_message, initial_context, debate_topic, chat_history)
+    payload = {"user_message": user_message, "stream": stream}
+    session_id = st.session_state.get("chat_session_id")
+    if session_id:
+        response = get_session().post(
+            CHAT_API_URL, json={**payload, "session_id": session_id}, stream=stream, timeout=timeout("chat")
+        )
+        if response.status_code != 404:
+            return response
+        st.session_state.pop("chat_session_id", None)
+    
+    return get_session().post(CHAT_API_URL, json={
+        **payload,
+        "initial_context": st.session_state.chat_context,
+        "debate_topic": st.session_state.chat_topic,
+        "context_id": st.session_state.get("chat_context_id"),
+        # Turns before the current message
+        "chat_history": [
+            {"role": msg["role"], "content": msg["content"]}
+            for msg in st.session_state.chat_messages[:-1]
+        ],
+    }, stream=stream, timeout=timeout("chat"))
+
+def build_chat_messages(initial_context, debate_topic, chat_history):
+    """
+    Build the message list sent to Azure OpenAI for a chat turn
+    Uses the same layout as the backend /chat/ endpoint (backend.chat_context): a fixed
+    session prefix, the recent turns, the analysis sections relevant to the question
+    and the question itself (the transcript and case are only searched by the backend)
+    
+    Args:
+        initial_context (str): Original feedback/analysis
+        debate_topic (str): The debate topic
+        chat_history (list): Chat messages including the current user message
+    
+    Returns:
+        list: Messages for call_ai / call_ai_stream
+    """
+    turns = [{"role": msg["role"], "content": msg["content"]} for msg in chat_history]
+    # Without the backend there is no rolling summary, so the oldest turns are dropped instead
+    start = split_history(turns)
+    return chat_messages(debate_topic, initial_context, turns[start:])
 
 def generate_chat_response_direct(user_message, initial_context, debate_topic, chat_history):
     """
@@ -210,28 +261,8 @@ def generate_chat_response_direct(user_message, initial_context, debate_topic, c
         str: AI response
     """
     
-    # **TIP 9: Build conversation context**
-    system_prompt = f"""You are an expert debate coach having a conversation with a student about their debate performance. 
-
-CONTEXT:
-- Debate Topic: {debate_topic}
-- Initial Analysis: {initial_context[:1000]}...
-
-Your role is to:
-1. Provide helpful, specific advice about debate techniques
-2. Answer questions about the initial feedback clearly
-3. Suggest practical improvement strategies
-4. Be encouraging and constructive
-5. Keep responses concise but informative (2-3 paragraphs max)
-
-Conversation style:
-- Friendly and supportive
-- Use relevant examples when helpful
-- Focus on actionable advice
-- Reference the initial analysis when relevant"""
-    
     try:
-        messages = st.session_state.chat_messages + [{"role": "system", "content": system_prompt}]
+        messages = build_chat_messages(initial_context, debate_topic, chat_history)
         response = call_ai(messages)
         if not response or response.strip() == "":
             # Handle empty response
@@ -411,6 +442,7 @@ def render_chat_controls():
     
     with col2:
         if st.button("🔄 Reset Chat", use_container_width=True):
+            end_chat_session()
             st.session_state.chat_messages = []
             st.rerun()
     
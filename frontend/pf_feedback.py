@@ -1,10 +1,81 @@
+import hashlib
 import streamlit as st
-import requests
-import os
 import time
+from urllib.parse import urljoin
+from backend.audio_probe import probe_audio
+from frontend.backend_client import get_session, timeout
 from frontend.chat import render_chat_interface
 
-def get_feedback(temp_audio_path, url, debate_topic, side):
+def _upload_key(uploaded_file):
+    return getattr(uploaded_file, "file_id", None) or f"{uploaded_file.name}:{uploaded_file.size}"
+
+def upload_digest(uploaded_file):
+    """
+    SHA-256 of an uploaded file, computed once per upload and kept in session state.
+    Reruns of the script reuse the digest instead of hashing the audio again.
+    """
+    digests = st.session_state.setdefault("upload_digests", {})
+    upload_key = _upload_key(uploaded_file)
+    if upload_key not in digests:
+        # getbuffer() is a view of the upload's bytes, so hashing does not copy them
+        digests[upload_key] = hashlib.sha256(uploaded_file.getbuffer()).hexdigest()
+    return digests[upload_key]
+
+def upload_audio_info(uploaded_file):
+    """
+    Duration, codec, sample rate and channels read from the upload's headers
+    (the same probe the backend uses for admission), once per upload.
+
+    Returns:
+        Dict of audio metadata, or None when the format is not recognised
+    """
+    infos = st.session_state.setdefault("upload_audio_infos", {})
+    upload_key = _upload_key(uploaded_file)
+    if upload_key not in infos:
+        info = probe_audio(uploaded_file)
+        infos[upload_key] = info.to_dict() if info else None
+    return infos[upload_key]
+
+def format_duration(seconds):
+    """Duration as m:ss (or h:mm:ss), or "N/A" when unknown."""
+    if not seconds:
+        return "N/A"
+    minutes, secs = divmod(int(round(seconds)), 60)
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours}:{minutes:02d}:{secs:02d}" if hours else f"{minutes}:{secs:02d}"
+
+def describe_audio(audio_info):
+    """
+    Duration, codec, sample rate and channels of a probe result for display,
+    leaving out the fields the probe could not read.
+    """
+    details = []
+    if audio_info.get("codec"):
+        details.append(audio_info["codec"])
+    if audio_info.get("sample_rate"):
+        details.append(f"{audio_info['sample_rate'] / 1000:g} kHz")
+    channels = audio_info.get("channels")
+    if channels:
+        details.append({1: "mono", 2: "stereo"}.get(channels, f"{channels} channels"))
+
+    parts = []
+    if audio_info.get("duration"):
+        parts.append(f"⏱️ {format_duration(audio_info['duration'])}")
+    if details:
+        parts.append(", ".join(details))
+    return " · ".join(parts)
+
+def already_processed(audio_hash, debate_topic, side):
+    """True when the stored results are for this recording, topic and side."""
+    results = st.session_state.get("pf_analysis_results") or {}
+    return (
+        results.get("completed", False)
+        and results.get("audio_hash") == audio_hash
+        and results.get("debate_topic") == debate_topic
+        and results.get("side") == side
+    )
+
+def get_feedback(uploaded_file, url, debate_topic, side):
     """Enhanced audio feedback function with better UI/UX design principles"""
     
     # **TIP 1: Better progress indication** with detailed steps
@@ -20,25 +91,26 @@ def get_feedback(temp_audio_path, url, debate_topic, side):
         # **TIP 2: Step-by-step progress** for better user experience
         with status_container:
             status_text.text("🎯 Initializing analysis...")
-            progress_bar.progress(10)
+            progress_bar.progress(2)
             time.sleep(0.5)  # Brief pause for better UX
             
             status_text.text("📤 Uploading audio file...")
-            progress_bar.progress(25)
-            
-            # Send the audio file to the FastAPI backend
-            with open(temp_audio_path, "rb") as audio_file:
-                response = requests.post(
-                    url, 
-                    files={"file": audio_file}, 
-                    data={"debate_topic": debate_topic, "side": side}
-                )
+            progress_bar.progress(5)
             
-            status_text.text("🎙️ Transcribing audio...")
-            progress_bar.progress(50)
+            # Queue the analysis on the FastAPI backend; it answers with a job id right away.
+            # The upload is sent straight from memory, never written to disk first.
+            audio_hash = upload_digest(uploaded_file)
+            uploaded_file.seek(0)
+            response = get_session().post(
+                url, 
+                files={"file": (uploaded_file.name, uploaded_file, uploaded_file.type or "application/octet-stream")}, 
+                data={"debate_topic": debate_topic, "side": side},
+                timeout=timeout("submit_job")
+            )
             
-            status_text.text("🤖 Generating AI feedback...")
-            progress_bar.progress(75)
+            if response.status_code == 202:
+                # Follow the job's real stages until the result is ready
+                response = wait_for_job(url, response.json(), progress_bar, status_text)
 
             # Handle the response
             if response.status_code == 200:
@@ -56,9 +128,14 @@ def get_feedback(temp_audio_path, url, debate_topic, side):
                 # Store results in session state to persist across reruns
                 st.session_state.pf_analysis_results = {
                     "azure_output": azure_output,
+                    "transcript": response_data.get("transcript"),
                     "debate_topic": debate_topic,
                     "side": side,
-                    "audio_path": temp_audio_path,
+                    "audio_hash": audio_hash,
+                    # Prefer the backend's probe of the stored upload, which admitted the job
+                    "audio": response_data.get("audio") or upload_audio_info(uploaded_file),
+                    # Grounds the chat in the transcript as well as the feedback
+                    "context_id": response_data.get("context_id"),
                     "completed": True
                 }
                 
@@ -70,8 +147,13 @@ def get_feedback(temp_audio_path, url, debate_topic, side):
                 status_text.empty()
                 
                 error_msg = response.json().get('error', 'Unknown error occurred')
+                if response.status_code == 503:
+                    # Transcription queue is full - the backend tells us when to retry
+                    retry_after = response.headers.get("Retry-After", "30")
+                    st.warning(f"⏳ The coach is busy with other recordings. Please try again in about {retry_after} seconds.")
+                    return
                 st.error(f"❌ Analysis failed: {error_msg}")
-                
+
                 # **TIP 12: Enhanced error guidance** for Azure connection issues
                 with st.expander("🔧 Troubleshooting"):
                     if "authentication" in error_msg.lower() or "api key" in error_msg.lower():
@@ -122,26 +204,50 @@ def get_feedback(temp_audio_path, url, debate_topic, side):
             4. Contact support if the issue persists
             """)
 
-    finally:
-        # **TIP 15: Clean resource management**
-        try:
-            if os.path.exists(temp_audio_path):
-                os.remove(temp_audio_path)
-        except Exception as cleanup_error:
-            st.sidebar.warning(f"⚠️ Cleanup warning: {cleanup_error}")
+# Status messages shown while each backend job stage is running
+JOB_STAGE_MESSAGES = {
+    "decode": "🎧 Decoding audio...",
+    "transcribe": "🎙️ Transcribing audio...",
+    "llm": "🤖 Generating AI feedback...",
+}
 
-def get_audio_duration(audio_path):
-    """Get audio duration in seconds (simplified version)"""
-    try:
-        # This is a simplified duration calculation
-        # In a real implementation, you might use librosa or pydub
-        import os
-        file_size = os.path.getsize(audio_path)
-        # Rough estimate: 1MB ≈ 60 seconds for compressed audio
-        estimated_duration = (file_size / 1024 / 1024) * 60
-        return min(estimated_duration, 600)  # Cap at 10 minutes for display
-    except:
-        return 0.0
+def wait_for_job(url, job, progress_bar, status_text, poll_interval=1.0, max_wait=3600):
+    """
+    Poll a backend job until it finishes, mirroring its stage progress in the UI.
+    Feedback the model has generated so far is shown while the job is still running.
+    
+    Returns:
+        requests.Response from the job's result endpoint
+    """
+    status_url = urljoin(url, job["status_url"])
+    result_url = urljoin(url, job["result_url"])
+    deadline = time.time() + max_wait
+    live_output = st.empty()
+    
+    while time.time() < deadline:
+        # Status polls are idempotent, so the shared session retries them on transient errors
+        status = get_session().get(status_url, timeout=timeout("job_status"))
+        if status.status_code != 200:
+            return status
+        job = status.json()
+        
+        progress_bar.progress(int(job.get("progress", 0) * 100))
+        running = [stage for stage, state in job.get("stages", {}).items() if state == "running"]
+        if running:
+            status_text.text(JOB_STAGE_MESSAGES.get(running[0], "⏳ Working..."))
+        elif job.get("status") == "queued":
+            status_text.text("⏳ Waiting for a free transcription worker...")
+        
+        partial_output = (job.get("partial_result") or {}).get("azure_output")
+        if partial_output:
+            live_output.markdown(partial_output)
+        
+        if job.get("status") in ("completed", "failed"):
+            live_output.empty()  # Full results are shown once the job returns
+            return get_session().get(result_url, timeout=timeout("job_status"))
+        time.sleep(poll_interval)
+    
+    raise TimeoutError("The analysis is taking longer than expected. Please try again later.")
 
 def display_pf_results():
     """Display persistent feedback results from session state"""
@@ -151,7 +257,7 @@ def display_pf_results():
         azure_output = results['azure_output']
         debate_topic = results['debate_topic']
         side = results['side']
-        audio_path = results.get('audio_path', '')
+        audio_info = results.get('audio') or {}
         
         # **TIP 4: Enhanced results display** with better organization
         st.markdown("---")
@@ -210,11 +316,7 @@ def display_pf_results():
                 st.metric("🎯 Analysis Type", "Audio", delta="Real-time")
             
             with col2:
-                if audio_path and os.path.exists(audio_path):
-                    audio_duration = get_audio_duration(audio_path)
-                    st.metric("⏱️ Audio Length", f"{audio_duration:.1f}s", delta="Processed")
-                else:
-                    st.metric("⏱️ Audio Length", "N/A", delta="Processed")
+                st.metric("⏱️ Audio Length", format_duration(audio_info.get('duration')), delta="Processed")
             
             with col3:
                 feedback_length = len(azure_output.split()) if azure_output else 0
@@ -255,8 +357,8 @@ def display_pf_results():
             
             # Import and render chat interface
             try:
-                # Use direct Azure connection for reliability
-                render_chat_interface(azure_output, debate_topic, use_api=False)
+                # The backend keeps the conversation; the frontend falls back to Azure if it is down
+                render_chat_interface(azure_output, debate_topic, use_api=True, context_id=results.get('context_id'))
                 
             except Exception as chat_error:
                 st.error(f"Chat feature temporarily unavailable: {str(chat_error)}")
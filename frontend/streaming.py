@@ -0,0 +1,51 @@
+"""
+Helpers for reading server-sent event (SSE) streams from the FastAPI backend.
+"""
+import json
+
+
+def iter_sse(response):
+    """
+    Yield (event, data) pairs from a streaming requests.Response.
+    `event` is None for plain data events; `data` is the decoded JSON payload.
+    """
+    event, data_lines = None, []
+    for line in response.iter_lines(decode_unicode=True):
+        if line is None:
+            continue
+        if line == "":
+            # Blank line ends the current event
+            if data_lines:
+                yield event, json.loads("\n".join(data_lines))
+            event, data_lines = None, []
+        elif line.startswith("event:"):
+            event = line[len("event:"):].strip()
+        elif line.startswith("data:"):
+            data_lines.append(line[len("data:"):].strip())
+    if data_lines:
+        yield event, json.loads("\n".join(data_lines))
+
+
+class LLMStream:
+    """
+    Iterates over the text fragments of an SSE feedback stream, suitable for st.write_stream.
+    After iteration `final` holds the payload of the closing "done" event and
+    `error` the message of an "error" event, if any. `text` holds the fragments
+    received so far, even when iteration stops early.
+    """
+
+    def __init__(self, response):
+        self.response = response
+        self.final = None
+        self.error = None
+        self.text = ""
+
+    def __iter__(self):
+        for event, data in iter_sse(self.response):
+            if event == "done":
+                self.final = data
+            elif event == "error":
+                self.error = data.get("error", "Unknown error occurred")
+            elif "delta" in data:
+                self.text += data["delta"]
+                yield data["delta"]
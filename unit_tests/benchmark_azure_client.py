@@ -0,0 +1,142 @@
+"""
+Azure OpenAI client benchmark against a local mock server.
+
+USAGE:
+    python unit_tests/benchmark_azure_client.py [--calls 50] [--concurrency 8]
+                                                [--connect-latency 0.15] [--latency 0.05]
+
+Starts a mock chat-completions server on localhost that delays the first request on
+every new connection by --connect-latency (standing in for TCP + TLS setup to Azure)
+and every request by --latency (model time). It then compares:
+1. A new AzureOpenAI client per call (the old call_ai behaviour)
+2. The pooled process-wide client used by backend.azure.call_ai
+3. The pooled AsyncAzureOpenAI client used by backend.azure.call_ai_async
+
+No Azure credentials are needed and nothing leaves the machine.
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+COMPLETION = {
+    "id": "chatcmpl-mock",
+    "object": "chat.completion",
+    "created": 0,
+    "model": "gpt-4.1",
+    "choices": [{"index": 0, "finish_reason": "stop", "message": {"role": "assistant", "content": "Mock feedback."}}],
+    "usage": {"prompt_tokens": 10, "completion_tokens": 3, "total_tokens": 13},
+}
+
+
+def make_handler(connect_latency, latency, stats):
+    class MockAzureHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def setup(self):
+            super().setup()
+            self.first_request = True
+            with stats["lock"]:
+                stats["connections"] += 1
+
+        def do_POST(self):
+            self.rfile.read(int(self.headers.get("Content-Length", 0)))
+            delay = latency + (connect_latency if self.first_request else 0)
+            self.first_request = False
+            time.sleep(delay)
+            body = json.dumps(COMPLETION).encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    return MockAzureHandler
+
+
+def start_mock_server(connect_latency, latency):
+    stats = {"connections": 0, "lock": threading.Lock()}
+    server = ThreadingHTTPServer(("127.0.0.1", 0), make_handler(connect_latency, latency, stats))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, stats
+
+
+def run_sync(label, call, calls, concurrency, stats):
+    stats["connections"] = 0
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        list(executor.map(lambda _: call(), range(calls)))
+    elapsed = time.perf_counter() - start
+    print(f"   {label:<28} {elapsed:6.2f}s total, {elapsed / calls * 1000 * concurrency:7.1f} ms/call, {stats['connections']} connections")
+
+
+def run_async(label, call, calls, concurrency, stats):
+    async def scenario():
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def one():
+            async with semaphore:
+                await call()
+
+        await asyncio.gather(*(one() for _ in range(calls)))
+
+    stats["connections"] = 0
+    start = time.perf_counter()
+    asyncio.run(scenario())
+    elapsed = time.perf_counter() - start
+    print(f"   {label:<28} {elapsed:6.2f}s total, {elapsed / calls * 1000 * concurrency:7.1f} ms/call, {stats['connections']} connections")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--calls", type=int, default=50)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--connect-latency", type=float, default=0.15)
+    parser.add_argument("--latency", type=float, default=0.05)
+    args = parser.parse_args()
+
+    server, stats = start_mock_server(args.connect_latency, args.latency)
+    os.environ["AZURE_OPENAI_API_KEY"] = "mock-key"
+    os.environ["AZURE_OPENAI_ENDPOINT"] = f"http://127.0.0.1:{server.server_port}"
+
+    # Import after pointing the environment at the mock server
+    from openai import AzureOpenAI
+    from backend import azure
+
+    # .env values loaded by backend.azure must not override the mock endpoint
+    os.environ["AZURE_OPENAI_API_KEY"] = "mock-key"
+    os.environ["AZURE_OPENAI_ENDPOINT"] = f"http://127.0.0.1:{server.server_port}"
+
+    messages = [{"role": "user", "content": "Give me feedback."}]
+
+    def unpooled_call():
+        client = AzureOpenAI(
+            api_key=os.environ["AZURE_OPENAI_API_KEY"],
+            api_version=azure.AZURE_OPENAI_API_VERSION,
+            azure_endpoint=os.environ["AZURE_OPENAI_ENDPOINT"],
+        )
+        client.chat.completions.create(model=azure.AZURE_OPENAI_MODEL, messages=messages)
+        client.close()
+
+    print(f"=== {args.calls} calls, concurrency {args.concurrency}, "
+          f"connect latency {args.connect_latency * 1000:.0f} ms, request latency {args.latency * 1000:.0f} ms ===")
+    run_sync("New client per call", unpooled_call, args.calls, args.concurrency, stats)
+    run_sync("Pooled client (call_ai)", lambda: azure.call_ai(messages), args.calls, args.concurrency, stats)
+    run_async("Async client (call_ai_async)", lambda: azure.call_ai_async(messages), args.calls, args.concurrency, stats)
+
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""
+Transcription benchmark: single Whisper call vs. chunked parallel transcription.
+
+USAGE:
+    python unit_tests/benchmark_transcription.py [audio files...]
+
+With no arguments every recording in test_cases/ (mp3, wav, m4a, ogg, flac) is used.
+For each file this reports:
+1. Decode time (ffmpeg pipe)
+2. Wall-clock time of the single-call path (TRANSCRIBE_MODE=single)
+3. Wall-clock time of the chunked path (TRANSCRIBE_MODE=chunked) and the speedup
+4. How closely the two transcripts agree (word-level similarity)
+
+Set WHISPER_MODEL and TRANSCRIBE_CHUNK_WORKERS to compare configurations.
+"""
+import difflib
+import glob
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.audio import decode_audio, SAMPLE_RATE
+from backend.transcription import transcribe_pcm
+from backend.workers import CHUNK_WORKERS, get_chunk_executor, shutdown_chunk_executor
+
+AUDIO_EXTENSIONS = ("mp3", "wav", "m4a", "ogg", "flac")
+
+
+def find_recordings():
+    root = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "test_cases")
+    paths = []
+    for extension in AUDIO_EXTENSIONS:
+        paths.extend(glob.glob(os.path.join(root, f"*.{extension}")))
+    return sorted(paths)
+
+
+def timed(fn, *args, **kwargs):
+    start = time.perf_counter()
+    result = fn(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+
+def warm_up_chunk_workers():
+    """Load the model in every chunk worker so start-up cost is not counted."""
+    import numpy as np
+    from backend.transcription import transcribe_chunk
+
+    silence = np.zeros(SAMPLE_RATE, dtype=np.float32)
+    executor = get_chunk_executor()
+    for future in [executor.submit(transcribe_chunk, silence) for _ in range(CHUNK_WORKERS)]:
+        future.result()
+
+
+def benchmark(path):
+    print(f"\n=== {os.path.basename(path)} ===")
+    audio, decode_seconds = timed(decode_audio, path)
+    duration = len(audio) / SAMPLE_RATE
+    print(f"   Duration: {duration / 60:.1f} min, decode: {decode_seconds:.2f}s")
+
+    single, single_seconds = timed(transcribe_pcm, audio, mode="single")
+    print(f"   Single call: {single_seconds:.1f}s ({duration / single_seconds:.1f}x real time)")
+
+    chunked, chunked_seconds = timed(transcribe_pcm, audio, mode="chunked")
+    print(f"   Chunked ({CHUNK_WORKERS} workers): {chunked_seconds:.1f}s "
+          f"({duration / chunked_seconds:.1f}x real time, {single_seconds / chunked_seconds:.2f}x speedup)")
+
+    similarity = difflib.SequenceMatcher(None, single["text"].split(), chunked["text"].split()).ratio()
+    print(f"   Transcript agreement: {similarity:.1%}")
+
+
+def main():
+    paths = sys.argv[1:] or find_recordings()
+    if not paths:
+        print("❌ No recordings found. Pass audio files as arguments or add them to test_cases/.")
+        return 1
+
+    print(f"Warming up {CHUNK_WORKERS} chunk workers...")
+    warm_up_chunk_workers()
+    try:
+        for path in paths:
+            benchmark(path)
+    finally:
+        shutdown_chunk_executor()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
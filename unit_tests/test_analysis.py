@@ -0,0 +1,118 @@
+"""
+Tests for map-reduce analysis of long cases and rounds.
+"""
+import asyncio
+import threading
+import time
+
+import pytest
+
+from backend import analysis
+from backend.speeches import Speech, Transcript
+from backend.disk_cache import DiskCache
+
+CASE = """We affirm the resolution.
+Contention 1: Economic growth
+Trade raises wages across the board.
+Contention 2: Climate
+Emissions fall when supply chains shorten.
+Contention 3: Security
+Alliances deter conflict."""
+
+
+@pytest.fixture
+def fake_llm(tmp_path, monkeypatch):
+    """Record part analyses instead of calling Azure, with an empty part cache."""
+    calls = []
+
+    async def fake_call_ai_async(messages, priority=None, usage=None):
+        calls.append(messages)
+        number = len(calls)
+        await asyncio.sleep(0.2)
+        usage.update(prompt_tokens=10, completion_tokens=5, total_tokens=15)
+        return f"notes {number}"
+
+    def fake_call_ai(messages, priority=None, usage=None):
+        calls.append(messages)
+        number = len(calls)
+        time.sleep(0.2)
+        usage.update(prompt_tokens=10, completion_tokens=5, total_tokens=15)
+        return f"notes {number}"
+
+    monkeypatch.setattr(analysis, "call_ai_async", fake_call_ai_async)
+    monkeypatch.setattr(analysis, "call_ai", fake_call_ai)
+    monkeypatch.setattr(analysis, "part_cache", DiskCache(str(tmp_path), 1024 * 1024))
+    return calls
+
+
+def test_split_case_at_contentions():
+    """Contention headings start new parts; text before them is its own part."""
+    parts = analysis.split_case(CASE)
+    assert [name for name, _ in parts] == ["Introduction", "Contention 1: Economic growth", "Contention 2: Climate", "Contention 3: Security"]
+    assert "Alliances deter conflict." in parts[-1][1]
+
+
+def test_split_case_without_headings_groups_paragraphs(monkeypatch):
+    monkeypatch.setattr(analysis, "ANALYSIS_PART_TOKENS", 50)
+    case = "\n".join("word " * 30 for _ in range(6))
+    parts = analysis.split_case(case)
+    assert len(parts) == 6
+    assert [name for name, _ in parts][:2] == ["Part 1", "Part 2"]
+
+
+def test_modes():
+    parts = analysis.split_case(CASE)
+    assert not analysis.use_map_reduce(parts, "single")
+    assert analysis.use_map_reduce(parts, "map_reduce")
+    # A short case is not worth splitting
+    assert not analysis.use_map_reduce(parts, "auto")
+    with pytest.raises(ValueError):
+        analysis.resolve_analysis_mode("everything")
+
+
+def test_parts_are_analyzed_concurrently_and_cached(fake_llm):
+    """Part calls overlap, the synthesis prompt holds every part's notes, and reruns hit the cache."""
+    start = time.perf_counter()
+    messages, report = asyncio.run(analysis.case_analysis_messages_async("Resolved: test", CASE, "PRO", mode="map_reduce"))
+    elapsed = time.perf_counter() - start
+
+    assert len(fake_llm) == 4
+    assert elapsed < 0.6
+    assert all(f"notes {i}" in messages[1]["content"] for i in range(1, 5))
+    assert "## Contention 2: Climate" in messages[1]["content"]
+    assert report["parts"] == 4 and report["cached_parts"] == 0
+    assert report["map_usage"]["total_tokens"] == 60
+
+    _, report = asyncio.run(analysis.case_analysis_messages_async("Resolved: test", CASE, "PRO", mode="map_reduce"))
+    assert len(fake_llm) == 4
+    assert report["cached_parts"] == 4
+
+
+def test_round_is_split_by_speech(fake_llm):
+    """Rounds are analyzed one speech per part in the job worker's sync path."""
+    segments = [{"start": i * 60.0, "end": i * 60.0 + 50, "text": f"speech {i} text"} for i in range(3)]
+    speeches = [Speech(f"Speech {i}", "constructive", "first team", s["start"], s["end"], [s]) for i, s in enumerate(segments)]
+    transcript = Transcript("", segments, speeches)
+
+    messages, report = analysis.pf_analysis_messages("Resolved: test", transcript, "CON", mode="map_reduce")
+
+    assert report["parts"] == 3
+    assert any("Speech 1" in call[1]["content"] and "speech 1 text" in call[1]["content"] for call in fake_llm)
+    assert "## Speech 2" in messages[1]["content"]
+
+
+def test_async_prompt_building_runs_off_the_event_loop(fake_llm, monkeypatch):
+    """Splitting, token counting and trimming run in worker threads, not on the loop."""
+    threads = []
+    budget_messages = analysis.budget_messages
+
+    def recording_budget_messages(*args, **kwargs):
+        threads.append(threading.current_thread())
+        return budget_messages(*args, **kwargs)
+
+    monkeypatch.setattr(analysis, "budget_messages", recording_budget_messages)
+    asyncio.run(analysis.case_analysis_messages_async("Resolved: test", CASE, "PRO", mode="map_reduce"))
+
+    # Four part prompts and the synthesis prompt
+    assert len(threads) == 5
+    assert threading.main_thread() not in threads
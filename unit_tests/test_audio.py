@@ -0,0 +1,71 @@
+"""
+Tests for in-memory audio decoding.
+Requires the ffmpeg binary; skipped when it is not installed.
+"""
+import io
+import shutil
+import subprocess
+import tempfile
+import wave
+import numpy as np
+import pytest
+from backend.audio import decode_audio, SAMPLE_RATE
+
+pytestmark = pytest.mark.skipif(shutil.which("ffmpeg") is None, reason="ffmpeg not installed")
+
+
+def make_wav(seconds=1.0, sample_rate=44100, frequency=440.0):
+    """Build a stereo 16-bit WAV tone in memory."""
+    t = np.arange(int(seconds * sample_rate)) / sample_rate
+    tone = (0.5 * np.sin(2 * np.pi * frequency * t) * 32767).astype(np.int16)
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as wav:
+        wav.setnchannels(2)
+        wav.setsampwidth(2)
+        wav.setframerate(sample_rate)
+        wav.writeframes(np.repeat(tone, 2).tobytes())
+    return buffer.getvalue()
+
+
+def test_decode_bytes_to_16k_mono_float32():
+    """Upload bytes decode to 16 kHz mono float32 PCM without touching disk."""
+    audio = decode_audio(make_wav(seconds=2.0))
+
+    assert audio.dtype == np.float32
+    assert audio.ndim == 1
+    assert abs(len(audio) - 2 * SAMPLE_RATE) < SAMPLE_RATE // 100
+    assert 0.4 < np.abs(audio).max() <= 1.0
+
+
+def test_decode_path_matches_bytes(tmp_path):
+    """Decoding from a stored file gives the same samples as decoding the bytes."""
+    data = make_wav()
+    path = tmp_path / "round.wav"
+    path.write_bytes(data)
+
+    assert np.array_equal(decode_audio(str(path)), decode_audio(data))
+
+
+def test_decode_m4a_with_index_at_the_end_from_bytes(tmp_path):
+    """M4A files with the index after the audio, which ffmpeg cannot read from a pipe, still decode."""
+    path = tmp_path / "round.m4a"
+    subprocess.run(
+        ["ffmpeg", "-loglevel", "error", "-y", "-f", "lavfi", "-i", "sine=frequency=440:duration=30",
+         "-c:a", "aac", "-f", "ipod", str(path)],
+        check=True,
+    )
+    data = path.read_bytes()
+    assert data.find(b"moov") > data.find(b"mdat")
+
+    audio = decode_audio(data)
+    assert abs(len(audio) - 30 * SAMPLE_RATE) < SAMPLE_RATE // 10
+
+
+def test_invalid_audio_raises_value_error(tmp_path, monkeypatch):
+    """Garbage input fails with a ValueError and leaves no temp files behind."""
+    monkeypatch.setattr(tempfile, "tempdir", str(tmp_path))
+    with pytest.raises(ValueError):
+        decode_audio(b"not really audio")
+    with pytest.raises(ValueError):
+        decode_audio(b"\x00\x00\x00\x18ftypM4A broken")
+    assert list(tmp_path.iterdir()) == []
@@ -0,0 +1,106 @@
+"""
+Tests for header-only audio metadata probing and duration-based admission.
+Compressed formats are encoded with ffmpeg; those tests are skipped without it.
+"""
+import io
+import shutil
+import subprocess
+import wave
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from backend import jobs, transcription
+from backend.audio_probe import probe_audio
+from backend.workers import long_transcription_pool, transcription_pool
+
+needs_ffmpeg = pytest.mark.skipif(shutil.which("ffmpeg") is None, reason="ffmpeg not installed")
+
+
+def make_wav(seconds=2.0, sample_rate=22050, channels=1):
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as wav:
+        wav.setnchannels(channels)
+        wav.setsampwidth(2)
+        wav.setframerate(sample_rate)
+        wav.writeframes(b"\x00\x00" * channels * int(seconds * sample_rate))
+    return buffer.getvalue()
+
+
+def encode(tmp_path, name, codec_args, container):
+    """Encode a 7.5 s stereo 44.1 kHz tone with ffmpeg."""
+    path = tmp_path / name
+    subprocess.run(
+        ["ffmpeg", "-loglevel", "error", "-y", "-f", "lavfi", "-i", "sine=frequency=440:duration=7.5:sample_rate=44100",
+         "-ac", "2", *codec_args, "-f", container, str(path)],
+        check=True,
+    )
+    return path
+
+
+def test_wav_header_gives_duration_and_format():
+    info = probe_audio(make_wav(seconds=2.0, sample_rate=22050, channels=2))
+    assert (info.container, info.codec, info.sample_rate, info.channels) == ("wav", "pcm_s16le", 22050, 2)
+    assert info.duration == pytest.approx(2.0)
+
+
+def test_file_object_position_is_restored():
+    upload = io.BytesIO(make_wav())
+    upload.seek(100)
+    assert probe_audio(upload).duration == pytest.approx(2.0)
+    assert upload.tell() == 100
+
+
+def test_unrecognised_data_returns_none():
+    assert probe_audio(io.BytesIO(b"not audio at all" * 100)) is None
+
+
+@needs_ffmpeg
+@pytest.mark.parametrize("name, codec_args, container, expected", [
+    ("round.flac", ["-c:a", "flac"], "flac", ("flac", "flac", 44100)),
+    ("round.mp3", ["-c:a", "libmp3lame", "-b:a", "64k"], "mp3", ("mp3", "mp3", 44100)),
+    ("cbr.mp3", ["-c:a", "libmp3lame", "-b:a", "64k", "-write_xing", "0"], "mp3", ("mp3", "mp3", 44100)),
+    ("round.ogg", ["-c:a", "libvorbis"], "ogg", ("ogg", "vorbis", 44100)),
+    ("round.opus", ["-c:a", "libopus"], "ogg", ("ogg", "opus", 48000)),
+    ("round.m4a", ["-c:a", "aac"], "ipod", ("mp4", "aac", 44100)),
+])
+def test_compressed_formats_are_probed_from_headers(tmp_path, name, codec_args, container, expected):
+    path = encode(tmp_path, name, codec_args, container)
+    info = probe_audio(path)
+    assert (info.container, info.codec, info.sample_rate) == expected
+    assert info.channels == 2
+    # Encoder delay and frame padding add a few hundredths of a second
+    assert info.duration == pytest.approx(7.5, abs=0.1)
+
+
+def test_admission_refuses_long_recordings_and_routes_by_duration(tmp_path, monkeypatch):
+    monkeypatch.setattr(transcription, "MAX_AUDIO_SECONDS", 5)
+    monkeypatch.setattr(transcription, "LONG_AUDIO_SECONDS", 1.5)
+    short, long = tmp_path / "short.wav", tmp_path / "long.wav"
+    short.write_bytes(make_wav(seconds=1.0))
+    long.write_bytes(make_wav(seconds=6.0))
+
+    assert transcription.admit_audio(str(short)).duration == pytest.approx(1.0)
+    with pytest.raises(ValueError, match="minutes"):
+        transcription.admit_audio(str(long))
+
+    assert transcription.pool_for(1.0) is transcription_pool
+    assert transcription.pool_for(2.0) is long_transcription_pool
+    assert transcription.pool_for(None) is transcription_pool
+
+
+def test_too_long_job_is_refused_before_queueing(tmp_path, monkeypatch):
+    monkeypatch.setattr(transcription, "MAX_AUDIO_SECONDS", 5)
+    monkeypatch.setattr(jobs, "JOBS_DATA_DIR", str(tmp_path))
+    submitted = []
+    monkeypatch.setattr(jobs.job_queue, "submit", lambda *args: submitted.append(args))
+    app = FastAPI()
+    app.include_router(transcription.router)
+
+    response = TestClient(app).post("/jobs/transcribe/", files={"file": ("round.wav", make_wav(seconds=6.0))})
+
+    assert response.status_code == 400
+    assert "maximum" in response.json()["error"]
+    assert submitted == []
+    assert list(tmp_path.iterdir()) == []
@@ -0,0 +1,42 @@
+"""
+Tests for the shared Azure OpenAI clients: one sync client per process, one async client per event loop.
+"""
+import asyncio
+import gc
+
+from backend import azure
+
+
+def test_each_event_loop_keeps_its_own_async_client(monkeypatch):
+    monkeypatch.setenv("AZURE_OPENAI_API_KEY", "key")
+    monkeypatch.setenv("AZURE_OPENAI_ENDPOINT", "https://example.openai.azure.com")
+    monkeypatch.setattr(azure, "_async_clients", azure.weakref.WeakKeyDictionary())
+
+    async def client():
+        return azure.get_async_client()
+
+    first_loop, second_loop = asyncio.new_event_loop(), asyncio.new_event_loop()
+    first = first_loop.run_until_complete(client())
+    second = second_loop.run_until_complete(client())
+    assert first is not second
+    assert first_loop.run_until_complete(client()) is first
+
+    first_loop.close()
+    del first_loop
+    gc.collect()
+    assert len(azure._async_clients) == 1
+    second_loop.close()
+
+
+def test_changed_credentials_close_the_old_sync_client(monkeypatch):
+    monkeypatch.setenv("AZURE_OPENAI_API_KEY", "key")
+    monkeypatch.setenv("AZURE_OPENAI_ENDPOINT", "https://example.openai.azure.com")
+    monkeypatch.setattr(azure, "_sync_client", None)
+
+    old = azure.get_client()
+    assert azure.get_client() is old
+    monkeypatch.setenv("AZURE_OPENAI_API_KEY", "rotated")
+    new = azure.get_client()
+
+    assert new is not old
+    assert old._client.is_closed and not new._client.is_closed
@@ -0,0 +1,86 @@
+"""
+Tests for grouping card-format DOCX paragraphs into structured cards.
+"""
+import asyncio
+
+from backend import analysis
+from backend.azure import case_feedback_messages
+from backend.cards import Card, CardCase, build_cards
+from backend.docx_reader import DocxParagraph, DocxRun
+from backend.disk_cache import DiskCache
+
+
+def paragraph(*runs, style=None):
+    """Paragraph from (text, highlighted) pairs or plain strings."""
+    return DocxParagraph(style, [DocxRun(*run) if isinstance(run, tuple) else DocxRun(run) for run in runs])
+
+
+FILE = [
+    paragraph("1AC", style="Heading1"),
+    paragraph("Contention 1: Trade", style="Heading3"),
+    paragraph("Trade raises wages.", style="Heading4"),
+    paragraph("Smith 24, 6/13/2024, Professor of Economics at State University, \"Trade and Wages\""),
+    paragraph("https://example.com/trade"),
+    paragraph("Studies show ", ("open trade raises wages", True), " in most cases."),
+    paragraph("Unhighlighted context the debater skips."),
+    paragraph(("Workers gain the most.", True)),
+    paragraph("Contention 2: Climate", style="Heading3"),
+    paragraph("Our plan is the only option.", style="Heading4"),
+    paragraph("Analytics are read in full."),
+]
+
+
+def test_cards_hold_tag_cite_and_read_text():
+    case = build_cards(FILE)
+    first, analytic = case.cards
+
+    assert first.tag == "Trade raises wages."
+    assert first.cite.endswith("https://example.com/trade")
+    assert first.short_cite == "Smith 24, 6/13/2024"
+    assert first.read_text == "open trade raises wages Workers gain the most."
+    assert "Unhighlighted context" in first.full_text
+    assert first.section == "1AC > Contention 1: Trade"
+
+    # Bodies without highlighting are read in full and have no cite
+    assert analytic.cite == "" and analytic.read_text == "Analytics are read in full."
+    assert analytic.section == "1AC > Contention 2: Climate"
+
+
+def test_prompt_omits_unread_text():
+    text = str(build_cards(FILE))
+    assert text.startswith("[1AC > Contention 1: Trade]\n\nTag: Trade raises wages.\nCite: Smith 24, 6/13/2024\nRead: ")
+    assert "Unhighlighted context" not in text and "Professor" not in text
+
+
+def test_bold_paragraphs_are_tags_without_heading_styles():
+    bold = DocxParagraph(None, [DocxRun("Bold tag without a style.", bold=True)])
+    case = build_cards([bold, paragraph("Jones 2020, Reporter"), paragraph(("read this", True))])
+    assert [card.tag for card in case.cards] == ["Bold tag without a style."]
+    assert case.cards[0].short_cite == "Jones 2020, Reporter"
+
+
+def test_cards_use_compact_records():
+    assert not hasattr(Card("tag"), "__dict__")
+
+
+def test_structured_cards_replace_jumble_warning():
+    messages, _ = case_feedback_messages("Resolved: test", build_cards(FILE), "PRO", "card format")
+    assert "jumble" not in messages[0]["content"]
+    assert "Tag: Trade raises wages." in messages[1]["content"]
+
+    messages, _ = case_feedback_messages("Resolved: test", "flat text", "PRO", "card format")
+    assert "jumble" in messages[0]["content"]
+
+
+def test_map_reduce_splits_cards_by_section(tmp_path, monkeypatch):
+    async def fake_call_ai_async(messages, priority=None, usage=None):
+        return "notes"
+
+    monkeypatch.setattr(analysis, "call_ai_async", fake_call_ai_async)
+    monkeypatch.setattr(analysis, "part_cache", DiskCache(str(tmp_path), 1024 * 1024))
+    parts = analysis.split_cards(build_cards(FILE))
+    assert [name for name, _ in parts] == ["1AC > Contention 1: Trade", "1AC > Contention 2: Climate"]
+
+    messages, report = asyncio.run(analysis.case_analysis_messages_async("Resolved: test", build_cards(FILE), "PRO", "card format", mode="map_reduce"))
+    assert report["parts"] == 2
+    assert "jumble" not in messages[0]["content"]
@@ -0,0 +1,117 @@
+"""
+Tests for the extraction and LLM stages of /process-text/.
+"""
+import asyncio
+import threading
+import time
+
+import httpx
+from fastapi import FastAPI
+
+from backend import case
+from backend.workers import WorkerPool
+
+CASE_FILE = {"file": ("case.txt", b"Contention 1: Trade raises wages.")}
+FORM = {"debate_topic": "Resolved: test", "side": "PRO", "upload_format": "plaintext", "file_extension": "txt"}
+
+
+def make_app():
+    app = FastAPI()
+    app.include_router(case.router)
+
+    @app.get("/ping")
+    async def ping():
+        return {"ok": True}
+
+    return app
+
+
+async def fake_call_ai_async(messages, **kwargs):
+    return "Feedback"
+
+
+def test_extraction_runs_off_the_event_loop(monkeypatch):
+    """A slow document parse does not delay other requests on the same worker."""
+    def slow_extract(path, extension, upload_format):
+        time.sleep(0.5)
+        return b"Contention 1: Trade raises wages."
+
+    monkeypatch.setattr(case, "extract_text_from_path", slow_extract)
+    monkeypatch.setattr(case, "extraction_pool", WorkerPool("test extraction", workers=1, queue_depth=0))
+    monkeypatch.setattr(case, "call_ai_async", fake_call_ai_async)
+
+    async def scenario():
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=make_app()), base_url="http://test") as client:
+            upload = asyncio.create_task(client.post("/process-text/", files=CASE_FILE, data=FORM))
+            await asyncio.sleep(0.1)
+            start = time.perf_counter()
+            ping = await client.get("/ping")
+            ping_time = time.perf_counter() - start
+            return await upload, ping, ping_time
+
+    upload, ping, ping_time = asyncio.run(scenario())
+    case.extraction_pool.shutdown()
+    assert upload.status_code == 200 and upload.json()["processed_text"] == "Feedback"
+    assert ping.status_code == 200 and ping_time < 0.2
+
+
+def test_full_extraction_pool_answers_503(monkeypatch):
+    release = threading.Event()
+    pool = WorkerPool("test extraction", workers=1, queue_depth=0, retry_after=3)
+    monkeypatch.setattr(case, "extraction_pool", pool)
+
+    async def scenario():
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=make_app()), base_url="http://test") as client:
+            return await client.post("/process-text/", files=CASE_FILE, data=FORM)
+
+    try:
+        pool.submit(release.wait)
+        response = asyncio.run(scenario())
+    finally:
+        release.set()
+        pool.shutdown()
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "3"
+
+
+def test_feedback_stage_concurrency_is_bounded(monkeypatch):
+    """CASE_FEEDBACK_CONCURRENCY caps LLM calls across concurrent requests."""
+    active, peak = 0, 0
+
+    async def tracked_call_ai_async(messages, **kwargs):
+        nonlocal active, peak
+        active += 1
+        peak = max(peak, active)
+        await asyncio.sleep(0.05)
+        active -= 1
+        return "Feedback"
+
+    monkeypatch.setattr(case, "call_ai_async", tracked_call_ai_async)
+    monkeypatch.setattr(case, "extraction_pool", WorkerPool("test extraction", workers=4, queue_depth=4))
+
+    async def scenario():
+        monkeypatch.setattr(case, "feedback_slots", asyncio.Semaphore(2))
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=make_app()), base_url="http://test") as client:
+            return await asyncio.gather(*(client.post("/process-text/", files=CASE_FILE, data=FORM) for _ in range(6)))
+
+    responses = asyncio.run(scenario())
+    case.extraction_pool.shutdown()
+    assert all(response.status_code == 200 for response in responses)
+    assert peak == 2
+
+
+def test_debug_fields_only_on_request(monkeypatch):
+    monkeypatch.setattr(case, "call_ai_async", fake_call_ai_async)
+    monkeypatch.setattr(case, "extraction_pool", WorkerPool("test extraction", workers=1, queue_depth=1))
+
+    async def scenario():
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=make_app()), base_url="http://test") as client:
+            plain = await client.post("/process-text/", files=CASE_FILE, data=FORM)
+            debug = await client.post("/process-text/", files=CASE_FILE, data={**FORM, "debug": "true"})
+            return plain.json(), debug.json()
+
+    plain, debug = asyncio.run(scenario())
+    case.extraction_pool.shutdown()
+    assert set(plain) == {"processed_text", "token_usage", "context_id"}
+    assert debug["extracted_text"] == "Contention 1: Trade raises wages."
+    assert debug["debug_info"]["filename"] == "case.txt"
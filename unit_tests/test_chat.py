@@ -0,0 +1,215 @@
+"""
+Tests for the server-side chat conversation store and the /chat/ endpoint.
+"""
+import asyncio
+import threading
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from backend import chat, chat_context, retrieval
+from backend.tokens import count_tokens
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def store(request, tmp_path):
+    if request.param == "memory":
+        return chat.InMemoryConversationStore()
+    return chat.SQLiteConversationStore(str(tmp_path / "chat.db"))
+
+
+def test_store_round_trips_and_purges(store):
+    conversation = store.create("Resolved: test", "Great rebuttal.", [{"role": "user", "content": "Hi"}], context_id="ab" * 32)
+    loaded = store.get(conversation["id"])
+    assert loaded["context"] == "Great rebuttal." and loaded["turns"] == [{"role": "user", "content": "Hi"}]
+    assert loaded["context_id"] == "ab" * 32
+
+    loaded["turns"].append({"role": "assistant", "content": "Hello"})
+    loaded["summary"] = "Greetings"
+    store.save(loaded)
+    assert store.get(conversation["id"])["turns"][-1]["content"] == "Hello"
+    assert store.get(conversation["id"])["summary"] == "Greetings"
+
+    assert store.purge(loaded["updated_at"] + 1) == 1
+    assert store.get(conversation["id"]) is None
+    assert store.delete(conversation["id"]) is False
+
+
+def test_concurrent_updates_keep_every_turn(store):
+    conversation = store.create("Resolved: test", "Great rebuttal.")
+
+    def add_turns(n):
+        for i in range(20):
+            store.update(conversation["id"], lambda stored: stored["turns"].append({"role": "user", "content": f"{n}-{i}"}))
+
+    threads = [threading.Thread(target=add_turns, args=(n,)) for n in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(store.get(conversation["id"])["turns"]) == 80
+    assert store.update("missing", lambda stored: stored["turns"].clear()) is None
+
+
+def test_sqlite_update_is_atomic_across_connections(tmp_path):
+    # Each API process opens its own connection to the shared file
+    path = str(tmp_path / "chat.db")
+    first, second = chat.SQLiteConversationStore(path), chat.SQLiteConversationStore(path)
+    conversation = first.create("Resolved: test", "Great rebuttal.")
+
+    def add_turns(store):
+        for i in range(20):
+            store.update(conversation["id"], lambda stored: stored["turns"].append({"role": "user", "content": str(i)}))
+
+    threads = [threading.Thread(target=add_turns, args=(store,)) for store in (first, second)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(first.get(conversation["id"])["turns"]) == 40
+
+
+def test_store_missing_a_method_fails_when_created():
+    class IncompleteStore(chat.ConversationStore):
+        def get(self, session_id):
+            return None
+
+    with pytest.raises(TypeError):
+        IncompleteStore()
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr(chat, "conversation_store", chat.InMemoryConversationStore())
+    prompts = []
+
+    async def fake_call_ai_async(messages, **kwargs):
+        prompts.append(messages)
+        if "running summary" in messages[0]["content"]:
+            return "Student asked about rebuttals."
+        kwargs["usage"].update(prompt_tokens=10, completion_tokens=2, total_tokens=12)
+        return f"Answer {len(prompts)}"
+
+    async def fake_call_ai_stream_async(messages, **kwargs):
+        prompts.append(messages)
+        for piece in ("Stre", "amed"):
+            yield piece
+
+    monkeypatch.setattr(chat, "call_ai_async", fake_call_ai_async)
+    monkeypatch.setattr(chat, "call_ai_stream_async", fake_call_ai_stream_async)
+    app = FastAPI()
+    app.include_router(chat.router)
+    test_client = TestClient(app)
+    test_client.prompts = prompts
+    return test_client
+
+
+def test_later_turns_send_only_the_new_message(client):
+    first = client.post("/chat/", json={
+        "user_message": "How was my rebuttal?",
+        "initial_context": "Your rebuttal dropped contention two.",
+        "debate_topic": "Resolved: test",
+    })
+    assert first.status_code == 200
+    session_id = first.json()["session_id"]
+    assert first.json()["response"] == "Answer 1"
+
+    second = client.post("/chat/", json={"session_id": session_id, "user_message": "What should I drill?"})
+    assert second.status_code == 200 and second.json()["session_id"] == session_id
+
+    messages = client.prompts[-1]
+    assert messages[0]["role"] == "system" and "dropped contention two" in messages[0]["content"]
+    assert [m["content"] for m in messages[1:]] == ["How was my rebuttal?", "Answer 1", "What should I drill?"]
+
+
+def test_old_turns_are_folded_into_a_summary(client, monkeypatch):
+    monkeypatch.setattr(chat_context, "CHAT_HISTORY_TOKEN_BUDGET", 40)
+    session_id = None
+    for i in range(6):
+        body = {"user_message": f"Question {i} " + "about rebuttals " * 5}
+        if session_id:
+            body["session_id"] = session_id
+        response = client.post("/chat/", json=body)
+        session_id = response.json()["session_id"]
+
+    conversation = chat.conversation_store.get(session_id)
+    assert conversation["summary"] == "Student asked about rebuttals."
+    messages = client.prompts[-1]
+    assert any("Summary of the earlier conversation" in m["content"] for m in messages if m["role"] == "system")
+    assert sum(count_tokens(m["content"]) for m in messages if m["role"] != "system") <= 40
+
+
+def test_streamed_reply_is_saved_to_the_session(client):
+    response = client.post("/chat/", json={"user_message": "Hi", "initial_context": "Feedback", "stream": True})
+    assert response.status_code == 200
+    assert "event: done" in response.text
+    session_id = response.text.split('"session_id": "')[1].split('"')[0]
+    assert chat.conversation_store.get(session_id)["turns"][-1] == {"role": "assistant", "content": "Streamed"}
+
+
+def test_question_is_kept_when_the_reply_fails(client, monkeypatch):
+    first = client.post("/chat/", json={"user_message": "Hi", "initial_context": "Feedback"})
+    session_id = first.json()["session_id"]
+
+    async def failing_stream(messages, **kwargs):
+        yield "Part"
+        raise ValueError("Azure OpenAI API error: rate limited")
+
+    monkeypatch.setattr(chat, "call_ai_stream_async", failing_stream)
+    response = client.post("/chat/", json={"session_id": session_id, "user_message": "What about CX?", "stream": True})
+    assert "event: error" in response.text
+    assert chat.conversation_store.get(session_id)["turns"][-1] == {"role": "user", "content": "What about CX?"}
+
+
+def test_store_is_never_called_on_the_event_loop(client, monkeypatch):
+    class LoopCheckingStore(chat.InMemoryConversationStore):
+        def __init__(self):
+            super().__init__()
+            self.calls = []
+
+        def _record(self, name):
+            try:
+                asyncio.get_running_loop()
+                self.calls.append((name, "loop"))
+            except RuntimeError:
+                self.calls.append((name, "thread"))
+
+        def create(self, *args, **kwargs):
+            self._record("create")
+            return super().create(*args, **kwargs)
+
+        def update(self, *args, **kwargs):
+            self._record("update")
+            return super().update(*args, **kwargs)
+
+        def purge(self, *args, **kwargs):
+            self._record("purge")
+            return super().purge(*args, **kwargs)
+
+    store = LoopCheckingStore()
+    monkeypatch.setattr(chat, "conversation_store", store)
+    first = client.post("/chat/", json={"user_message": "Hi", "initial_context": "Feedback"})
+    client.post("/chat/", json={"session_id": first.json()["session_id"], "user_message": "More?", "stream": True})
+
+    assert {name for name, _ in store.calls} == {"create", "update", "purge"}
+    assert all(where == "thread" for _, where in store.calls)
+
+
+def test_unknown_session_and_empty_message_are_rejected(client):
+    assert client.post("/chat/", json={"session_id": "missing", "user_message": "Hi"}).status_code == 404
+    assert client.post("/chat/", json={"user_message": "  "}).status_code == 400
+    assert client.delete("/chat/missing").status_code == 404
+
+
+def test_session_with_context_id_retrieves_transcript_excerpts(client, monkeypatch, tmp_path):
+    monkeypatch.setattr(retrieval, "chunk_store", retrieval.DiskCache(str(tmp_path), 1024 * 1024))
+    context_id = retrieval.index_analysis("Your rebuttal dropped the inflation turn.", "We never answered the inflation turn at all.")
+
+    first = client.post("/chat/", json={"user_message": "What did I say on inflation?", "initial_context": "Your rebuttal dropped the inflation turn.", "context_id": context_id})
+    second = client.post("/chat/", json={"session_id": first.json()["session_id"], "user_message": "And about inflation later?"})
+
+    assert second.status_code == 200
+    assert "never answered the inflation turn" in client.prompts[-1][-2]["content"]
@@ -0,0 +1,73 @@
+"""
+Tests for the chat prompt layout: fixed session prefix, retrieved excerpts and history windowing.
+"""
+from backend import chat_context
+from backend.chat_context import analysis_index, chat_messages, relevant_chunks, split_history, split_sections
+from backend.retrieval import Chunk, RetrievalIndex
+from backend.tokens import count_tokens
+
+ANALYSIS = "\n\n".join(
+    f"## {title}\n" + " ".join([body] * 30)
+    for title, body in [
+        ("Constructive", "The constructive read two contentions on tariffs and manufacturing jobs."),
+        ("Rebuttal", "The rebuttal dropped the inflation turn and never weighed the impacts."),
+        ("Crossfire", "In crossfire the speaker conceded that tariffs raise consumer prices."),
+        ("Final Focus", "Final focus extended manufacturing jobs but ignored the weighing debate."),
+    ]
+)
+
+
+def test_sections_follow_headings():
+    sections = split_sections(ANALYSIS)
+    assert [section.title for section in sections] == ["Constructive", "Rebuttal", "Crossfire", "Final Focus"]
+
+
+def test_relevant_chunks_match_the_question():
+    sections = split_sections(ANALYSIS)
+    index = analysis_index(ANALYSIS)
+    chosen = relevant_chunks(index, "What did I drop in rebuttal about inflation?", budget=count_tokens(sections[1].format()))
+    assert [section.title for section in chosen] == ["Rebuttal"]
+    assert relevant_chunks(index, "the and of", budget=1000) == []
+
+
+def test_long_analysis_keeps_a_fixed_prefix_and_retrieves_per_question(monkeypatch):
+    monkeypatch.setattr(chat_context, "CHAT_FULL_CONTEXT_TOKENS", 100)
+    turns = [{"role": "user", "content": "How was crossfire?"}]
+    first = chat_messages("Resolved: tariffs", ANALYSIS, turns)
+    turns += [{"role": "assistant", "content": "You conceded prices."}, {"role": "user", "content": "And my final focus?"}]
+    second = chat_messages("Resolved: tariffs", ANALYSIS, turns)
+
+    # The system prefix and earlier turns are identical; only the tail differs
+    assert first[0] == second[0]
+    assert "Outline of the initial analysis" in first[0]["content"]
+    assert count_tokens(first[0]["content"]) < count_tokens(ANALYSIS)
+    assert "raise consumer prices" in first[-2]["content"] and first[-1] == turns[0]
+    assert second[1:3] == turns[:2]
+    assert "Final focus extended" in second[-2]["content"] and second[-1] == turns[-1]
+
+
+def test_short_analysis_is_included_whole_without_retrieval():
+    messages = chat_messages("Resolved: tariffs", "Good job overall.", [{"role": "user", "content": "Thanks!"}])
+    assert len(messages) == 2 and "Good job overall." in messages[0]["content"]
+
+
+def test_index_adds_transcript_excerpts_but_not_the_analysis_twice():
+    index = RetrievalIndex([
+        Chunk("feedback", "", "Good job overall, but the inflation turn was dropped."),
+        Chunk("transcript", "Second Rebuttal (B)", "We never answered their inflation turn."),
+        Chunk("transcript", "First Constructive (A)", "Tariffs protect manufacturing jobs."),
+    ])
+    turns = [{"role": "user", "content": "What did I say about inflation?"}]
+    messages = chat_messages("Resolved: tariffs", "Good job overall, but the inflation turn was dropped.", turns, index=index)
+
+    assert "Excerpts of the round transcript" in messages[0]["content"]
+    assert "never answered their inflation turn" in messages[-2]["content"]
+    assert "Good job overall" not in messages[-2]["content"] and "manufacturing" not in messages[-2]["content"]
+
+
+def test_split_history_folds_down_to_half_the_budget():
+    turns = [{"role": "user" if i % 2 == 0 else "assistant", "content": "word " * 40} for i in range(10)]
+    each = count_tokens(turns[0]["content"])
+    assert split_history(turns, budget=each * 10) == 0
+    assert split_history(turns, budget=each * 8) == 6  # the newest four turns (half of eight) are kept
+    assert split_history([{"role": "user", "content": "word " * 500}], budget=10) == 0
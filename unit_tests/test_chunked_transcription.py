@@ -0,0 +1,56 @@
+"""
+Tests for silence-based chunking and transcript stitching.
+"""
+import numpy as np
+from backend.audio import split_on_silence, SAMPLE_RATE
+from backend.transcription import stitch_segments
+
+
+def speech_with_pauses(phrase_seconds=7.0, pause_seconds=0.8, phrases=40, seed=0):
+    """Noise bursts standing in for speech, separated by near-silent pauses."""
+    rng = np.random.default_rng(seed)
+    parts = []
+    for _ in range(phrases):
+        parts.append(0.3 * rng.standard_normal(int(phrase_seconds * SAMPLE_RATE)).astype(np.float32))
+        parts.append(0.001 * rng.standard_normal(int(pause_seconds * SAMPLE_RATE)).astype(np.float32))
+    return np.concatenate(parts)
+
+
+def test_chunks_cover_audio_and_cut_in_pauses():
+    """Chunks are contiguous, bounded in length and cut inside pauses."""
+    audio = speech_with_pauses()
+    chunks = split_on_silence(audio, target_seconds=30, max_seconds=60)
+
+    assert chunks[0][0] == 0 and chunks[-1][1] == len(audio)
+    assert all(end == next_start for (_, end), (next_start, _) in zip(chunks, chunks[1:]))
+    assert all(end - start <= 60 * SAMPLE_RATE for start, end in chunks)
+    assert len(chunks) > 1
+
+    period = int(7.8 * SAMPLE_RATE)
+    for _, cut in chunks[:-1]:
+        assert cut % period >= 7 * SAMPLE_RATE, "cut landed inside a phrase"
+
+
+def test_continuous_speech_still_respects_max_length():
+    """Without pauses, chunks are cut at the quietest point before the maximum length."""
+    audio = 0.3 * np.random.default_rng(1).standard_normal(300 * SAMPLE_RATE).astype(np.float32)
+    chunks = split_on_silence(audio, target_seconds=30, max_seconds=60)
+
+    assert all(end - start <= 60 * SAMPLE_RATE for start, end in chunks)
+    assert chunks[-1][1] == len(audio)
+
+
+def test_short_audio_is_a_single_chunk():
+    audio = np.zeros(10 * SAMPLE_RATE, dtype=np.float32)
+    assert split_on_silence(audio, target_seconds=30, max_seconds=60) == [(0, len(audio))]
+
+
+def test_stitch_keeps_order_and_drops_empty_segments():
+    """Stitched segments keep recording order and build the full text."""
+    stitched = stitch_segments([
+        [{"start": 0.0, "end": 4.2, "text": "Thank you judges."}],
+        [{"start": 61.0, "end": 65.5, "text": "First contention."}, {"start": 66.0, "end": 66.5, "text": ""}],
+    ])
+
+    assert stitched["text"] == "Thank you judges. First contention."
+    assert [segment["start"] for segment in stitched["segments"]] == [0.0, 61.0]
@@ -0,0 +1,67 @@
+"""
+Tests for response compression middleware.
+"""
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from backend import compression
+from backend.compression import CompressionMiddleware, choose_encoding
+from backend.streaming import stream_llm_response
+
+
+def make_client():
+    app = FastAPI()
+    app.add_middleware(CompressionMiddleware, minimum_size=500)
+
+    @app.get("/large")
+    async def large():
+        return {"processed_text": "Strong link, weak impact. " * 200}
+
+    @app.get("/small")
+    async def small():
+        return {"ok": True}
+
+    @app.get("/stream")
+    async def stream():
+        async def deltas():
+            for piece in ["Strong ", "link. "] * 100:
+                yield piece
+        return stream_llm_response(deltas())
+
+    return TestClient(app)
+
+
+def test_large_json_is_gzipped(monkeypatch):
+    monkeypatch.setattr(compression, "brotli", None)
+    response = make_client().get("/large", headers={"Accept-Encoding": "gzip"})
+    assert response.headers["content-encoding"] == "gzip"
+    assert int(response.headers["content-length"]) < 1000
+    assert response.headers["vary"] == "Accept-Encoding"
+    assert response.json()["processed_text"].startswith("Strong link")
+
+
+def test_small_and_unaccepted_responses_are_not_compressed():
+    client = make_client()
+    assert "content-encoding" not in client.get("/small", headers={"Accept-Encoding": "gzip"}).headers
+    assert "content-encoding" not in client.get("/large", headers={"Accept-Encoding": "identity"}).headers
+
+
+def test_event_streams_are_not_compressed():
+    """Compressing SSE would buffer tokens, so streams pass through untouched."""
+    with make_client().stream("GET", "/stream", headers={"Accept-Encoding": "gzip, br"}) as response:
+        assert "content-encoding" not in response.headers
+        assert "event: done" in response.read().decode()
+
+
+def test_choose_encoding(monkeypatch):
+    monkeypatch.setattr(compression, "brotli", None)
+    assert choose_encoding("gzip, deflate, br") == "gzip"
+    assert choose_encoding("gzip;q=0, deflate") is None
+
+
+def test_brotli_preferred_when_installed():
+    pytest.importorskip("brotli")
+    assert choose_encoding("gzip, br") == "br"
+    response = make_client().get("/large", headers={"Accept-Encoding": "gzip, br"})
+    assert response.headers["content-encoding"] == "br"
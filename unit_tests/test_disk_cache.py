@@ -0,0 +1,90 @@
+"""
+Tests for the size-bounded on-disk key/value store.
+"""
+import os
+from backend import disk_cache
+from backend.disk_cache import DiskCache
+
+
+def test_hit_returns_stored_result(tmp_path):
+    cache = DiskCache(str(tmp_path), max_bytes=1024 * 1024)
+    result = {"text": "Thank you judges.", "segments": [{"start": 0.0, "end": 1.5, "text": "Thank you judges."}]}
+
+    assert cache.get("abc") is None
+    cache.put("abc", result)
+    assert cache.get("abc") == result
+
+
+def test_least_recently_used_entries_evicted(tmp_path):
+    """When over the size limit the entries used longest ago are removed first."""
+    cache = DiskCache(str(tmp_path), max_bytes=10 ** 9)
+    payload = {"text": "x" * 1000, "segments": []}
+    for i, key in enumerate(["old", "used", "new"]):
+        cache.put(key, payload)
+        os.utime(tmp_path / f"{key}.json", (1000 + i, 1000 + i))
+
+    # Reading "used" makes it the most recently used entry
+    assert cache.get("used") is not None
+    entry_size = os.path.getsize(tmp_path / "old.json")
+    cache.max_bytes = entry_size * 2
+    cache.evict()
+
+    assert cache.get("old") is None
+    assert cache.get("used") is not None
+    assert cache.get("new") is not None
+
+
+def test_puts_scan_the_directory_only_when_over_the_limit(tmp_path, monkeypatch):
+    cache = DiskCache(str(tmp_path), max_bytes=10 ** 9)
+    scans = []
+    real_scandir = os.scandir
+    monkeypatch.setattr(disk_cache.os, "scandir", lambda path: scans.append(path) or real_scandir(path))
+
+    payload = {"text": "x" * 1000, "segments": []}
+    for i in range(10):
+        cache.put(f"key{i}", payload)
+    # Only the first put scans; later ones keep a running total
+    assert len(scans) == 1
+
+    cache.max_bytes = os.path.getsize(tmp_path / "key0.json") * 5
+    cache.put("key10", payload)
+    assert len(scans) == 2
+    assert len(list(tmp_path.glob("*.json"))) == 5
+
+
+def test_entry_removed_during_a_scan_is_skipped(tmp_path, monkeypatch):
+    """An entry another process evicts mid-scan does not stop the eviction."""
+    cache = DiskCache(str(tmp_path), max_bytes=10 ** 9)
+    payload = {"text": "x" * 1000, "segments": []}
+    for i, key in enumerate(["gone", "old", "new"]):
+        cache.put(key, payload)
+        os.utime(tmp_path / f"{key}.json", (1000 + i, 1000 + i))
+
+    class VanishedEntry:
+        name = "vanished.json"
+        path = str(tmp_path / "vanished.json")
+
+        def stat(self):
+            raise FileNotFoundError(self.path)
+
+    real_scandir = os.scandir
+
+    class Scan:
+        def __enter__(self):
+            self.it = real_scandir(str(tmp_path))
+            return [VanishedEntry()] + list(self.it)
+
+        def __exit__(self, *exc):
+            self.it.close()
+
+    monkeypatch.setattr(disk_cache.os, "scandir", lambda path: Scan())
+    cache.max_bytes = os.path.getsize(tmp_path / "old.json") * 2
+    assert cache.evict() == 1
+    assert cache.get("gone") is None and cache.get("new") is not None
+
+
+def test_disabled_cache_stores_nothing(tmp_path):
+    cache = DiskCache(str(tmp_path / "cache"), max_bytes=0)
+    cache.put("abc", {"text": "", "segments": []})
+    assert cache.get("abc") is None
+    assert not os.path.exists(tmp_path / "cache")
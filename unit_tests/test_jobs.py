@@ -0,0 +1,76 @@
+"""
+Tests for the background job store and queue.
+"""
+import pytest
+from backend.jobs import (
+    JobQueue, JobStore, InMemoryJobStore, SQLiteJobStore, job_status,
+    QUEUED, RUNNING, COMPLETED, FAILED, DONE,
+)
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def store(request, tmp_path):
+    if request.param == "memory":
+        return InMemoryJobStore()
+    return SQLiteJobStore(str(tmp_path / "jobs.db"))
+
+
+def test_claim_returns_oldest_queued_job_once(store):
+    """Each queued job is handed to exactly one worker, oldest first."""
+    first = store.create("transcribe", {"n": 1})
+    second = store.create("transcribe", {"n": 2})
+
+    claimed = store.claim(["transcribe"])
+    assert claimed["id"] == first["id"]
+    assert claimed["status"] == RUNNING
+    assert store.claim(["transcribe"])["id"] == second["id"]
+    assert store.claim(["transcribe"]) is None
+    assert store.claim(["other"]) is None
+
+
+def test_queue_records_stages_and_result(store):
+    """Handlers report stage progress and their return value becomes the result."""
+    queue = JobQueue(store, workers=0)
+
+    def handler(job, report):
+        for stage in ("decode", "transcribe", "llm"):
+            report(stage, RUNNING)
+            report(stage, DONE)
+        return {"azure_output": job["params"]["topic"]}
+
+    queue.register("transcribe", handler)
+    job = queue.submit("transcribe", {"topic": "AI regulation"})
+    assert job["status"] == QUEUED
+
+    assert queue.run_next() is True
+    finished = store.get(job["id"])
+    assert finished["status"] == COMPLETED
+    assert finished["progress"] == 1.0
+    assert all(state == DONE for state in finished["stages"].values())
+    assert finished["result"] == {"azure_output": "AI regulation"}
+    assert job_status(finished)["result_url"] == f"/jobs/{job['id']}/result"
+
+
+def test_failed_handler_marks_job_failed(store):
+    """Exceptions from a handler fail the job with the error message."""
+    queue = JobQueue(store, workers=0)
+
+    def handler(job, report):
+        raise ValueError("Azure OpenAI API error: boom")
+
+    queue.register("transcribe", handler)
+    job = queue.submit("transcribe", {})
+    queue.run_next()
+
+    failed = store.get(job["id"])
+    assert failed["status"] == FAILED
+    assert "boom" in failed["error"]
+
+
+def test_store_missing_a_method_fails_when_created():
+    class IncompleteStore(JobStore):
+        def create(self, kind, params, stages=None):
+            return {}
+
+    with pytest.raises(TypeError):
+        IncompleteStore()
@@ -0,0 +1,52 @@
+"""
+Tests for the process-wide Whisper model registry.
+Uses a fake loader so no model weights are downloaded.
+"""
+import threading
+import pytest
+from backend.models import ModelRegistry, resolve_model_name
+
+
+def make_registry(idle_timeout=0):
+    loads = []
+
+    def loader(name):
+        loads.append(name)
+        return object()
+
+    return ModelRegistry(loader=loader, idle_timeout=idle_timeout), loads
+
+
+def test_model_loaded_once_and_shared():
+    """Repeated and concurrent requests share one loaded instance."""
+    registry, loads = make_registry()
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(registry.get("base.en"))) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert loads == ["base.en"]
+    assert all(model is results[0] for model in results)
+    assert registry.get("base.en") is results[0]
+
+
+def test_idle_models_are_evicted():
+    """Models unused for longer than the idle timeout are dropped and reloaded on demand."""
+    registry, loads = make_registry(idle_timeout=60)
+    first = registry.get("tiny.en")
+
+    assert registry.evict_idle() == []
+    assert registry.evict_idle(now=float("inf")) == ["tiny.en"]
+    assert registry.loaded() == []
+
+    assert registry.get("tiny.en") is not first
+    assert loads == ["tiny.en", "tiny.en"]
+
+
+def test_unsupported_model_rejected():
+    """Only the configured English model sizes are accepted."""
+    assert resolve_model_name("small.en") == "small.en"
+    with pytest.raises(ValueError):
+        resolve_model_name("large-v3")
@@ -0,0 +1,110 @@
+"""
+Tests for layout-aware PDF extraction.
+Builds small PDFs by hand so highlights and fonts are known exactly.
+"""
+import io
+
+import PyPDF2
+import pytest
+from PyPDF2 import PageObject, PdfWriter
+from PyPDF2.generic import ArrayObject, DecodedStreamObject, DictionaryObject, FloatObject, NameObject
+
+from backend import pdf_reader
+from backend.text_extraction import extract_text_from_file
+from fastapi import UploadFile
+
+# A bold tag, a cite, a line highlighted Word-style (yellow rectangle behind the
+# text) and a line highlighted with a viewer annotation
+CARD_PAGE = """BT /F2 12 Tf 72 720 Td (Trade raises wages.) Tj ET
+BT /F1 11 Tf 72 700 Td (Smith 24, Professor of Economics) Tj ET
+1 1 0 rg 110 677 88 14 re f 0 g
+BT /F1 11 Tf 72 680 Td (Studies ) Tj ET
+BT /F1 11 Tf 110 680 Td (show trade helps) Tj ET
+BT /F1 11 Tf 200 680 Td (in most cases.) Tj ET
+BT /F1 11 Tf 72 667 Td (The next line ) Tj ET
+BT /F1 11 Tf 150 667 Td (keeps going.) Tj ET
+"""
+ANNOTATION = [150, 678, 220, 678, 150, 664, 220, 664]
+
+
+def make_pdf(pages: list, annotations: dict = None) -> bytes:
+    """PDF with one page per content stream; `annotations` maps page index to highlight quads."""
+    writer = PdfWriter()
+    annotations = annotations or {}
+    fonts = DictionaryObject()
+    for name, base in (("/F1", "/Helvetica"), ("/F2", "/Helvetica-Bold")):
+        fonts[NameObject(name)] = DictionaryObject({
+            NameObject("/Type"): NameObject("/Font"),
+            NameObject("/Subtype"): NameObject("/Type1"),
+            NameObject("/BaseFont"): NameObject(base),
+            NameObject("/Encoding"): NameObject("/WinAnsiEncoding"),
+        })
+    for index, content in enumerate(pages):
+        page = PageObject.create_blank_page(None, 612, 792)
+        page[NameObject("/Resources")] = DictionaryObject({NameObject("/Font"): fonts})
+        stream = DecodedStreamObject()
+        stream.set_data(content.encode("latin-1"))
+        page[NameObject("/Contents")] = writer._add_object(stream)
+        if index in annotations:
+            page[NameObject("/Annots")] = ArrayObject([writer._add_object(DictionaryObject({
+                NameObject("/Type"): NameObject("/Annot"),
+                NameObject("/Subtype"): NameObject("/Highlight"),
+                NameObject("/QuadPoints"): ArrayObject([FloatObject(value) for value in annotations[index]]),
+            }))])
+        writer.add_page(page)
+    out = io.BytesIO()
+    writer.write(out)
+    return out.getvalue()
+
+
+def test_highlights_and_bold_tags_become_cards():
+    data = make_pdf([CARD_PAGE], {0: ANNOTATION})
+    cards = extract_text_from_file(UploadFile(file=io.BytesIO(data), filename="case.pdf"), "pdf", "card format")
+
+    [card] = cards.cards
+    assert card.tag == "Trade raises wages."
+    assert card.short_cite == "Smith 24, Professor of Economics"
+    assert card.read_text == "show trade helps keeps going."
+    assert "in most cases" in card.full_text
+
+
+def test_plaintext_matches_pypdf2():
+    data = make_pdf([CARD_PAGE])
+    text = extract_text_from_file(UploadFile(file=io.BytesIO(data), filename="case.pdf"), "pdf", "plaintext")
+    expected = PyPDF2.PdfReader(io.BytesIO(data)).pages[0].extract_text()
+    assert text.split() == expected.split()
+
+
+def test_large_files_are_read_in_parallel_and_in_order(monkeypatch):
+    """Page batches run in the process pool, but pages come out in document order."""
+    pages = [f"BT /F1 11 Tf 72 700 Td (Page {number} text) Tj ET" for number in range(1, 8)]
+    data = make_pdf(pages)
+    serial = [page.text for page in pdf_reader.read_pdf(io.BytesIO(data))]
+
+    monkeypatch.setattr(pdf_reader, "PDF_PARALLEL_MIN_PAGES", 2)
+    monkeypatch.setattr(pdf_reader, "PDF_PAGES_PER_TASK", 2)
+    parallel = list(pdf_reader.read_pdf(io.BytesIO(data)))
+
+    assert [page.number for page in parallel] == list(range(1, 8))
+    assert [page.text for page in parallel] == serial == [f"Page {number} text" for number in range(1, 8)]
+
+
+def test_files_on_disk_are_read_in_place(monkeypatch, tmp_path):
+    """Stored uploads go to the page pool by path, without a temporary copy."""
+    pages = [f"BT /F1 11 Tf 72 700 Td (Page {number} text) Tj ET" for number in range(1, 5)]
+    path = tmp_path / "case.pdf"
+    path.write_bytes(make_pdf(pages))
+    monkeypatch.setattr(pdf_reader, "PDF_PARALLEL_MIN_PAGES", 2)
+    monkeypatch.setattr(pdf_reader.tempfile, "mkstemp", lambda **kwargs: pytest.fail("copied a file on disk"))
+
+    with open(path, "rb") as f:
+        assert [page.text for page in pdf_reader.read_pdf(f)] == [f"Page {number} text" for number in range(1, 5)]
+
+
+def test_extraction_workers_do_not_start_the_page_pool(monkeypatch):
+    pages = [f"BT /F1 11 Tf 72 700 Td (Page {number} text) Tj ET" for number in range(1, 5)]
+    monkeypatch.setattr(pdf_reader, "PDF_PARALLEL_MIN_PAGES", 2)
+    monkeypatch.setattr(pdf_reader, "in_extraction_worker", lambda: True)
+    monkeypatch.setattr(pdf_reader, "get_pdf_executor", lambda: pytest.fail("nested PDF pool started"))
+
+    assert len(list(pdf_reader.read_pdf(io.BytesIO(make_pdf(pages))))) == 4
@@ -0,0 +1,114 @@
+"""
+Tests for rate-limit-aware scheduling and retries of Azure OpenAI calls.
+"""
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import httpx
+import openai
+import pytest
+
+from backend import azure
+from backend.rate_limit import (
+    PRIORITY_BULK, PRIORITY_INTERACTIVE, RateLimiter, TokenBucket, backoff_delay, is_retryable,
+)
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def status_error(status, headers=None):
+    request = httpx.Request("POST", "https://example.openai.azure.com/")
+    response = httpx.Response(status, headers=headers or {}, request=request)
+    error_class = openai.RateLimitError if status == 429 else openai.InternalServerError
+    return error_class("error", response=response, body=None)
+
+
+def test_token_bucket_refills_continuously():
+    """A drained bucket earns back quota in proportion to elapsed time."""
+    clock = FakeClock()
+    bucket = TokenBucket(120, clock)
+    bucket.take(120)
+    assert bucket.wait_time(1) == pytest.approx(0.5)
+
+    clock.now = 15.0
+    assert bucket.wait_time(30) == 0
+    # Requests bigger than the bucket wait for a full bucket instead of forever
+    assert bucket.wait_time(1000) == pytest.approx(45.0)
+
+
+def test_interactive_calls_overtake_queued_bulk_work():
+    """A chat request that arrives after bulk work is admitted first when quota frees up."""
+    limiter = RateLimiter(rpm=600)
+    limiter.requests.take(600)
+    admitted = []
+
+    def call(name, priority):
+        limiter.acquire(1, priority)
+        admitted.append(name)
+
+    bulk = threading.Thread(target=call, args=("bulk", PRIORITY_BULK))
+    bulk.start()
+    time.sleep(0.02)
+    interactive = threading.Thread(target=call, args=("chat", PRIORITY_INTERACTIVE))
+    interactive.start()
+    bulk.join(5)
+    interactive.join(5)
+
+    assert admitted == ["chat", "bulk"]
+    assert limiter.waiting == 0
+
+
+def test_backoff_honors_retry_after():
+    """Throttled calls wait at least as long as the server asked."""
+    assert is_retryable(status_error(429))
+    assert is_retryable(status_error(503))
+    assert not is_retryable(ValueError("bad input"))
+
+    delay = backoff_delay(0, status_error(429, {"retry-after": "7"}))
+    assert 7 <= delay <= 8
+    assert backoff_delay(0, status_error(429, {"retry-after-ms": "250"})) >= 0.25
+
+
+def test_call_ai_retries_throttled_requests(monkeypatch):
+    """A 429 followed by success returns the completion instead of an error."""
+    calls = []
+
+    class ThrottlingHandler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            self.rfile.read(int(self.headers.get("Content-Length", 0)))
+            calls.append(self.path)
+            if len(calls) == 1:
+                body, status = json.dumps({"error": {"code": "429", "message": "Rate limit"}}), 429
+            else:
+                body, status = json.dumps({
+                    "id": "chatcmpl-test", "object": "chat.completion", "created": 0, "model": "gpt-4.1",
+                    "choices": [{"index": 0, "finish_reason": "stop", "message": {"role": "assistant", "content": "Feedback"}}],
+                    "usage": {"prompt_tokens": 5, "completion_tokens": 1, "total_tokens": 6},
+                }), 200
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Retry-After-Ms", "10")
+            self.end_headers()
+            self.wfile.write(body.encode("utf-8"))
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), ThrottlingHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        monkeypatch.setenv("AZURE_OPENAI_API_KEY", "test-key")
+        monkeypatch.setenv("AZURE_OPENAI_ENDPOINT", f"http://127.0.0.1:{server.server_port}")
+        monkeypatch.setattr(azure, "rate_limiter", RateLimiter(rpm=0, tpm=0))
+        assert azure.call_ai([{"role": "user", "content": "Hi"}]) == "Feedback"
+        assert len(calls) == 2
+    finally:
+        server.shutdown()
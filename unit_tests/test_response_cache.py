@@ -0,0 +1,92 @@
+"""
+Tests for the opt-in Azure OpenAI response cache.
+"""
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from backend import azure
+from backend.disk_cache import DiskCache
+
+MESSAGES = [{"role": "system", "content": "You are a coach."}, {"role": "user", "content": "Contention 1:  trade\n"}]
+
+
+@pytest.fixture
+def mock_azure(monkeypatch):
+    """Local chat-completions endpoint that counts the requests it serves."""
+    requests_served = []
+
+    class CompletionHandler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            self.rfile.read(int(self.headers.get("Content-Length", 0)))
+            requests_served.append(self.path)
+            body = json.dumps({
+                "id": "chatcmpl-test", "object": "chat.completion", "created": 0, "model": "gpt-4.1",
+                "choices": [{"index": 0, "finish_reason": "stop", "message": {"role": "assistant", "content": f"Feedback {len(requests_served)}"}}],
+                "usage": {"prompt_tokens": 5, "completion_tokens": 2, "total_tokens": 7},
+            }).encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), CompletionHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    monkeypatch.setenv("AZURE_OPENAI_API_KEY", "test-key")
+    monkeypatch.setenv("AZURE_OPENAI_ENDPOINT", f"http://127.0.0.1:{server.server_port}")
+    yield requests_served
+    server.shutdown()
+
+
+@pytest.fixture(params=["memory", "disk"])
+def cache_backend(request, tmp_path, monkeypatch):
+    cache = azure.MemoryResponseCache() if request.param == "memory" else DiskCache(str(tmp_path), 1024 * 1024)
+    monkeypatch.setattr(azure, "response_cache", cache)
+    return cache
+
+
+def test_repeated_request_is_served_from_cache(mock_azure, cache_backend):
+    """The second identical request costs no call and reports zero tokens."""
+    assert azure.call_ai(MESSAGES, cache=True) == "Feedback 1"
+    usage = {}
+    # Whitespace-only differences in the content still hit
+    resubmitted = [MESSAGES[0], {"role": "user", "content": "Contention 1: trade"}]
+    assert azure.call_ai(resubmitted, cache=True, usage=usage) == "Feedback 1"
+    assert len(mock_azure) == 1
+    assert usage["cached"] is True and usage["total_tokens"] == 0
+
+
+def test_regenerate_bypasses_and_refreshes_cache(mock_azure, cache_backend):
+    azure.call_ai(MESSAGES, cache=True)
+    assert azure.call_ai(MESSAGES, cache=True, regenerate=True) == "Feedback 2"
+    assert azure.call_ai(MESSAGES, cache=True) == "Feedback 2"
+    assert len(mock_azure) == 2
+
+
+def test_expired_and_uncached_calls_reach_azure(mock_azure, cache_backend, monkeypatch):
+    azure.call_ai(MESSAGES, cache=True)
+    # Interactive calls do not use the cache unless asked to
+    azure.call_ai(MESSAGES)
+    monkeypatch.setattr(azure, "LLM_CACHE_TTL", -1)
+    azure.call_ai(MESSAGES, cache=True)
+    assert len(mock_azure) == 3
+
+
+def test_different_prompt_misses(mock_azure, cache_backend):
+    azure.call_ai(MESSAGES, cache=True)
+    azure.call_ai([{"role": "system", "content": "You are a judge."}, MESSAGES[1]], cache=True)
+    assert len(mock_azure) == 2
+
+
+def test_memory_cache_is_size_bounded():
+    cache = azure.MemoryResponseCache(max_entries=2)
+    for key in ("a", "b", "c"):
+        cache.put(key, {"content": key})
+    assert cache.get("a") is None
+    assert cache.get("c") == {"content": "c"}
@@ -0,0 +1,82 @@
+"""
+Tests for the BM25 retrieval index over feedback, transcripts and cases.
+"""
+import time
+
+import pytest
+
+from backend import retrieval
+from backend.cards import Card, CardCase
+from backend.retrieval import Chunk, RetrievalIndex, case_chunks, index_analysis, load_index, text_chunks, transcript_chunks
+from backend.speeches import Speech, Transcript
+
+FEEDBACK = """## Rebuttal
+You dropped the inflation turn and never weighed the impacts.
+
+## Crossfire
+You conceded that tariffs raise consumer prices."""
+
+
+def make_transcript():
+    speeches = [
+        Speech("First Constructive", "constructive", "A", 0.0, 240.0, [{"start": 0.0, "end": 240.0, "text": "Tariffs protect manufacturing jobs."}]),
+        Speech("First Rebuttal", "rebuttal", "B", 245.0, 485.0, [{"start": 245.0, "end": 485.0, "text": "Their jobs claim ignores inflation."}]),
+    ]
+    return Transcript(text=" ".join(speech.text for speech in speeches), segments=[], speeches=speeches)
+
+
+@pytest.fixture
+def store(monkeypatch, tmp_path):
+    monkeypatch.setattr(retrieval, "chunk_store", retrieval.DiskCache(str(tmp_path), 1024 * 1024))
+    monkeypatch.setattr(retrieval, "_indexes", retrieval.OrderedDict())
+    return retrieval.chunk_store
+
+
+def test_bm25_ranks_rare_matching_terms_first():
+    index = RetrievalIndex([
+        Chunk("feedback", "Rebuttal", "The rebuttal dropped the inflation turn."),
+        Chunk("feedback", "Crossfire", "Crossfire was calm; the rebuttal was fine."),
+        Chunk("feedback", "Summary", "Summary extended jobs and the rebuttal."),
+    ])
+    results = index.search("Where did I drop inflation in rebuttal?", k=2)
+    assert [chunk.title for _, chunk, _ in results][0] == "Rebuttal"
+    assert len(results) == 2 and results[0][2] > results[1][2]
+    assert index.search("the and of") == []
+    assert [chunk.title for _, chunk, _ in index.search("inflation crossfire", sources=("case",))] == []
+
+
+def test_chunkers_split_by_speech_card_and_heading():
+    assert [chunk.title for chunk in text_chunks(FEEDBACK, "feedback")] == ["Rebuttal", "Crossfire"]
+
+    speeches = transcript_chunks(make_transcript())
+    assert [chunk.title for chunk in speeches] == ["First Constructive (A), 0:00-4:00", "First Rebuttal (B), 4:05-8:05"]
+
+    case = CardCase([Card(tag="Tariffs cause inflation", cite="Smith 2024", read_text="Prices rose 3%.", section="Contention 1")])
+    chunks = case_chunks(case)
+    assert chunks[0].source == "case" and chunks[0].title == "Contention 1" and "Prices rose 3%." in chunks[0].text
+
+
+def test_indexed_analysis_is_reloaded_from_the_store(store):
+    context_id = index_analysis(FEEDBACK, make_transcript(), "Contention 1:\nTariffs hurt farmers.")
+    assert context_id == index_analysis(FEEDBACK, make_transcript(), "Contention 1:\nTariffs hurt farmers.")
+
+    retrieval._indexes.clear()
+    index = load_index(context_id)
+    assert {chunk.source for chunk in index.chunks} == {"feedback", "transcript", "case"}
+    assert index.search("farmers", k=1)[0][1].source == "case"
+    assert load_index("../../etc/passwd") is None and load_index("0" * 64) is None
+
+
+def test_disabled_store_returns_no_context_id(monkeypatch):
+    monkeypatch.setattr(retrieval, "chunk_store", retrieval.DiskCache("unused", 0))
+    assert index_analysis(FEEDBACK) is None
+
+
+def test_search_over_a_long_round_takes_milliseconds():
+    words = [f"term{i}" for i in range(5000)]
+    chunks = [Chunk("transcript", f"Speech {i}", " ".join(words[(i * 37 + j * 11) % 5000] for j in range(250))) for i in range(500)]
+    index = RetrievalIndex(chunks)
+    start = time.perf_counter()
+    for _ in range(100):
+        index.search("term1 term22 term333 term4444 inflation rebuttal")
+    assert (time.perf_counter() - start) / 100 < 0.005
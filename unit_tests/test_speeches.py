@@ -0,0 +1,61 @@
+"""
+Tests for grouping transcript segments into public forum speeches.
+"""
+import json
+import random
+from backend.speeches import PF_SCHEDULE, build_transcript, segment_speeches
+
+
+def simulated_round(speeches=PF_SCHEDULE, seed=3):
+    """Segments for a round: phrases with short pauses, longer gaps between speeches."""
+    rng = random.Random(seed)
+    segments, starts, t = [], [], 0.0
+    for _, _, _, expected in speeches:
+        end = t + expected * rng.uniform(0.8, 1.05)
+        starts.append(t)
+        first = True
+        while t < end:
+            length = rng.uniform(3, 12)
+            text = "Thank you judges, time starts now." if first else "and this matters because of the evidence"
+            segments.append({"start": round(t, 2), "end": round(t + length, 2), "text": text})
+            first = False
+            t += length + rng.uniform(0.2, 1.5)
+        t += rng.uniform(2, 30)
+    return segments, starts
+
+
+def test_full_round_recovers_every_speech():
+    """All eleven PF speeches are found at their true start times."""
+    segments, starts = simulated_round()
+    speeches = segment_speeches(segments)
+
+    assert [speech.name for speech in speeches] == [name for name, _, _, _ in PF_SCHEDULE]
+    assert [round(speech.start, 2) for speech in speeches] == [round(start, 2) for start in starts]
+    assert sum(len(speech.segments) for speech in speeches) == len(segments)
+
+
+def test_partial_recording_uses_leading_speeches():
+    """A recording of only the constructives is split into those two speeches."""
+    segments, starts = simulated_round(PF_SCHEDULE[:2])
+    speeches = segment_speeches(segments)
+
+    assert [speech.name for speech in speeches] == ["First Constructive", "Second Constructive"]
+    assert round(speeches[1].start, 2) == round(starts[1], 2)
+
+
+def test_transcript_serializes_and_formats_per_speech():
+    """Transcripts serialize to plain dicts and format with a header per speech."""
+    segments, _ = simulated_round(PF_SCHEDULE[:2])
+    transcript = build_transcript({"text": " ".join(s["text"] for s in segments), "segments": segments})
+
+    data = json.loads(json.dumps(transcript.to_dict()))
+    assert [speech["name"] for speech in data["speeches"]] == ["First Constructive", "Second Constructive"]
+    assert data["segments"] == segments
+
+    prompt = transcript.format_for_prompt()
+    assert prompt.startswith("[First Constructive (first team), 0:00-")
+    assert "[Second Constructive (second team)," in prompt
+
+
+def test_empty_transcript_has_no_speeches():
+    assert build_transcript({"text": "", "segments": []}).speeches == []
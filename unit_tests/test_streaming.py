@@ -0,0 +1,92 @@
+"""
+Tests for server-sent event streaming of LLM feedback between backend and frontend.
+"""
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from backend.streaming import stream_llm_response
+from frontend.streaming import LLMStream
+
+
+class RequestsLikeResponse:
+    """Adapts an httpx test response to the requests API used by the frontend."""
+
+    def __init__(self, response):
+        self.response = response
+
+    def iter_lines(self, decode_unicode=True):
+        return self.response.iter_lines()
+
+
+def make_client(deltas, done_payload=None):
+    app = FastAPI()
+
+    @app.get("/stream")
+    async def stream():
+        return stream_llm_response(deltas(), done_payload=done_payload)
+
+    return TestClient(app)
+
+
+def test_stream_round_trips_deltas_and_final_payload():
+    """Fragments arrive in order and the done event carries the full text."""
+    async def deltas():
+        for piece in ["Strong ", "link, ", "weak\nimpact."]:
+            yield piece
+
+    client = make_client(deltas, done_payload=lambda text: {"processed_text": text})
+    with client.stream("GET", "/stream") as response:
+        assert response.headers["content-type"].startswith("text/event-stream")
+        feedback = LLMStream(RequestsLikeResponse(response))
+        assert "".join(feedback) == "Strong link, weak\nimpact."
+
+    assert feedback.final == {"processed_text": "Strong link, weak\nimpact."}
+    assert feedback.error is None
+
+
+def test_stream_reports_errors_after_partial_output():
+    """A failure part way through becomes an error event instead of a broken connection."""
+    async def deltas():
+        yield "Partial "
+        raise ValueError("Azure OpenAI API error: rate limited")
+
+    client = make_client(deltas)
+    with client.stream("GET", "/stream") as response:
+        feedback = LLMStream(RequestsLikeResponse(response))
+        assert list(feedback) == ["Partial "]
+
+    assert feedback.final is None
+    assert feedback.error == "Azure OpenAI API error: rate limited"
+    assert feedback.text == "Partial "
+
+
+def test_stream_awaits_an_async_final_payload():
+    """The done payload can do its own async work, e.g. indexing in the thread pool."""
+    async def deltas():
+        yield "Good crossfire."
+
+    async def done_payload(text):
+        return {"processed_text": text, "context_id": "abc"}
+
+    client = make_client(deltas, done_payload=done_payload)
+    with client.stream("GET", "/stream") as response:
+        feedback = LLMStream(RequestsLikeResponse(response))
+        assert "".join(feedback) == "Good crossfire."
+
+    assert feedback.final == {"processed_text": "Good crossfire.", "context_id": "abc"}
+
+
+def test_failing_final_payload_becomes_an_error_event():
+    """The client gets an error event, not a broken stream, when the done payload fails."""
+    async def deltas():
+        yield "Good crossfire."
+
+    async def done_payload(text):
+        raise OSError("database is locked")
+
+    client = make_client(deltas, done_payload=done_payload)
+    with client.stream("GET", "/stream") as response:
+        feedback = LLMStream(RequestsLikeResponse(response))
+        assert list(feedback) == ["Good crossfire."]
+
+    assert feedback.final is None
+    assert feedback.error == "database is locked"
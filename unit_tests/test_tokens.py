@@ -0,0 +1,83 @@
+"""
+Tests for prompt token budgets and deterministic content reduction.
+"""
+from backend.azure import case_feedback_messages, pf_feedback_messages
+from backend.speeches import Speech, Transcript
+from backend.tokens import count_message_tokens, count_tokens, fair_shares, fit_to_budget, remove_filler, shorten
+
+
+def make_transcript(words_per_speech):
+    """Transcript with one segment per speech of the given kinds and lengths."""
+    segments, speeches, t = [], [], 0.0
+    for index, (kind, words) in enumerate(words_per_speech):
+        text = " ".join(f"{kind}{index}word{i}" for i in range(words))
+        segment = {"start": t, "end": t + 60, "text": text}
+        segments.append(segment)
+        speeches.append(Speech(f"Speech {index}", kind, "first team", t, t + 60, [segment]))
+        t += 60
+    return Transcript(" ".join(s["text"] for s in segments), segments, speeches)
+
+
+def test_fair_shares_keeps_small_parts_whole():
+    """Parts under the common cap are untouched; larger parts share the rest equally."""
+    assert fair_shares([10, 100, 100], 1000) == [10, 100, 100]
+    assert fair_shares([10, 100, 100], 110) == [10, 50, 50]
+    assert sum(fair_shares([7, 300, 45, 1000], 200)) <= 200
+
+
+def test_shorten_keeps_start_and_end():
+    text = " ".join(f"word{i}" for i in range(500))
+    short = shorten(text, 50)
+    assert count_tokens(short) <= 50
+    assert short.startswith("word0") and short.endswith("word499")
+    assert "[...]" in short
+
+
+def test_remove_filler():
+    assert remove_filler("Um, so uh the the link is, you know, weak") == "so the link is, weak"
+
+
+def test_content_within_budget_is_untouched():
+    """Nothing is reduced when the prompt already fits."""
+    text, report = fit_to_budget("System prompt", "Contention one: \n\n\n  the economy", 1000)
+    assert text == "Contention one: \n\n\n  the economy"
+    assert report["reductions"] == []
+    assert report["input_tokens"] == report["original_input_tokens"]
+
+
+def test_crossfire_is_condensed_before_speeches():
+    """Over budget, crossfire gives way first and constructives stay whole."""
+    transcript = make_transcript([("constructive", 200), ("crossfire", 600), ("rebuttal", 200)])
+    budget = count_tokens(transcript.format_for_prompt()) * 2 // 3
+
+    text, report = fit_to_budget("System prompt", transcript, budget)
+
+    assert report["reductions"] == ["filler", "crossfire"]
+    assert report["input_tokens"] <= budget
+    assert transcript.speeches[0].text in text
+    assert transcript.speeches[2].text in text
+
+
+def test_reduction_is_deterministic_and_within_budget():
+    """Long cases are trimmed to the budget the same way every time."""
+    case = "\n\n".join(" ".join(f"card{c}word{i}" for i in range(40 * (c + 1))) for c in range(12))
+    first, report = fit_to_budget("System prompt", case, 800)
+    second, _ = fit_to_budget("System prompt", case, 800)
+
+    assert first == second
+    assert report["reductions"] == ["whitespace", "trim"]
+    assert report["input_tokens"] <= 800 < report["original_input_tokens"]
+    # Every card survives in part
+    assert all(f"card{c}word0" in first for c in range(12))
+
+
+def test_feedback_messages_report_tokens():
+    """Prompt builders fit their endpoint budget and report the prompt size."""
+    messages, report = pf_feedback_messages("Resolved: test", make_transcript([("constructive", 50)]), "PRO")
+    assert report["input_tokens"] == count_message_tokens(messages)
+
+    huge_case = "evidence " * 100000
+    messages, report = case_feedback_messages("Resolved: test", huge_case, "CON")
+    assert report["input_tokens"] == count_message_tokens(messages) <= report["budget"]
+    assert "[...]" in messages[1]["content"]
+    assert "[...]" in messages[0]["content"]
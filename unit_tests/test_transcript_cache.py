@@ -0,0 +1,18 @@
+"""
+Tests for the on-disk transcript cache.
+"""
+from backend.transcript_cache import hash_audio, transcript_cache_key
+
+
+def test_key_depends_on_audio_model_and_settings(tmp_path):
+    """Same audio hashes identically from bytes or disk; model and settings change the key."""
+    data = b"RIFF fake audio bytes"
+    path = tmp_path / "round.wav"
+    path.write_bytes(data)
+    audio_hash = hash_audio(data)
+
+    assert hash_audio(str(path)) == audio_hash
+    base = transcript_cache_key(audio_hash, "tiny.en", sample_rate=16000)
+    assert base == transcript_cache_key(audio_hash, "tiny.en", sample_rate=16000)
+    assert base != transcript_cache_key(audio_hash, "base.en", sample_rate=16000)
+    assert base != transcript_cache_key(audio_hash, "tiny.en", sample_rate=8000)
@@ -0,0 +1,92 @@
+"""
+Tests for size-bounded, parse-once multipart upload handling.
+"""
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+from fastapi.testclient import TestClient
+
+from backend import case, transcription, uploads
+
+
+def make_client(limit):
+    app = FastAPI()
+
+    @app.post("/upload")
+    async def upload(request: Request):
+        try:
+            form = await uploads.read_form(request, limit)
+        except uploads.UploadTooLargeError as e:
+            return uploads.too_large_response(e)
+        try:
+            file = uploads.get_upload(form)
+            data = await file.read()
+            return JSONResponse({"size": len(data), "side": form.get("side"), "stream": uploads.form_flag(form, "stream")})
+        finally:
+            await form.close()
+
+    return TestClient(app)
+
+
+def test_upload_within_limit_is_parsed():
+    client = make_client(64 * 1024)
+    response = client.post("/upload", files={"file": ("case.txt", b"x" * 1000)}, data={"side": "PRO", "stream": "true"})
+    assert response.status_code == 200
+    assert response.json() == {"size": 1000, "side": "PRO", "stream": True}
+
+
+def test_declared_length_over_limit_is_refused_before_reading():
+    client = make_client(1024)
+    response = client.post("/upload", files={"file": ("case.txt", b"x" * 5000)})
+    assert response.status_code == 413
+    assert "maximum size" in response.json()["error"]
+
+
+def test_streamed_body_over_limit_is_refused():
+    """Chunked uploads without a Content-Length are cut off once they pass the limit."""
+    client = make_client(1024)
+    boundary = "limit-test"
+    chunks = [
+        f'--{boundary}\r\nContent-Disposition: form-data; name="file"; filename="round.mp3"\r\n\r\n'.encode(),
+        *([b"x" * 512] * 8),
+        f"\r\n--{boundary}--\r\n".encode(),
+    ]
+    response = client.post(
+        "/upload",
+        content=iter(chunks),
+        headers={"Content-Type": f"multipart/form-data; boundary={boundary}"},
+    )
+    assert response.status_code == 413
+
+
+def test_endpoints_apply_their_upload_type_limits(monkeypatch):
+    monkeypatch.setattr(case, "MAX_DOCUMENT_UPLOAD_BYTES", 1024)
+    monkeypatch.setattr(transcription, "MAX_AUDIO_UPLOAD_BYTES", 1024)
+    app = FastAPI()
+    app.include_router(case.router)
+    app.include_router(transcription.router)
+    client = TestClient(app)
+
+    for path in ("/process-text/", "/transcribe/", "/jobs/transcribe/"):
+        response = client.post(path, files={"file": ("upload.bin", b"x" * 4096)})
+        assert response.status_code == 413, path
+
+    response = client.post("/process-text/", data={"side": "PRO"})
+    assert response.status_code == 400
+
+
+def test_save_upload_copies_in_blocks(tmp_path):
+    app = FastAPI()
+
+    @app.post("/save")
+    async def save(request: Request):
+        form = await uploads.read_form(request, 64 * 1024)
+        try:
+            await uploads.save_upload(uploads.get_upload(form), str(tmp_path / "copy.bin"), chunk_size=100)
+        finally:
+            await form.close()
+        return JSONResponse({"saved": True})
+
+    client = TestClient(app)
+    data = bytes(range(256)) * 10
+    assert client.post("/save", files={"file": ("round.mp3", data)}).status_code == 200
+    assert (tmp_path / "copy.bin").read_bytes() == data
@@ -0,0 +1,73 @@
+"""
+Tests for the bounded worker pool used for transcription.
+"""
+import asyncio
+import threading
+import pytest
+from backend.workers import WorkerPool, PoolFullError
+
+
+def test_pool_rejects_work_beyond_queue_depth():
+    """Once workers and queue are busy, new jobs fail fast with a retry hint."""
+    pool = WorkerPool("test", workers=1, queue_depth=1, retry_after=7)
+    release = threading.Event()
+    try:
+        running = pool.submit(release.wait)
+        queued = pool.submit(release.wait)
+        with pytest.raises(PoolFullError) as excinfo:
+            pool.submit(release.wait)
+        assert excinfo.value.retry_after == 7
+
+        release.set()
+        running.result(timeout=5)
+        queued.result(timeout=5)
+        assert pool.pending == 0
+    finally:
+        release.set()
+        pool.shutdown()
+
+
+def test_run_does_not_block_event_loop():
+    """Awaiting a pool job leaves the loop free for other coroutines."""
+    pool = WorkerPool("test", workers=1, queue_depth=0)
+    release = threading.Event()
+
+    async def scenario():
+        job = asyncio.ensure_future(pool.run(release.wait, 5))
+        await asyncio.sleep(0)
+        # The loop keeps serving other work while the job is blocked
+        ticks = 0
+        for _ in range(3):
+            await asyncio.sleep(0.01)
+            ticks += 1
+        release.set()
+        return ticks, await job
+
+    try:
+        ticks, result = asyncio.run(scenario())
+        assert ticks == 3
+        assert result is True
+    finally:
+        release.set()
+        pool.shutdown()
+
+
+def test_submit_blocking_waits_for_a_free_slot():
+    """Background jobs wait for room in a full pool instead of failing."""
+    pool = WorkerPool("test", workers=1, queue_depth=0)
+    release = threading.Event()
+    try:
+        running = pool.submit(release.wait)
+        waiting = []
+        waiter = threading.Thread(target=lambda: waiting.append(pool.submit_blocking(lambda: "done")))
+        waiter.start()
+        waiter.join(timeout=0.2)
+        assert waiter.is_alive() and not waiting
+
+        release.set()
+        waiter.join(timeout=5)
+        assert waiting[0].result(timeout=5) == "done"
+        assert running.result(timeout=5) is True
+    finally:
+        release.set()
+        pool.shutdown()